@@ -0,0 +1,223 @@
+"""
+HTTP API for the summarizer.
+
+POST /summaries with a JSON body holding a Reddit "url" or a saved "thread"
+listing, and optionally a "model" and GenerateSettings overrides in
+"settings". The response is a stream of server-sent events: one "chunk" event
+per summary (the progress_callback arguments), then "done" with the full
+output, or "error". Identical requests in flight share one pipeline run.
+
+Usage:
+    summary-api --host 127.0.0.1 --port 8080
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import sys
+from collections.abc import AsyncIterator, Callable, Sequence
+from typing import Any
+
+from aiohttp import web
+from config import get_models
+from data_types.summary import GenerateSettings, RedditData, RedditStream
+from generate_data import (
+    default_settings,
+    fetch_reddit,
+    generate_summary_data,
+    get_reddit_json,
+)
+from log_tools import Logger
+from utils.common import is_valid_reddit_url, replace_last_token_with_json
+
+app_logger = Logger.get_app_logger()
+
+Event = tuple[str, dict[str, Any]]
+Publish = Callable[[str, dict[str, Any]], None]
+# runs the pipeline for a job, calling publish(event, data) from any thread
+Pipeline = Callable[[dict[str, Any], Publish], str]
+
+
+def run_pipeline(job: dict[str, Any], publish: Publish) -> str:
+    """Fetch or load the job's thread and summarize it, publishing each chunk."""
+    settings: GenerateSettings = job["settings"]
+    if job.get("thread") is not None:
+        reddit_data: RedditData | RedditStream = get_reddit_json(
+            json.dumps(job["thread"]).encode("utf-8"), app_logger
+        )
+    else:
+        reddit_data = fetch_reddit(
+            replace_last_token_with_json(job["url"]), settings, app_logger
+        )
+
+    def progress_callback(progress: int, idx: int, prompt: str, summary: str) -> None:
+        publish(
+            "chunk",
+            {"progress": progress, "index": idx, "prompt": prompt, "summary": summary},
+        )
+
+    return generate_summary_data(
+        settings=settings,
+        reddit_data=reddit_data,
+        logger=app_logger,
+        progress_callback=progress_callback,
+    )
+
+
+class SummaryRun:
+    """One pipeline run; its events are replayed to every request that joins."""
+
+    def __init__(self) -> None:
+        self.events: list[Event] = []
+        self.done = False
+        self._changed = asyncio.Condition()
+
+    async def publish(
+        self, event: str, data: dict[str, Any], last: bool = False
+    ) -> None:
+        """Record an event and wake the subscribers."""
+        async with self._changed:
+            self.events.append((event, data))
+            self.done = self.done or last
+            self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[Event]:
+        """Yield every event of the run, from the first, until it is done."""
+        seen = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(
+                    lambda: self.done or len(self.events) > seen
+                )
+                new_events, done = self.events[seen:], self.done
+                seen = len(self.events)
+            for event in new_events:
+                yield event
+            if done:
+                return
+
+
+class SummaryService:
+    """Starts pipeline runs, coalescing identical requests that overlap."""
+
+    def __init__(self, pipeline: Pipeline = run_pipeline) -> None:
+        self.pipeline = pipeline
+        self.runs: dict[str, SummaryRun] = {}
+        self.started = 0
+        self.coalesced = 0
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    @staticmethod
+    def job_key(job: dict[str, Any]) -> str:
+        """Return the hash identifying identical jobs."""
+        payload = json.dumps(job, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def subscribe(self, job: dict[str, Any]) -> AsyncIterator[Event]:
+        """Join the run of an identical job in flight, or start one."""
+        key = self.job_key(job)
+        if key in self.runs:
+            self.coalesced += 1
+        else:
+            self.runs[key] = SummaryRun()
+            self.started += 1
+            task = asyncio.create_task(self._run(key, job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return self.runs[key].subscribe()
+
+    async def _run(self, key: str, job: dict[str, Any]) -> None:
+        run = self.runs[key]
+        loop = asyncio.get_running_loop()
+
+        def publish(event: str, data: dict[str, Any]) -> None:
+            asyncio.run_coroutine_threadsafe(run.publish(event, data), loop).result()
+
+        try:
+            output = await asyncio.to_thread(self.pipeline, job, publish)
+        except Exception as exc:  # pylint: disable=broad-except
+            app_logger.error("Summary request failed: %s", exc)
+            await run.publish("error", {"error": str(exc)}, last=True)
+        else:
+            await run.publish("done", {"output": output}, last=True)
+        finally:
+            # later identical requests start a new run, the response cache
+            # keeps those cheap
+            del self.runs[key]
+
+
+SERVICE_KEY = web.AppKey("service", SummaryService)
+
+
+def parse_job(body: Any) -> dict[str, Any]:
+    """Validate a request body and build its job, raising ValueError."""
+    if not isinstance(body, dict):
+        raise ValueError("the body must be a JSON object")
+    url, thread = body.get("url"), body.get("thread")
+    if (url is None) == (thread is None):
+        raise ValueError('give exactly one of "url" and "thread"')
+    if url is not None and not is_valid_reddit_url(url):
+        raise ValueError(f"not a Reddit thread URL: {url!r}")
+
+    settings = default_settings(body.get("model", get_models()[0].id))
+    overrides = body.get("settings", {})
+    unknown = set(overrides) - set(GenerateSettings.__annotations__)
+    if unknown:
+        raise ValueError(f"unknown settings: {sorted(unknown)}")
+    settings.update(overrides)
+    return {"url": url, "thread": thread, "settings": settings}
+
+
+def format_event(event: str, data: dict[str, Any]) -> bytes:
+    """Encode one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+async def handle_summaries(request: web.Request) -> web.StreamResponse:
+    """Stream the summary of the requested thread as server-sent events."""
+    service = request.app[SERVICE_KEY]
+    try:
+        job = parse_job(await request.json())
+    except ValueError as exc:  # includes invalid JSON
+        raise web.HTTPBadRequest(text=str(exc)) from exc
+
+    response = web.StreamResponse(
+        headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"}
+    )
+    await response.prepare(request)
+    async for event, data in service.subscribe(job):
+        await response.write(format_event(event, data))
+    await response.write_eof()
+    return response
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    """Report that the server is up."""
+    return web.json_response({"status": "ok"})
+
+
+def make_app(service: SummaryService | None = None) -> web.Application:
+    """Build the application, with a default SummaryService."""
+    app = web.Application()
+    app[SERVICE_KEY] = service or SummaryService()
+    app.router.add_post("/summaries", handle_summaries)
+    app.router.add_get("/health", handle_health)
+    return app
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Serve the API until interrupted."""
+    parser = argparse.ArgumentParser(
+        prog="summary-api", description="Serve the summarizer over HTTP."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args(argv)
+
+    web.run_app(make_app(), host=args.host, port=args.port)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
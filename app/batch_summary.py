@@ -0,0 +1,232 @@
+"""
+Summarize many Reddit threads without the Streamlit UI, e.g. for nightly digests.
+
+Every finished thread is checkpointed to the output directory, so a rerun after
+a crash only summarizes the threads that are still missing. The query is kept
+in the output directory too, so a rerun on another day asks the same question
+as the first run, whose default query holds its date.
+
+Usage:
+    batch-summary threads.txt --output-dir digests/2024-06-01 --workers 4
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from collections.abc import Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import TypedDict
+
+from config import ConfigVars, get_models
+from data_types.summary import GenerateSettings
+from generate_data import (
+    default_settings,
+    fetch_reddit,
+    generate_summary_data,
+    load_reddit_json,
+)
+from log_tools import Logger
+from utils.common import generate_filename, replace_last_token_with_json
+
+config = ConfigVars()
+app_logger = Logger.get_app_logger()
+
+# the settings of an output directory's first run, see pin_query
+RUN_FILE = ".batch-run"
+# settings that change how a thread is summarized, not the summary
+RUNTIME_SETTINGS = ("max_concurrency", "use_cache", "raise_errors")
+
+
+class ThreadResult(TypedDict):
+    """The checkpoint of one summarized thread."""
+
+    source: str
+    title: str
+    output: str
+    completed_at: float
+
+
+def iter_sources(list_path: str) -> Iterator[str]:
+    """Yield the URLs and JSON paths of a list file, skipping blanks and #."""
+    with open(list_path, encoding="utf-8") as list_file:
+        for line in list_file:
+            source = line.strip()
+            if source and not source.startswith("#"):
+                yield source
+
+
+def checkpoint_path(output_dir: str, source: str, settings: GenerateSettings) -> str:
+    """
+    Return the checkpoint file of a thread. The name hashes the source and the
+    settings changing the summary, so changing the model or query summarizes
+    the thread again, while e.g. changing the concurrency does not.
+    """
+    output_settings = {
+        name: value for name, value in settings.items() if name not in RUNTIME_SETTINGS
+    }
+    key = json.dumps([source, output_settings], sort_keys=True)
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(output_dir, f"{digest}.json")
+
+
+def pin_query(output_dir: str, query: str | None) -> str:
+    """
+    Return the query of a run and keep it in the output directory: query if
+    given, else the query kept by an earlier run, else DEFAULT_QUERY_TEXT.
+    The default embeds the date, so a run resumed the next day would find no
+    checkpoint and miss the response cache unless its query is kept.
+    """
+    run_path = os.path.join(output_dir, RUN_FILE)
+    if query is None:
+        try:
+            with open(run_path, encoding="utf-8") as run_file:
+                query = json.load(run_file)["query"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            query = config.DEFAULT_QUERY_TEXT
+    with open(run_path, "w", encoding="utf-8") as run_file:
+        json.dump({"query": query}, run_file)
+    return query
+
+
+def load_checkpoint(path: str) -> ThreadResult | None:
+    """Return a finished thread's result, or None if it has not finished."""
+    try:
+        with open(path, encoding="utf-8") as checkpoint_file:
+            return json.load(checkpoint_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def write_checkpoint(path: str, result: ThreadResult) -> None:
+    """Write a result atomically, a crash never leaves a partial checkpoint."""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as checkpoint_file:
+        json.dump(result, checkpoint_file)
+    os.replace(temp_path, path)
+
+
+def summarize_thread(
+    source: str,
+    settings: GenerateSettings,
+    output_dir: str,
+) -> ThreadResult:
+    """Fetch or load one thread, summarize it and checkpoint the result."""
+    if source.startswith(("http://", "https://")):
+        reddit_data = fetch_reddit(
+            replace_last_token_with_json(source), settings, app_logger
+        )
+    else:
+        reddit_data = load_reddit_json(source, app_logger)
+
+    # a failed LLM call raises, so a partial summary is never checkpointed
+    output = generate_summary_data(
+        settings={**settings, "raise_errors": True},
+        reddit_data=reddit_data,
+        logger=app_logger,
+    )
+    result: ThreadResult = {
+        "source": source,
+        "title": reddit_data["title"],
+        "output": output,
+        "completed_at": time.time(),
+    }
+
+    path = checkpoint_path(output_dir, source, settings)
+    with open(
+        f"{path[: -len('.json')]}_{generate_filename(result['title'])}.txt",
+        "w",
+        encoding="utf-8",
+    ) as output_file:
+        output_file.write(output)
+    write_checkpoint(path, result)
+    return result
+
+
+def build_settings(args: argparse.Namespace, query: str) -> GenerateSettings:
+    """Build the settings for the model chosen on the command line."""
+    settings = default_settings(args.model)
+    settings["query"] = query
+    settings["reduce_summaries"] = args.reduce
+    if args.chunk_tokens:
+        settings["chunk_token_length"] = args.chunk_tokens
+    if args.summaries:
+        settings["max_number_of_summaries"] = args.summaries
+    return settings
+
+
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(
+        prog="batch-summary",
+        description="Summarize the Reddit URLs or saved .json threads in list files.",
+    )
+    parser.add_argument(
+        "lists", nargs="+", help="files with one thread URL or .json path per line"
+    )
+    parser.add_argument("--output-dir", default="outputs/batch")
+    parser.add_argument(
+        "--model",
+        default=get_models()[0].id,
+        choices=[model.id for model in get_models()],
+        metavar="MODEL",
+        help="a model id from models.json (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=4, help="threads summarized in parallel"
+    )
+    parser.add_argument("--chunk-tokens", type=int, help="default: the model's")
+    parser.add_argument("--summaries", type=int, help="default: the model's")
+    parser.add_argument(
+        "--query",
+        help="default: the query of the output directory's earlier runs, if any",
+    )
+    parser.add_argument(
+        "--reduce", action="store_true", help="combine each thread's summaries"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """
+    Summarize every listed thread on up to --workers threads, skipping those
+    with a checkpoint. Returns 1 if any thread failed, rerun to retry them.
+    """
+    args = parse_args(argv)
+    os.makedirs(args.output_dir, exist_ok=True)
+    settings = build_settings(args, pin_query(args.output_dir, args.query))
+
+    sources = list(
+        dict.fromkeys(source for path in args.lists for source in iter_sources(path))
+    )
+    pending = [
+        source
+        for source in sources
+        if load_checkpoint(checkpoint_path(args.output_dir, source, settings)) is None
+    ]
+    print(f"{len(sources) - len(pending)} of {len(sources)} threads already done")
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = {
+            executor.submit(summarize_thread, source, settings, args.output_dir): source
+            for source in pending
+        }
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as exc:  # pylint: disable=broad-except
+                failed += 1
+                app_logger.error("Failed to summarize %s: %s", futures[future], exc)
+                print(f"{futures[future]}: failed: {exc}", file=sys.stderr)
+                continue
+            print(f"{result['source']}: {result['title']}")
+
+    print(f"Summarized {len(pending) - failed} of {len(pending)} pending threads")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Benchmark the comment chunker on synthetic threads.
+
+Usage:
+    PYTHONPATH=app python -m benchmarks.bench_chunker [--legacy-max 10000]
+"""
+
+import argparse
+import random
+import re
+import time
+
+from utils.llm_utils import (
+    estimate_word_count,
+    group_bodies_into_chunks,
+    num_tokens_from_string,
+)
+
+WORDS = (
+    "the thread mods said this is why reddit api pricing will change again and"
+    " apps like apollo can not afford it anymore lol yeah exactly source please"
+).split()
+
+
+def synthetic_thread(num_lines: int, seed: int = 0) -> str:
+    """Build a newline-delimited synthetic comment thread."""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(num_lines):
+        depth = rng.randint(0, 6)
+        body = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 60)))
+        lines.append(f"{'    ' * depth}> 2023-Jun-12 10:{i % 60:02d} [user{i}] {body}")
+        if rng.random() < 0.1:
+            lines.append("")
+    return "\n".join(lines)
+
+
+def legacy_group_bodies_into_chunks(contents: str, token_length: int) -> list[str]:
+    """The original implementation, re-tokenizing the whole chunk per line."""
+    results: list[str] = []
+    current_chunk = ""
+
+    for line in contents.split("\n"):
+        line = re.sub(r"\n+", "\n", line).strip()
+        line = line[: estimate_word_count(1000)] + "\n"
+
+        if num_tokens_from_string(current_chunk + line) > token_length:
+            results.append(current_chunk)
+            current_chunk = ""
+
+        current_chunk += line
+
+    if current_chunk:
+        results.append(current_chunk)
+
+    return results
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000]
+    )
+    parser.add_argument("--chunk-token-length", type=int, default=50_000)
+    parser.add_argument(
+        "--legacy-max",
+        type=int,
+        default=10_000,
+        help="skip the quadratic implementation above this many lines",
+    )
+    args = parser.parse_args()
+
+    print(f"{'lines':>8} {'chunks':>7} {'incremental s':>14} {'legacy s':>10}")
+    for size in args.sizes:
+        contents = synthetic_thread(size)
+
+        start = time.perf_counter()
+        chunks = group_bodies_into_chunks(contents, args.chunk_token_length)
+        incremental = time.perf_counter() - start
+
+        legacy = "skipped"
+        if size <= args.legacy_max:
+            start = time.perf_counter()
+            expected = legacy_group_bodies_into_chunks(
+                contents, args.chunk_token_length
+            )
+            legacy = f"{time.perf_counter() - start:.2f}"
+            assert expected == chunks, "chunker output diverged from the original"
+
+        print(f"{size:>8} {len(chunks):>7} {incremental:>14.2f} {legacy:>10}")
+
+
+if __name__ == "__main__":
+    main()
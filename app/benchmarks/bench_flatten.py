@@ -0,0 +1,94 @@
+"""
+Benchmark flattening a synthetic comment tree into the thread transcript.
+
+Usage:
+    PYTHONPATH=app python -m benchmarks.bench_flatten [--comments 50000 --depth 200]
+"""
+
+import argparse
+import random
+import sys
+import time
+from types import SimpleNamespace
+from typing import Any
+
+from generate_data import format_date, iter_comment_lines, iter_comments
+
+
+def synthetic_tree(num_comments: int, depth: int, seed: int = 0) -> list[Any]:
+    """Build top-level comments whose reply chains reach the given depth."""
+    rng = random.Random(seed)
+    top_level: list[Any] = []
+    parents: list[Any] = []
+
+    for i in range(num_comments):
+        comment = SimpleNamespace(
+            author=SimpleNamespace(name=f"user{i}") if i % 20 else None,
+            created_utc=1_686_000_000 + rng.randint(0, 86_400),
+            body=f"comment {i} " + "lorem ipsum " * rng.randint(1, 20),
+            replies=[],
+        )
+        if i % depth == 0:
+            top_level.append(comment)
+            parents = [comment]
+        else:
+            parent = parents[-1] if rng.random() < 0.9 else rng.choice(parents)
+            parent.replies.append(comment)
+            parents.append(comment)
+
+    return top_level
+
+
+def legacy_get_comments(comment: Any, level: int = 0) -> str:
+    """The original recursive, concatenating implementation."""
+    result = ""
+
+    author_name = comment.author.name if comment.author else "[deleted]"
+    created_date = format_date(comment.created_utc)
+
+    result += f"{created_date} [{author_name}] {comment.body}\n"
+
+    for reply in sorted(
+        comment.replies,
+        key=lambda reply: reply.created_utc,
+        reverse=True,
+    ):
+        result += "    " * level
+        result += "> " + legacy_get_comments(reply, level + 1)
+
+    return result
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--comments", type=int, default=50_000)
+    parser.add_argument("--depth", type=int, default=200)
+    args = parser.parse_args()
+
+    tree = synthetic_tree(args.comments, args.depth)
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), args.depth * 2 + 100))
+
+    start = time.perf_counter()
+    transcript = "".join(entry for comment in tree for entry in iter_comments(comment))
+    iterative = time.perf_counter() - start
+
+    start = time.perf_counter()
+    num_lines = sum(1 for _ in iter_comment_lines(tree))
+    streamed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    legacy = ""
+    for comment in tree:
+        legacy += legacy_get_comments(comment)
+    recursive = time.perf_counter() - start
+
+    assert legacy == transcript, "iterative output diverged from the original"
+    print(f"comments={args.comments} depth={args.depth} bytes={len(transcript)}")
+    print(f"iterative  {iterative:8.3f}s")
+    print(f"streamed   {streamed:8.3f}s ({num_lines} lines)")
+    print(f"recursive  {recursive:8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark offline ingestion of a saved Reddit thread JSON into RedditData.
+
+Usage:
+    PYTHONPATH=app python -m benchmarks.bench_ingest [--file thread.json]
+"""
+
+import argparse
+import json
+import random
+import time
+from typing import Any
+
+from generate_data import get_reddit_json
+from log_tools import Logger
+
+# distinct words per comment, so dedup keeps the thread instead of one comment
+VOCABULARY = [
+    f"{stem}{i}" for stem in ("lorem", "ipsum", "dolor", "amet") for i in range(500)
+]
+
+
+def synthetic_listing(num_comments: int, seed: int = 0) -> bytes:
+    """Build a thread listing JSON with num_comments nested comments."""
+    rng = random.Random(seed)
+    top_level: list[dict[str, Any]] = []
+    parents: list[dict[str, Any]] = []
+
+    for i in range(num_comments):
+        child = {
+            "kind": "t1",
+            "data": {
+                "id": f"c{i}",
+                "author": f"user{i % 997}",
+                "body": " ".join(rng.choices(VOCABULARY, k=5 * rng.randint(1, 15))),
+                "created_utc": 1_686_000_000 + rng.randint(0, 86_400),
+                "score": rng.randint(-5, 500),
+                "replies": "",
+            },
+        }
+        if not parents or rng.random() < 0.2:
+            top_level.append(child)
+            parents = [child]
+        else:
+            parent = rng.choice(parents[-5:])
+            if not parent["data"]["replies"]:
+                parent["data"]["replies"] = {
+                    "kind": "Listing",
+                    "data": {"children": []},
+                }
+            parent["data"]["replies"]["data"]["children"].append(child)
+            parents.append(child)
+
+    post = {
+        "kind": "t3",
+        "data": {"title": "Synthetic", "selftext": "", "subreddit": "x"},
+    }
+    return json.dumps(
+        [
+            {"kind": "Listing", "data": {"children": [post]}},
+            {"kind": "Listing", "data": {"children": top_level}},
+        ]
+    ).encode("utf-8")
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--file", help="a saved thread, instead of synthetic data")
+    parser.add_argument("--comments", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, "rb") as json_file:
+            data = json_file.read()
+    else:
+        data = synthetic_listing(args.comments)
+
+    logger = Logger.get_app_logger()
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        reddit_data = get_reddit_json(data, logger)
+        timings.append(time.perf_counter() - start)
+
+    comments = reddit_data["comments"] or ""
+    store = reddit_data.get("comment_store")
+    print(
+        f"input={len(data)} bytes transcript={len(comments)} bytes"
+        f" comments={len(store) if store is not None else 0}"
+        f" dedup={reddit_data.get('dedup_stats')}"
+    )
+    print(f"best of {args.repeat}: {min(timings):.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Microbenchmark the overhead of the Logger.log decorator.
+
+Usage:
+    PYTHONPATH=app python -m benchmarks.bench_logger [--calls 20000]
+"""
+
+import argparse
+import logging
+import time
+
+from log_tools import Logger
+
+PAYLOAD = "comment line with some words\n" * 200  # a ~6 KB prompt
+
+
+def make_prompt() -> str:
+    """Return a prompt-sized string, like generate_complete_prompt."""
+    return PAYLOAD
+
+
+def per_call_us(func, calls: int) -> float:
+    """Return the mean microseconds per call."""
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=20_000)
+    args = parser.parse_args()
+
+    logger = logging.getLogger("bench_logger")
+    logger.propagate = False
+    logger.addHandler(logging.NullHandler())
+    decorated = Logger.log(make_prompt, logger)
+
+    baseline = per_call_us(make_prompt, args.calls)
+
+    logger.setLevel(logging.WARNING)
+    disabled = per_call_us(decorated, args.calls)
+
+    logger.setLevel(logging.DEBUG)
+    enabled = per_call_us(decorated, args.calls)
+
+    print(f"undecorated        {baseline:8.2f} us/call")
+    print(f"level disabled     {disabled:8.2f} us/call")
+    print(f"level enabled      {enabled:8.2f} us/call (NullHandler)")
+    print(f"call stats         {Logger.get_call_stats()[make_prompt.__qualname__]}")
+
+
+if __name__ == "__main__":
+    main()
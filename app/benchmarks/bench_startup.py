@@ -0,0 +1,75 @@
+"""
+Measure the import time of the Streamlit app with python -X importtime, and
+fail if it regressed: the settings page must render before any LLM SDK is
+imported.
+
+Usage:
+    PYTHONPATH=app python -m benchmarks.bench_startup [--module main] [--max-ms 2000]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+# imported on first use only, never while the app starts
+LAZY_MODULES = ("litellm", "openai", "anthropic", "tiktoken", "praw", "debugpy")
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def app_env() -> dict[str, str]:
+    """Return the environment of the app, with only app/ on PYTHONPATH."""
+    return {**os.environ, "PYTHONPATH": APP_DIR}
+
+
+def import_times(module: str) -> list[tuple[str, int, int]]:
+    """
+    Import module in a fresh interpreter, return the (name, self_us,
+    cumulative_us) of every module imported, in import order.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        check=True,
+        env=app_env(),
+        text=True,
+    )
+
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        times.append((name.strip(), int(self_us), int(cumulative_us)))
+    return times
+
+
+def main() -> int:
+    """Run the benchmark, return 1 on a regression."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--max-ms", type=float, default=None)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    times = import_times(args.module)
+    total_ms = sum(self_us for _, self_us, _ in times) / 1000
+    eager = sorted({name.split(".")[0] for name, _, _ in times} & set(LAZY_MODULES))
+
+    print(f"import {args.module:<18} {total_ms:8.1f} ms, {len(times)} modules")
+    for name, _, cumulative_us in sorted(times, key=lambda t: -t[2])[: args.top]:
+        print(f"  {name:<30} {cumulative_us / 1000:8.1f} ms cumulative")
+
+    failed = False
+    if eager:
+        print(f"FAIL: imported eagerly: {', '.join(eager)}")
+        failed = True
+    if args.max_ms is not None and total_ms > args.max_ms:
+        print(f"FAIL: {total_ms:.1f} ms is over --max-ms {args.max_ms:.1f}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
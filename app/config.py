@@ -3,9 +3,10 @@
 from __future__ import annotations
 
 import json
+import os
 from collections.abc import Callable
 from datetime import datetime
-from functools import wraps
+from functools import cache, wraps
 from typing import Any, TypeVar
 
 from pydantic import BaseModel, Field
@@ -20,6 +21,11 @@ class ModelConfig(BaseModel):
     default_number_of_summaries: int
     max_token_length: int
     max_context_length: int
+    tokenizer: str | None = None
+    max_concurrency: int = 1
+    connector: str = "litellm"
+    requests_per_minute: int | None = None
+    tokens_per_minute: int | None = None
 
 
 class LogColors(BaseModel):
@@ -43,10 +49,36 @@ class ConfigVars(BaseModel):
     DEFAULT_MAX_TOKEN_LENGTH: int = 4096  # max number of tokens for GPT-3
     LOG_FILE_PATH: str = "./logs/log.log"
     LOG_COLORS: LogColors = Field(default_factory=LogColors)
+    LOG_FORMAT: str = "color"  # format of the log file: "color", "plain" or "json"
+    LOG_MAX_BYTES: int = 5 * 1024 * 1024  # rotate the log file at this size
+    LOG_BACKUP_COUNT: int = 3
+    LOG_CALLS_LEVEL: str = "DEBUG"  # level of the Logger.log call/return records
+    LOG_PAYLOAD_MODE: str = "truncate"  # "truncate", "hash" or "full"
+    LOG_PAYLOAD_MAX_CHARS: int = 300
+    RESPONSE_CACHE_PATH: str = "./cache/responses.sqlite3"
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1000
+    RESPONSE_CACHE_TTL_SECONDS: int = 7 * 24 * 60 * 60  # one week
     REDDIT_URL: str = "https://www.reddit.com/r/OutOfTheLoop/comments/147fcdf/whats_going_on_with_subreddits_going_private_on/"
     LOG_NAME: str = "reddit_gpt_summarizer_log"
     APP_TITLE: str = "Reddit Thread GPT Summarizer"
     MAX_BODY_TOKEN_SIZE: int = 500
+    THREAD_CACHE_TTL_SECONDS: int = 15 * 60  # how long the UI reuses a fetched thread
+    THREAD_CACHE_MAX_ENTRIES: int = 32
+    CHUNK_CACHE_MAX_ENTRIES: int = 64
+    MAP_REDUCE_FAN_IN: int = 4  # summaries combined per call in the final reduce
+    MORE_COMMENTS_MAX_WORKERS: int = 4  # concurrent "load more comments" requests
+    MORE_COMMENTS_FALLBACK_LIMIT: int = 32  # stubs replace_more expands in budget
+    SELECTION_DEPTH_DECAY: float = 0.8  # value kept per reply level when selecting
+    SELECTION_RECENCY_HALF_LIFE_HOURS: float = 48.0  # comment value halves per period
+    SELECTION_FETCH_MULTIPLE: int = 4  # comment tokens fetched per token selected
+    DEDUP_ENABLED: bool = True  # drop near-duplicate, bot and noise comments
+    DEDUP_SHINGLE_SIZE: int = 3  # words per MinHash shingle
+    DEDUP_MIN_SIMILARITY: float = 0.5  # shingle Jaccard making a near-duplicate
+    DEDUP_MIN_WORDS: int = 3  # comments with fewer words are noise, e.g. "+1"
+    DEDUP_BOT_AUTHORS: list[str] = ["AutoModerator"]
+    DEFAULT_TOKENIZER: str = "cl100k_base"  # used when a model has no tokenizer
+    DEFAULT_REQUESTS_PER_MINUTE: int = 10  # for models missing from models.json
+    RATE_LIMIT_MAX_RETRIES: int = 2  # retries of requests answered with Retry-After
     DEFAULT_QUERY_TEXT: str = (
         f"(Today's Date: {datetime.now().strftime('%Y-%b-%d')}) Revise and improve"
         " the article by incorporating relevant information from the comments."
@@ -78,10 +110,20 @@ def load_models_from_json(file_path: str) -> list[ModelConfig]:
     return [ModelConfig(**model_data) for model_data in models_data]
 
 
-# Load models from JSON files
-MODELS = load_models_from_json(
-    "app/model_configs/models.json",
-)
+MODELS_PATH = os.path.join(os.path.dirname(__file__), "model_configs", "models.json")
+
+
+@cache
+def get_models() -> list[ModelConfig]:
+    """Load models.json on first use."""
+    return load_models_from_json(MODELS_PATH)
+
+
+def __getattr__(name: str) -> Any:
+    # MODELS is loaded on first access instead of at import
+    if name == "MODELS":
+        return get_models()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def with_config(func: Callable[..., R]) -> Callable[..., R]:
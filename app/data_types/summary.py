@@ -1,6 +1,10 @@
 """Data types for the application."""
 
-from typing import TypedDict
+from collections.abc import Iterator
+from typing import TYPE_CHECKING, NotRequired, TypedDict
+
+if TYPE_CHECKING:
+    from utils.comment_store import CommentStore
 
 
 class RedditData(TypedDict):
@@ -10,6 +14,18 @@ class RedditData(TypedDict):
     selftext: str | None
     subreddit: str
     comments: str | None
+    # the comments as records, filled at ingestion, see utils.comment_store
+    comment_store: NotRequired["CommentStore"]
+    dedup_stats: NotRequired["DedupStats"]
+
+
+class RedditStream(TypedDict):
+    """A thread whose comment lines are fetched as they are consumed."""
+
+    title: str
+    selftext: str | None
+    subreddit: str
+    comment_lines: Iterator[str]
 
 
 class GenerateSettings(TypedDict):
@@ -22,6 +38,39 @@ class GenerateSettings(TypedDict):
     selected_model: str
     system_role: str
     max_context_length: int
+    max_concurrency: NotRequired[int]
+    use_cache: NotRequired[bool]
+    summary_mode: NotRequired[str]
+    reduce_summaries: NotRequired[bool]
+    select_comments: NotRequired[bool]
+    # raise LLM errors instead of answering "Error completing text: ..."
+    raise_errors: NotRequired[bool]
+
+
+class SummaryStats(TypedDict):
+    """LLM usage of a summary run."""
+
+    llm_calls: int
+    llm_calls_saved: int
+    tokens_saved: int
+
+
+class DedupStats(TypedDict):
+    """Comments dropped before chunking, see utils.dedup."""
+
+    comments_removed: int
+    duplicates: int
+    noise: int
+    tokens_removed: int
+    # the encoding tokens_removed was counted with
+    tokenizer: str
+
+
+class MapReduceStats(TypedDict):
+    """Depth and LLM calls of a map-reduce run."""
+
+    levels: int
+    calls: int
 
 
 class ModelConfig(TypedDict):
@@ -4,8 +4,6 @@
 import logging
 from typing import Any
 
-import debugpy  # type: ignore
-
 
 class Debugger:
     """Class to handle debugging tools for Streamlit."""
@@ -53,6 +51,8 @@ class Debugger:
         host: str,
         port: int,
     ) -> None:
+        import debugpy  # type: ignore
+
         if (
             not streamlit.session_state.debugging
             and not cls._debugger_set_up
@@ -1,22 +1,38 @@
 """data functions for Reddit Scraper project."""
 
 import logging
+import queue
 import re
-from collections.abc import Callable
-from datetime import datetime
+import threading
+from collections.abc import Callable, Iterable, Iterator, Sized
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from heapq import heappop, heappush
+from itertools import islice
 from typing import Any, Optional
 
-import praw  # type: ignore
-from config import ConfigVars
-from data_types.summary import GenerateSettings, RedditData
+from config import ConfigVars, get_models
+from data_types.summary import (
+    GenerateSettings,
+    MapReduceStats,
+    RedditData,
+    RedditStream,
+    SummaryStats,
+)
 from env import EnvVarsLoader
-from llm_handler import complete_text
+from llm_handler import complete_text, stream_text
 from log_tools import Logger
 from utils.llm_utils import (
     estimate_word_count,
-    group_bodies_into_chunks,
+    iter_chunks,
     num_tokens_from_string,
+    truncate_to_tokens,
 )
+from utils.comment_store import CommentStore, chunk_comments, format_date
+from utils.dedup import CommentFilter, dedup_comments
+from utils.map_reduce import tree_reduce
+from utils.reddit_json import parse_thread
+from utils.run_metrics import carry_context, iter_stage, stage, timed_stage
+from utils.tokenizers import TokenizerRegistry
 from utils.streamlit_decorators import spinner_decorator
 
 config = ConfigVars()
@@ -24,9 +40,22 @@ env_vars = EnvVarsLoader.load_env()
 
 app_logger = Logger.get_app_logger()
 ProgressCallback = Optional[Callable[[int, int, str, str], None]]
+StreamCallback = Optional[Callable[[int, str], None]]
+# splits a thread's comments into groups of at most a token length, for a model,
+# selecting the comments that fill a number of groups when one is given
+Chunker = Callable[[RedditData, int, str | None, int | None], list[str]]
+
+
+def shorten_prompt(selftext: str, max_tokens: int) -> str:
+    """Build the prompt asking the model to shorten a text."""
+    return (
+        f"shorten this text to ~{max_tokens} GPT tokens through summarization:"
+        f" {selftext}"
+    )
 
 
 @Logger.log
+@timed_stage("condense")
 def summarize_summary(
     selftext: str,
     settings: GenerateSettings,
@@ -35,13 +64,8 @@ def summarize_summary(
 ) -> str:
     """Summarize the response."""
 
-    summary_string = (
-        f"shorten this text to ~{max_tokens} GPT tokens through summarization:"
-        f" {selftext}"
-    )
-
     out_text = complete_text(
-        prompt=summary_string,
+        prompt=shorten_prompt(selftext, max_tokens),
         max_tokens=max_tokens,
         settings=settings,
     )
@@ -51,75 +75,385 @@ def summarize_summary(
     return f"{title}\n{out_text}"
 
 
-def format_date(timestamp: float) -> str:
-    """Format a timestamp into a human-readable date."""
-    date: datetime = datetime.fromtimestamp(timestamp)
-    return date.strftime("%Y-%b-%d %H:%M")
+def format_comment(comment: Any) -> str:
+    """Format a single comment as "date [author] body"."""
+    author_name = comment.author.name if comment.author else "[deleted]"
+    created_date = format_date(comment.created_utc)
+    return f"{created_date} [{author_name}] {comment.body}\n"
+
+
+def iter_comments(comment: Any, level: int = 0) -> Iterator[str]:
+    """
+    Yield the formatted comment and its replies depth-first, newest reply first.
+
+    Uses an explicit stack instead of recursion, so arbitrarily deep threads
+    neither hit the recursion limit nor copy partial transcripts per level.
+    """
+    stack: list[tuple[Any, int, str]] = [(comment, level, "")]
+
+    while stack:
+        node, node_level, prefix = stack.pop()
+        yield prefix + format_comment(node)
+
+        reply_prefix = "    " * node_level + "> "
+        replies = sorted(
+            node.replies,
+            key=lambda reply: reply.created_utc,
+            reverse=True,
+        )
+        stack.extend(
+            (reply, node_level + 1, reply_prefix) for reply in reversed(replies)
+        )
+
+
+def iter_entry_lines(entries: Iterable[str]) -> Iterator[str]:
+    """
+    Lazily yield the lines of formatted comments, the same lines as splitting
+    the joined transcript on newlines.
+    """
+    for entry in entries:
+        yield from entry[:-1].split("\n")
+    yield ""
+
+
+def iter_comment_lines(comments: Iterable[Any]) -> Iterator[str]:
+    """Lazily yield the lines of the flattened thread."""
+    return iter_entry_lines(
+        entry for comment in comments for entry in iter_comments(comment)
+    )
 
 
 def get_comments(comment: Any, level: int = 0) -> str:
     """Get the comments from a Reddit thread."""
-    result = ""
+    return "".join(iter_comments(comment, level))
 
-    author_name = comment.author.name if comment.author else "[deleted]"
-    created_date = format_date(comment.created_utc)
 
-    result += f"{created_date} [{author_name}] {comment.body}\n"
+# the praw Reddit instance of each thread fetching "load more comments" stubs
+_thread_reddit = threading.local()
+# the praw CommentForest internals expand_more_comments splices comments with,
+# checked against praw 7.7 and 8.0, see the praw pin in pyproject.toml
+FOREST_INTERNALS = (
+    "_comments",
+    "_submission",
+    "_gather_more_comments",
+    "_insert_comment",
+)
+
+
+def make_reddit() -> Any:
+    """Return a praw Reddit instance logged in with the app's credentials."""
+    import praw  # type: ignore
+
+    return praw.Reddit(
+        client_id=env_vars["REDDIT_CLIENT_ID"],
+        client_secret=env_vars["REDDIT_CLIENT_SECRET"],
+        password=env_vars["REDDIT_PASSWORD"],
+        user_agent=env_vars["REDDIT_USER_AGENT"],
+        username=env_vars["REDDIT_USERNAME"],
+    )
+
+
+def fetch_more_comments(more: Any) -> list[Any]:
+    """
+    Fetch the comments behind one MoreComments stub, one API request, with a
+    Reddit instance of the calling thread: praw does not document an instance
+    as thread-safe, so concurrent fetches never share one.
+    """
+    from praw.const import API_PATH  # type: ignore
+
+    reddit = getattr(_thread_reddit, "reddit", None)
+    if reddit is None:
+        reddit = _thread_reddit.reddit = make_reddit()
+    submission = more.submission
+
+    if more.count == 0:  # "continue this thread", the replies of its parent
+        _, comments = reddit.get(
+            f"{API_PATH['submission'].format(id=submission.id)}_/"
+            f"{more.parent_id.split('_', 1)[1]}",
+            params={
+                "limit": submission.comment_limit,
+                "sort": submission.comment_sort,
+            },
+        )
+        return list(comments.children[0].replies)
+
+    return list(
+        reddit.post(
+            API_PATH["morechildren"],
+            data={
+                "children": ",".join(more.children),
+                "link_id": submission.fullname,
+                "sort": submission.comment_sort,
+            },
+        )
+    )
+
+
+@Logger.log
+def expand_more_comments(
+    forest: Any,
+    token_budget: int | None = None,
+    max_workers: int = config.MORE_COMMENTS_MAX_WORKERS,
+    fetch: Callable[[Any], list[Any]] = fetch_more_comments,
+    model: str | None = None,
+) -> int:
+    """
+    Resolve the MoreComments stubs of a praw CommentForest, like replace_more
+    but with up to max_workers fetches in flight, largest stubs first.
+
+    No new fetch starts once the comment bodies in the forest hold token_budget
+    tokens of the model's tokenizer, the stubs left over are removed from the
+    tree. Returns how many stubs were removed without being fetched.
+
+    Splicing fetched comments in relies on CommentForest internals, if a praw
+    version lacks them the forest is expanded with replace_more instead, one
+    stub at a time, at most MORE_COMMENTS_FALLBACK_LIMIT stubs with a budget.
+    """
+    from praw.models import MoreComments  # type: ignore
+
+    if not all(hasattr(forest, name) for name in FOREST_INTERNALS):
+        app_logger.warning(
+            "praw's CommentForest changed, expanding comments with replace_more"
+        )
+        return len(
+            forest.replace_more(
+                limit=(
+                    None
+                    if token_budget is None
+                    else config.MORE_COMMENTS_FALLBACK_LIMIT
+                )
+            )
+        )
+
+    tokenizer = TokenizerRegistry.get(model)
+
+    def count_tokens(comments: list[Any]) -> int:
+        bodies = [c.body for c in comments if not isinstance(c, MoreComments)]
+        return sum(tokenizer.count_many(bodies))
+
+    pending: list[Any] = forest._gather_more_comments(forest._comments)
+    tokens = count_tokens(forest.list()) if token_budget is not None else 0
+    in_flight: dict[Future[list[Any]], Any] = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or in_flight:
+            while (
+                pending
+                and len(in_flight) < max_workers
+                and (token_budget is None or tokens < token_budget)
+            ):
+                more = heappop(pending)
+                in_flight[executor.submit(fetch, more)] = more
+
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                more = in_flight.pop(future)
+                new_comments = future.result()
+
+                for stub in forest._gather_more_comments(
+                    new_comments, parent_tree=forest._comments
+                ):
+                    stub.submission = forest._submission
+                    heappush(pending, stub)
+                for comment in new_comments:
+                    forest._insert_comment(comment)
+                more._remove_from.remove(more)
+
+                if token_budget is not None:
+                    tokens += count_tokens(new_comments)
+
+    for more in pending:
+        more._remove_from.remove(more)
+
+    return len(pending)
+
+
+def iter_forest(
+    comments: Iterable[Any],
+    fetch: Callable[[Any], list[Any]] = fetch_more_comments,
+    keep: Callable[[Any], bool] | None = None,
+) -> Iterator[str]:
+    """
+    Yield the formatted top-level comments of a praw CommentForest and their
+    replies like iter_comments, fetching a MoreComments stub only when the
+    iteration reaches it. Closing the iterator early leaves every later stub
+    unfetched. Fetched replies come after the replies already loaded.
+
+    Comments keep rejects are left out, their replies take their place like
+    CommentStore.subset hangs them.
+    """
+    from praw.models import MoreComments  # type: ignore
+
+    # the replies of fetched comments, morechildren returns a flat list
+    fetched_replies: dict[str, list[Any]] = {}
+
+    def newest_first(replies: Iterable[Any]) -> list[Any]:
+        return sorted(
+            replies,
+            # stubs last, they hold the replies that were not loaded
+            key=lambda reply: (
+                (True, 0.0)
+                if isinstance(reply, MoreComments)
+                else (False, -reply.created_utc)
+            ),
+        )
+
+    stack: list[tuple[Any, int, str]] = [
+        (comment, 0, "") for comment in reversed(list(comments))
+    ]
+
+    while stack:
+        node, node_level, prefix = stack.pop()
+        if isinstance(node, MoreComments):
+            with stage("fetch"):
+                new_comments = fetch(node)
+            names = {comment.name for comment in new_comments}
+            siblings = []
+            for comment in new_comments:
+                if comment.parent_id in names:
+                    fetched_replies.setdefault(comment.parent_id, []).append(comment)
+                else:
+                    siblings.append(comment)
+            if node_level:  # top-level comments keep the thread's sort order
+                siblings = newest_first(siblings)
+            stack.extend(
+                (sibling, node_level, prefix) for sibling in reversed(siblings)
+            )
+            continue
+
+        replies = newest_first([*node.replies, *fetched_replies.pop(node.name, ())])
+        if keep is not None and not keep(node):
+            stack.extend((reply, node_level, prefix) for reply in reversed(replies))
+            continue
+
+        yield prefix + format_comment(node)
+
+        reply_prefix = "    " * node_level + "> "
+        stack.extend(
+            (reply, node_level + 1, reply_prefix) for reply in reversed(replies)
+        )
+
+
+def open_submission(json_url: str) -> tuple[Any, str]:
+    """
+    Return the praw submission of a thread URL, top comments first, and its
+    subreddit. Nothing is fetched until an attribute is read.
+    """
+    match = re.search(r"/r/(\w+)/", json_url)
+    if not match:
+        raise ValueError("No subreddit found in URL")
+
+    submission: Any = make_reddit().submission(url=json_url)  # type: ignore
+    submission.comment_sort = "top"  # sort comments by score (upvotes - downvotes)
+    return submission, match.group(1)
 
-    for reply in sorted(
-        comment.replies,
-        key=lambda reply: reply.created_utc,
-        reverse=True,
-    ):
-        result += "    " * level
-        result += "> " + get_comments(reply, level + 1)
 
-    return result
+def build_reddit_data(
+    title: str,
+    selftext: str | None,
+    subreddit: str,
+    comments: Iterable[Any],
+    logger: logging.Logger,
+    model: str | None = None,
+) -> RedditData:
+    """
+    Store the comment trees once, dropping near-duplicate, bot and noise
+    comments when DEDUP_ENABLED, and build the thread from the store. The
+    tokens of the dropped comments are counted with the model's tokenizer.
+    """
+    with stage("flatten"):
+        store = CommentStore.from_comments(comments)
+    reddit_data = RedditData(
+        title=title, selftext=selftext, subreddit=subreddit, comments=None
+    )
+    if config.DEDUP_ENABLED:
+        with stage("dedup"):
+            store, dedup_stats = dedup_comments(store, model=model)
+        logger.info("Filtered comments: %s", dedup_stats)
+        reddit_data["dedup_stats"] = dedup_stats
+    with stage("transcript"):
+        reddit_data["comments"] = store.transcript()
+    reddit_data["comment_store"] = store
+    return reddit_data
 
 
 @spinner_decorator("Getting Reddit w/ PRAW")
 def get_reddit_praw(
     json_url: str,
     logger: logging.Logger,
+    token_budget: int | None = None,
+    model: str | None = None,
 ) -> RedditData:
     """
     Process the reddit thread JSON and generate a summary.
+
+    "Load more comments" stubs are expanded concurrently until the comments
+    hold token_budget tokens of the model's tokenizer, or completely when it
+    is None.
     """
     try:
-        # Get the subreddit and metadata from the JSON
-        match = re.search(r"/r/(\w+)/", json_url)
-        if match:
-            subreddit = match.group(1)
-        else:
-            raise ValueError("No subreddit found in URL")
-
-        reddit = praw.Reddit(
-            client_id=env_vars["REDDIT_CLIENT_ID"],
-            client_secret=env_vars["REDDIT_CLIENT_SECRET"],
-            password=env_vars["REDDIT_PASSWORD"],
-            user_agent=env_vars["REDDIT_USER_AGENT"],
-            username=env_vars["REDDIT_USERNAME"],
+        with stage("fetch"):
+            submission, subreddit = open_submission(json_url)
+            skipped = expand_more_comments(
+                submission.comments, token_budget, model=model
+            )
+            title: str | None = submission.title
+            selftext: str | None = submission.selftext
+        if skipped:
+            logger.info(f"Token budget reached, skipped {skipped} more-comment stubs")
+
+        if not title:
+            raise ValueError("No title found in JSON")
+
+        return build_reddit_data(
+            title, selftext, subreddit, submission.comments, logger, model=model
         )
 
-        submission: Any = reddit.submission(url=json_url)  # type: ignore
-        submission.comment_sort = "top"  # sort comments by score (upvotes - downvotes)
-        submission.comments.replace_more(limit=None)
+    except Exception as ex:  # pylint: disable=broad-except
+        logger.error(f"Error getting reddit meta data: {ex}")
+        raise ex
+
+
+def make_comment_filter() -> Callable[[Any], bool]:
+    """Return a function keeping the comments a new CommentFilter keeps."""
+    comment_filter = CommentFilter()
+
+    def keep(comment: Any) -> bool:
+        author_name = comment.author.name if comment.author else "[deleted]"
+        return comment_filter.keep(comment.body, author_name)
 
-        title: str | None = submission.title
-        selftext: str | None = submission.selftext
+    return keep
 
+
+@spinner_decorator("Getting Reddit w/ PRAW")
+def stream_reddit_praw(json_url: str, logger: logging.Logger) -> RedditStream:
+    """
+    Fetch the post and the first page of comments of a thread. The comment
+    lines are a generator fetching the "load more comments" stubs as it is
+    consumed, so summarizing can start before the thread is fetched, and the
+    comments past the last summarized chunk are never fetched. Near-duplicate,
+    bot and noise comments are dropped as they arrive when DEDUP_ENABLED.
+    """
+    try:
+        with stage("fetch"):
+            submission, subreddit = open_submission(json_url)
+            title: str | None = submission.title
         if not title:
             raise ValueError("No title found in JSON")
 
-        comment_string = ""
-        for comment in submission.comments:
-            comment_string += get_comments(comment)
-
-        return RedditData(
+        return RedditStream(
             title=title,
-            selftext=selftext,
+            selftext=submission.selftext,
             subreddit=subreddit,
-            comments=comment_string,
+            comment_lines=iter_entry_lines(
+                iter_forest(
+                    submission.comments,
+                    keep=make_comment_filter() if config.DEDUP_ENABLED else None,
+                )
+            ),
         )
 
     except Exception as ex:  # pylint: disable=broad-except
@@ -127,28 +461,170 @@ def get_reddit_praw(
         raise ex
 
 
+@spinner_decorator("Loading saved Reddit JSON")
+def get_reddit_json(
+    data: bytes | str,
+    logger: logging.Logger,
+) -> RedditData:
+    """
+    Build the thread from a saved Reddit listing JSON, without network access.
+    """
+    try:
+        with stage("fetch"):
+            post, comments, skipped = parse_thread(data)
+
+        title: str | None = post.get("title")
+        if not title:
+            raise ValueError("No title found in JSON")
+        if skipped:
+            logger.info(f"Skipped {skipped} unexpanded 'more comments' stubs")
+
+        return build_reddit_data(
+            title,
+            post.get("selftext"),
+            post.get("subreddit", ""),
+            comments,
+            logger,
+        )
+
+    except Exception as ex:  # pylint: disable=broad-except
+        logger.error(f"Error loading reddit JSON: {ex}")
+        raise ex
+
+
+def fetch_token_budget(settings: GenerateSettings) -> int:
+    """
+    Return the comment tokens to fetch for a run: what its summaries hold,
+    SELECTION_FETCH_MULTIPLE times that with settings["select_comments"], so
+    the best comments are picked among more than the first ones.
+    """
+    budget = settings["chunk_token_length"] * settings["max_number_of_summaries"]
+    if settings.get("select_comments"):
+        budget *= config.SELECTION_FETCH_MULTIPLE
+    return budget
+
+
+def fetch_reddit(
+    json_url: str,
+    settings: GenerateSettings,
+    logger: logging.Logger,
+) -> RedditData | RedditStream:
+    """
+    Fetch a thread to summarize with settings. Selecting comments needs them
+    all up front, so with settings["select_comments"] the thread is fetched
+    into a comment store up to fetch_token_budget, otherwise its comments are
+    streamed into the summarizer, see stream_reddit_praw.
+    """
+    if settings.get("select_comments"):
+        return get_reddit_praw(
+            json_url,
+            logger,
+            token_budget=fetch_token_budget(settings),
+            model=settings["selected_model"],
+        )
+    return stream_reddit_praw(json_url, logger)
+
+
+def load_reddit_json(path: str, logger: logging.Logger) -> RedditData:
+    """Build the thread from a saved Reddit listing JSON file."""
+    with open(path, "rb") as json_file:
+        return get_reddit_json(json_file.read(), logger)
+
+
+def default_settings(model_id: str) -> GenerateSettings:
+    """
+    Return the settings the UI starts with for a model in models.json, for
+    callers without the settings page.
+    """
+    models = {model.id: model for model in get_models()}
+    if model_id not in models:
+        raise ValueError(f"Unknown model {model_id!r}, see models.json")
+    model = models[model_id]
+    return {
+        "query": config.DEFAULT_QUERY_TEXT,
+        "chunk_token_length": model.default_chunk_token_length,
+        "max_number_of_summaries": model.default_number_of_summaries,
+        "max_token_length": model.max_token_length,
+        "selected_model": model.id,
+        "system_role": config.DEFAULT_SYSTEM_ROLE,
+        "max_context_length": model.max_context_length,
+        "max_concurrency": model.max_concurrency,
+        "select_comments": True,
+    }
+
+
+def or_no_comments(groups: Iterable[str]) -> Iterator[str]:
+    """Yield the groups holding text, or a placeholder if none do."""
+    empty = True
+    for group in groups:
+        if group.strip():
+            empty = False
+            yield group
+    if empty:
+        yield "No Comments"
+
+
 @spinner_decorator("Generating Summary Data")
 def generate_summary_data(
     settings: GenerateSettings,
-    reddit_data: RedditData,
+    reddit_data: RedditData | RedditStream,
     logger: logging.Logger,
     progress_callback: ProgressCallback = None,
+    stream_callback: StreamCallback = None,
+    chunker: Chunker = chunk_comments,
 ) -> str:
     """
-    Process the reddit thread JSON and generate a summary.
+    Process the reddit thread JSON and generate a summary. With a
+    stream_callback the summaries are streamed, see generate_summaries.
+    chunker splits the comments into groups, by default from the thread's
+    comment store, or e.g. a cached chunker. With settings["select_comments"]
+    it picks the comments worth the most per token for the groups, instead
+    of the groups being the first comments in thread order.
+
+    The comment lines of a RedditStream are chunked as they arrive instead,
+    each chunk is summarized as soon as it is complete, and no lines are read
+    past the last of the max_number_of_summaries chunks. Streamed comments
+    are never selected, fetch_reddit fetches a store to select from instead.
     """
     try:
-        title, selftext, subreddit, comments = (
+        title, selftext, subreddit = (
             reddit_data["title"],
             reddit_data["selftext"],
             reddit_data["subreddit"],
-            reddit_data["comments"],
         )
+        max_groups = settings["max_number_of_summaries"]
 
-        comments = comments or "No Comments"
-        groups = group_bodies_into_chunks(comments, settings["chunk_token_length"]) or [
-            "No Comments",
-        ]
+        groups: Iterable[str]
+        if "comment_lines" in reddit_data:
+            tokenizer = TokenizerRegistry.get(settings["selected_model"])
+            groups = iter_stage(
+                "chunk",
+                islice(
+                    or_no_comments(
+                        iter_chunks(
+                            reddit_data["comment_lines"],
+                            settings["chunk_token_length"],
+                            tokenizer.count,
+                        )
+                    ),
+                    max_groups,
+                ),
+            )
+        else:
+            with stage("chunk"):
+                groups = (
+                    (
+                        chunker(
+                            reddit_data,
+                            settings["chunk_token_length"],
+                            settings["selected_model"],
+                            max_groups if settings.get("select_comments") else None,
+                        )
+                        if reddit_data["comments"]
+                        else []
+                    )
+                    or ["No Comments"]
+                )[:max_groups]
         selftext = selftext or "No selftext"
 
         init_prompt = (
@@ -157,13 +633,31 @@ def generate_summary_data(
             else f"{title}\n{selftext}"
         )
 
-        prompts, summaries = generate_summaries(
+        prompts, summaries, stats = generate_summaries(
             settings=settings,
-            groups=groups[: settings["max_number_of_summaries"]],
+            groups=groups,
             prompt=init_prompt,
             subreddit=subreddit,
             progress_callback=progress_callback,
+            stream_callback=stream_callback,
         )
+        if init_prompt != f"{title}\n{selftext}":
+            stats["llm_calls"] += 1
+
+        final_summary = None
+        if settings.get("reduce_summaries") and len(summaries) > 1:
+            final_summary, reduce_stats = reduce_summaries(summaries, title, settings)
+            stats["llm_calls"] += reduce_stats["calls"]
+            logger.info("Reduced %d summaries: %s", len(summaries), reduce_stats)
+            if progress_callback:
+                progress_callback(
+                    100,
+                    len(summaries) + 1,
+                    f"Combined summary of {len(summaries)} summaries",
+                    final_summary,
+                )
+
+        logger.info("Summary run stats: %s", stats)
 
         output = "\n".join(
             f"============\nSUMMARY COUNT: {i}\n"
@@ -171,6 +665,19 @@ def generate_summary_data(
             f"{summary}\n===========================\n"
             for i, (prompt, summary) in enumerate(zip(prompts, summaries, strict=False))
         )
+        if final_summary is not None:
+            output += f"\n============\nFINAL SUMMARY\n============\n{final_summary}\n"
+        output += (
+            f"\nLLM CALLS: {stats['llm_calls']} (saved {stats['llm_calls_saved']}"
+            f" calls, ~{stats['tokens_saved']} tokens)\n"
+        )
+        if dedup_stats := reddit_data.get("dedup_stats"):
+            output += (
+                f"FILTERED COMMENTS: {dedup_stats['comments_removed']}"
+                f" ({dedup_stats['duplicates']} duplicates, {dedup_stats['noise']}"
+                f" noise, ~{dedup_stats['tokens_removed']}"
+                f" {dedup_stats['tokenizer']} tokens)\n"
+            )
 
         return output
 
@@ -179,6 +686,64 @@ def generate_summary_data(
         raise
 
 
+def combine_summaries_prompt(summaries: list[str], title: str, query: str) -> str:
+    """Build the prompt merging consecutive summaries into one."""
+    parts = "\n\n---\n\n".join(summaries)
+    return (
+        f"{query}\n\n"
+        f"These are summaries of consecutive parts of the comments on the Reddit"
+        f" thread '{title}'. Combine them into one summary:\n\n{parts}"
+    )
+
+
+@Logger.log
+def reduce_summaries(
+    summaries: list[str],
+    title: str,
+    settings: GenerateSettings,
+) -> tuple[str, MapReduceStats]:
+    """
+    Combine the group summaries into one, MAP_REDUCE_FAN_IN at a time, until a
+    single summary of at most max_token_length tokens is left. Every summary
+    in a call gets an equal share of the context.
+    """
+    model = settings["selected_model"]
+    max_tokens = settings["max_token_length"]
+    max_context_length = settings["max_context_length"]
+
+    @timed_stage("reduce")
+    def combine(parts: list[str]) -> str:
+        overhead = num_tokens_from_string(
+            combine_summaries_prompt([""] * len(parts), title, settings["query"]),
+            model,
+        )
+        share = max(1, (max_context_length - max_tokens - overhead) // len(parts))
+        combine_prompt = combine_summaries_prompt(
+            [truncate_to_tokens(part, share, model) for part in parts],
+            title,
+            settings["query"],
+        )
+        return complete_text(
+            prompt=combine_prompt,
+            max_tokens=max(
+                1,
+                min(
+                    max_tokens,
+                    max_context_length - num_tokens_from_string(combine_prompt, model),
+                ),
+            ),
+            settings=settings,
+        )
+
+    return tree_reduce(
+        summaries,
+        carry_context(combine),
+        fits=lambda summary: num_tokens_from_string(summary, model) <= max_tokens,
+        fan_in=config.MAP_REDUCE_FAN_IN,
+        max_workers=settings.get("max_concurrency", 1),
+    )
+
+
 @Logger.log
 def generate_complete_prompt(
     comment_group: str,
@@ -196,71 +761,244 @@ def generate_complete_prompt(
 
 
 @Logger.log
+@timed_stage("fit_prompt")
 def adjust_prompt_length(
     comment_group: str,
     title: str,
     settings: GenerateSettings,
     max_context_length: int,
     subreddit: str,
-) -> str:
-    """Ensure the prompt does not exceed the max_context_length."""
+) -> tuple[str, int]:
+    """
+    Ensure the prompt does not exceed the max_context_length.
+
+    Whole comment lines are dropped from the end of the group, the number of
+    lines to keep is found by bisection. If not even one line fits, the first
+    line is cut at a token offset instead. Returns the prompt and the number of
+    comment lines that were dropped or cut.
+    """
+    model = settings["selected_model"]
     complete_prompt = generate_complete_prompt(
         comment_group,
         title,
         settings,
         subreddit,
     )
-    prompt_token_count = num_tokens_from_string(
-        complete_prompt,
-    )
-    while prompt_token_count > max_context_length and comment_group:
-        comment_group = comment_group[:-1]
-        complete_prompt = generate_complete_prompt(
-            comment_group,
+    if num_tokens_from_string(complete_prompt, model) <= max_context_length:
+        return complete_prompt, 0
+
+    lines = comment_group.splitlines(keepends=True)
+
+    def fits(num_lines: int) -> bool:
+        prompt = generate_complete_prompt(
+            "".join(lines[:num_lines]),
             title,
             settings,
             subreddit,
         )
-        prompt_token_count = num_tokens_from_string(
-            complete_prompt,
-        )
-    return complete_prompt
+        return num_tokens_from_string(prompt, model) <= max_context_length
+
+    low, high = 0, len(lines) - 1  # the full group is known not to fit
+    while low < high:
+        mid = (low + high + 1) // 2
+        if fits(mid):
+            low = mid
+        else:
+            high = mid - 1
+
+    complete_prompt = generate_complete_prompt(
+        "".join(lines[:low]),
+        title,
+        settings,
+        subreddit,
+    )
+    if not low and lines:
+        # tokens can merge across the cut, so shrink until the prompt fits
+        budget = max_context_length - num_tokens_from_string(complete_prompt, model)
+        while budget > 0:
+            candidate = generate_complete_prompt(
+                truncate_to_tokens(lines[0], budget, model),
+                title,
+                settings,
+                subreddit,
+            )
+            excess = num_tokens_from_string(candidate, model) - max_context_length
+            if excess <= 0:
+                complete_prompt = candidate
+                break
+            budget -= excess
+
+    return complete_prompt, len(lines) - low
 
 
 @Logger.log
 def generate_summaries(
     settings: GenerateSettings,
-    groups: list[str],
+    groups: Iterable[str],
     prompt: str,
     subreddit: str,
     progress_callback: ProgressCallback = None,
-) -> tuple[list[str], list[str]]:
-    """Generate the summaries from the prompts."""
+    stream_callback: StreamCallback = None,
+) -> tuple[list[str], list[str], SummaryStats]:
+    """
+    Generate the summaries from the prompts.
+
+    groups may be a lazy iterator: every group is summarized as soon as it is
+    pulled, and the next one is pulled on the calling thread while the
+    earlier ones are summarized. Progress of an iterator is estimated against
+    settings["max_number_of_summaries"] until it is exhausted.
+
+    In "condensed" mode (the default) every group after the first shares one
+    condensed copy of the prompt, computed once per run, and groups are
+    summarized on a thread pool of up to settings["max_concurrency"] workers.
+    In "rolling" mode each later group is summarized in turn, with the thread
+    title and the previous summary as its context. Either way progress_callback
+    is called in group order from the calling thread.
 
-    total_groups = len(groups)
+    With a stream_callback the summaries are streamed, and it is called with
+    the group number and each delta, also from the calling thread. Deltas of
+    a group are held back until the groups before it are reported, so every
+    group's text arrives in one piece and in order.
+    """
+
+    known_total = len(groups) if isinstance(groups, Sized) else None
     max_context_length = settings["max_context_length"]
+    rolling = settings.get("summary_mode", "condensed") == "rolling"
 
-    summaries = [
-        generate_summary(
-            i,
-            comment_group,
-            prompt,
-            settings,
-            max_context_length,
-            subreddit,
-            progress_callback,
-            total_groups,
-        )
-        for i, comment_group in enumerate(groups)
-    ]
+    prompts: list[str] = []
+    summaries: list[str] = []
+    pulled = 0
+    exhausted = False
+
+    def report(i: int, complete_prompt: str, summary: str) -> None:
+        prompts.append(complete_prompt)
+        summaries.append(summary)
+        if progress_callback:
+            total = known_total or (
+                pulled
+                if exhausted
+                else max(pulled, settings["max_number_of_summaries"], 1)
+            )
+            progress = int(((i + 1) / total) * 100)
+            progress_callback(progress, i + 1, complete_prompt, summary)
+
+    condensed: str | None = None
+
+    if rolling:
+        title, context = prompt.split("\n", 1)[0], prompt
+        for i, comment_group in enumerate(groups):
+            pulled = i + 1
+            complete_prompt, summary = generate_summary(
+                i,
+                comment_group,
+                context,
+                settings,
+                max_context_length,
+                subreddit,
+                on_delta=(
+                    (lambda delta, i=i: stream_callback(i + 1, delta))
+                    if stream_callback
+                    else None
+                ),
+            )
+            report(i, complete_prompt, summary)
+            context = f"{title}\n{summary}"
+        exhausted = True
+    else:
+        max_workers = max(1, settings.get("max_concurrency", 1))
+        if known_total is not None:
+            max_workers = max(1, min(max_workers, known_total))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            condensed_future: Future[str] | None = None
+
+            # workers post (group, delta) and finally (group, None) when done
+            events: queue.SimpleQueue[tuple[int, str | None]] = queue.SimpleQueue()
 
-    prompts = [summary[0] for summary in summaries]
-    summaries = [summary[1] for summary in summaries]
+            def summarize_group(i: int, comment_group: str) -> tuple[str, str]:
+                try:
+                    context = (
+                        condensed_future.result() if i and condensed_future else prompt
+                    )
+                    return generate_summary(
+                        i,
+                        comment_group,
+                        context,
+                        settings,
+                        max_context_length,
+                        subreddit,
+                        on_delta=(
+                            (lambda delta: events.put((i, delta)))
+                            if stream_callback
+                            else None
+                        ),
+                    )
+                finally:
+                    events.put((i, None))
+
+            futures: list[Future[tuple[str, str]]] = []
+            done: list[bool] = []
+            held_back: list[list[str]] = []
+            head = 0
+
+            def relay(event: tuple[int, str | None]) -> None:
+                nonlocal head
+                i, delta = event
+                if delta is None:
+                    done[i] = True
+                elif i == head and stream_callback:
+                    stream_callback(i + 1, delta)
+                else:
+                    held_back[i].append(delta)
+                while head < len(futures) and done[head]:
+                    report(head, *futures[head].result())
+                    head += 1
+                    if head < len(futures) and held_back[head] and stream_callback:
+                        stream_callback(head + 1, "".join(held_back[head]))
+
+            for i, comment_group in enumerate(groups):
+                if i == 1:
+                    # submitted before the second group, which waits for it
+                    condensed_future = executor.submit(
+                        carry_context(summarize_summary), prompt, settings
+                    )
+                done.append(False)
+                held_back.append([])
+                futures.append(
+                    executor.submit(carry_context(summarize_group), i, comment_group)
+                )
+                pulled = i + 1
+                while not events.empty():
+                    relay(events.get())
+            exhausted = True
+
+            while head < len(futures):
+                relay(events.get())
+
+            if condensed_future:
+                condensed = condensed_future.result()
+
+    # the old pipeline re-condensed the prompt for every group after the first
+    condensing_calls = int(condensed is not None)
+    llm_calls_saved = max(pulled - 1, 0) - condensing_calls
+    model = settings["selected_model"]
+    tokens_per_call = num_tokens_from_string(
+        shorten_prompt(prompt, config.MAX_BODY_TOKEN_SIZE), model
+    ) + (
+        num_tokens_from_string(condensed, model)
+        if condensed is not None
+        else config.MAX_BODY_TOKEN_SIZE
+    )
+    stats: SummaryStats = {
+        "llm_calls": pulled + condensing_calls,
+        "llm_calls_saved": llm_calls_saved,
+        "tokens_saved": llm_calls_saved * tokens_per_call,
+    }
 
-    return prompts, summaries
+    return prompts, summaries, stats
 
 
 @Logger.log
+@timed_stage("summarize")
 def generate_summary(
     i: int,
     comment_group: str,
@@ -268,33 +1006,47 @@ def generate_summary(
     settings: GenerateSettings,
     max_context_length: int,
     subreddit: str = "",
-    progress_callback: ProgressCallback = None,
-    total_groups: int = 1,
+    on_delta: Callable[[str], None] | None = None,
 ) -> tuple[str, str]:
-    """Generate a single summary."""
-
-    title = summarize_summary(prompt, settings) if i > 0 else prompt
+    """
+    Generate a single summary, with prompt as the context above the comments.
+    With on_delta the summary is streamed and each delta passed to it.
+    """
 
-    complete_prompt = adjust_prompt_length(
+    complete_prompt, dropped_lines = adjust_prompt_length(
         comment_group,
-        title,
+        prompt,
         settings,
         max_context_length,
         subreddit,
     )
+    if dropped_lines:
+        app_logger.warning(
+            "Dropped %d comment lines from group %d to fit the context",
+            dropped_lines,
+            i + 1,
+        )
 
     max_tokens = min(
-        max_context_length - num_tokens_from_string(complete_prompt),
+        max_context_length
+        - num_tokens_from_string(complete_prompt, settings["selected_model"]),
         settings["max_token_length"],
     )
-    summary = complete_text(
-        prompt=complete_prompt,
-        max_tokens=max_tokens,
-        settings=settings,
-    )
-
-    if progress_callback:
-        progress = int(((i + 1) / total_groups) * 100)
-        progress_callback(progress, i + 1, complete_prompt, summary)
+    if on_delta:
+        parts = []
+        for delta in stream_text(
+            prompt=complete_prompt,
+            max_tokens=max_tokens,
+            settings=settings,
+        ):
+            parts.append(delta)
+            on_delta(delta)
+        summary = "".join(parts).strip()
+    else:
+        summary = complete_text(
+            prompt=complete_prompt,
+            max_tokens=max_tokens,
+            settings=settings,
+        )
 
     return complete_prompt, summary
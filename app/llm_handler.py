@@ -1,19 +1,168 @@
 """Handler for the LLM app."""
 
+import asyncio
+import threading
+import time
+from collections.abc import AsyncIterator, Iterator
+
+from config import ConfigVars, get_models
 from data_types.summary import GenerateSettings
 from log_tools import Logger
-from pyrate_limiter import Duration, Limiter, RequestRate
-from services.litellm_connector import complete_litellm_text
-from utils.llm_utils import validate_max_tokens
+from services.anthropic_connector import anthropic_connector
+from services.base import Connector
+from services.litellm_connector import litellm_connector
+from services.openai_connector import openai_connector
+from utils.async_tools import BackgroundLoop
+from utils.llm_utils import num_tokens_from_string, validate_max_tokens
+from utils.rate_limiter import RateLimiter, retry_after_seconds
+from utils.response_cache import ResponseCache
+from utils.run_metrics import current_run, record_llm_request
 from utils.streamlit_decorators import error_to_streamlit
 
+config = ConfigVars()
 app_logger = Logger.get_app_logger()
 
-rate_limits = (RequestRate(10, Duration.MINUTE),)  # 10 requests a minute
+CONNECTORS: dict[str, Connector] = {
+    "litellm": litellm_connector,
+    "openai": openai_connector,
+    "anthropic": anthropic_connector,
+}
+MODEL_CONNECTORS = {model.id: model.connector for model in get_models()}
+MODEL_RATE_LIMITS = {
+    model.id: (model.requests_per_minute, model.tokens_per_minute)
+    for model in get_models()
+}
+
+# One limiter per model, shared by every session in this process.
+rate_limiters: dict[str, RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+response_cache = ResponseCache(
+    config.RESPONSE_CACHE_PATH,
+    max_entries=config.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl_seconds=config.RESPONSE_CACHE_TTL_SECONDS,
+)
+
+
+def get_connector(model_id: str) -> Connector:
+    """Return the connector configured for a model, LiteLLM by default."""
+    return CONNECTORS[MODEL_CONNECTORS.get(model_id, "litellm")]
+
+
+def get_rate_limiter(model_id: str) -> RateLimiter:
+    """
+    Return the limiter for a model, built from its requests_per_minute and
+    tokens_per_minute. Unknown models get DEFAULT_REQUESTS_PER_MINUTE.
+    """
+    with _rate_limiters_lock:
+        if model_id not in rate_limiters:
+            requests_per_minute, tokens_per_minute = MODEL_RATE_LIMITS.get(
+                model_id, (config.DEFAULT_REQUESTS_PER_MINUTE, None)
+            )
+            rate_limiters[model_id] = RateLimiter(
+                requests_per_minute=requests_per_minute,
+                tokens_per_minute=tokens_per_minute,
+            )
+        return rate_limiters[model_id]
+
+
+def rate_limit_wait(model_id: str) -> float:
+    """Return the seconds the next request to a model would wait."""
+    return get_rate_limiter(model_id).wait_time()
+
+
+async def _acquire(limiter: RateLimiter, model: str, tokens: int) -> float:
+    waited = await limiter.aacquire(tokens)
+    if waited:
+        app_logger.info("Rate limited %s for %.1fs", model, waited)
+    return waited
+
+
+async def _record_request(
+    model: str,
+    start: float,
+    prompt_tokens: int,
+    response: str,
+    use_cache: bool,
+    waited: float,
+) -> None:
+    """Record a request sent to the provider in the current run, if any."""
+    if current_run() is None:
+        return
+    record_llm_request(
+        model,
+        time.perf_counter() - start,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=await asyncio.to_thread(
+            num_tokens_from_string, response, model
+        ),
+        cached=False if use_cache else None,
+        rate_limit_wait_seconds=waited,
+    )
+
+
+async def acomplete_text(
+    prompt: str,
+    max_tokens: int,
+    settings: GenerateSettings,
+) -> str:
+    """
+    Async LLM orchestrator, identical requests are answered from the response
+    cache unless settings["use_cache"] is False. Requests wait for the model's
+    rate limiter and are retried when the provider answers with Retry-After.
+    Every answered request is recorded in the current run, see run_metrics.
+    Errors are answered as "Error completing text: ...", or raised with
+    settings["raise_errors"].
+    """
+
+    validate_max_tokens(max_tokens)
+
+    start = time.perf_counter()
+    model = settings["selected_model"]
+    use_cache = settings.get("use_cache", True)
+    cache_key = ResponseCache.make_key(
+        model, settings["system_role"], prompt, max_tokens
+    )
+
+    try:
+        if use_cache:
+            cached = await asyncio.to_thread(response_cache.get, cache_key)
+            if cached is not None:
+                app_logger.info("Response cache hit: %s", response_cache.stats())
+                record_llm_request(model, time.perf_counter() - start, cached=True)
+                return cached
+
+        limiter = get_rate_limiter(model)
+        prompt_tokens = await asyncio.to_thread(num_tokens_from_string, prompt, model)
+        waited = 0.0
+
+        for attempt in range(config.RATE_LIMIT_MAX_RETRIES + 1):
+            waited += await _acquire(limiter, model, max_tokens + prompt_tokens)
+            try:
+                response = await get_connector(model).acomplete(
+                    prompt=prompt,
+                    max_tokens=max_tokens,
+                    settings=settings,
+                )
+                break
+            except Exception as exc:  # pylint: disable=broad-except
+                delay = retry_after_seconds(exc)
+                if delay is None or attempt == config.RATE_LIMIT_MAX_RETRIES:
+                    raise
+                app_logger.warning("%s asked to retry after %.1fs", model, delay)
+                limiter.block_for(delay)
+
+        if use_cache:
+            await asyncio.to_thread(response_cache.set, cache_key, response)
+        await _record_request(model, start, prompt_tokens, response, use_cache, waited)
 
-# Create the rate limiter
-# Pyrate Limiter instance
-limiter = Limiter(*rate_limits)
+        return response
+
+    except Exception as exc:  # pylint: disable=broad-except
+        app_logger.error("Error completing text: %s", exc)
+        if settings.get("raise_errors"):
+            raise
+        return f"Error completing text: {exc}"
 
 
 @Logger.log
@@ -23,19 +172,92 @@ def complete_text(
     max_tokens: int,
     settings: GenerateSettings,
 ) -> str:
-    """LLM orchestrator"""
+    """LLM orchestrator, runs acomplete_text on the shared event loop."""
+
+    return BackgroundLoop.run(
+        acomplete_text(prompt=prompt, max_tokens=max_tokens, settings=settings)
+    )
+
+
+async def astream_text(
+    prompt: str,
+    max_tokens: int,
+    settings: GenerateSettings,
+) -> AsyncIterator[str]:
+    """
+    Streaming variant of acomplete_text, yields the completion in deltas.
+
+    Connectors without astream yield their whole completion as one delta, as
+    do cache hits. Retry-After is only honoured before the first delta, errors
+    are yielded as a final "Error completing text" delta, or raised with
+    settings["raise_errors"]. Recorded like acomplete_text once the completion
+    is complete.
+    """
 
     validate_max_tokens(max_tokens)
 
+    start = time.perf_counter()
+    model = settings["selected_model"]
+    use_cache = settings.get("use_cache", True)
+    cache_key = ResponseCache.make_key(
+        model, settings["system_role"], prompt, max_tokens
+    )
+    parts: list[str] = []
+
     try:
-        limiter.ratelimit("complete_text")
+        if use_cache:
+            cached = await asyncio.to_thread(response_cache.get, cache_key)
+            if cached is not None:
+                app_logger.info("Response cache hit: %s", response_cache.stats())
+                record_llm_request(model, time.perf_counter() - start, cached=True)
+                yield cached
+                return
 
-        return complete_litellm_text(
-            prompt=prompt,
-            max_tokens=max_tokens,
-            settings=settings,
-        )
+        limiter = get_rate_limiter(model)
+        prompt_tokens = await asyncio.to_thread(num_tokens_from_string, prompt, model)
+        waited = 0.0
+        connector = get_connector(model)
+
+        for attempt in range(config.RATE_LIMIT_MAX_RETRIES + 1):
+            waited += await _acquire(limiter, model, max_tokens + prompt_tokens)
+            try:
+                if astream := getattr(connector, "astream", None):
+                    async for delta in astream(prompt, max_tokens, settings):
+                        parts.append(delta)
+                        yield delta
+                else:
+                    parts.append(
+                        await connector.acomplete(prompt, max_tokens, settings)
+                    )
+                    yield parts[-1]
+                break
+            except Exception as exc:  # pylint: disable=broad-except
+                delay = retry_after_seconds(exc)
+                if parts or delay is None or attempt == config.RATE_LIMIT_MAX_RETRIES:
+                    raise
+                app_logger.warning("%s asked to retry after %.1fs", model, delay)
+                limiter.block_for(delay)
 
     except Exception as exc:  # pylint: disable=broad-except
         app_logger.error("Error completing text: %s", exc)
-        return f"Error completing text: {exc}"
+        if settings.get("raise_errors"):
+            raise
+        yield f"Error completing text: {exc}"
+        return
+
+    response = "".join(parts).strip()
+    if use_cache:
+        await asyncio.to_thread(response_cache.set, cache_key, response)
+    await _record_request(model, start, prompt_tokens, response, use_cache, waited)
+
+
+def stream_text(
+    prompt: str,
+    max_tokens: int,
+    settings: GenerateSettings,
+) -> Iterator[str]:
+    """Streaming LLM orchestrator, iterates astream_text on the shared loop."""
+
+    return BackgroundLoop.iterate(
+        astream_text(prompt=prompt, max_tokens=max_tokens, settings=settings)
+    )
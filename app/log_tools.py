@@ -1,18 +1,89 @@
 """Logging configuration for the project."""
 
+import atexit
+import hashlib
+import json
 import logging
-import logging.config
 import os
+import queue
+import threading
+import time
 from collections.abc import Callable
-from datetime import datetime
 from functools import wraps
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from typing import Any, TypeVar
 
+import colorlog
+
 from config import ConfigVars
 
 T = TypeVar("T")
 
 
+class LogPayload:
+    """
+    Defers formatting a logged value until a handler emits the record, then
+    truncates or hashes it according to LOG_PAYLOAD_MODE.
+    """
+
+    __slots__ = ("value",)
+
+    _config = ConfigVars()
+
+    def __init__(self, value: Any) -> None:
+        self.value = value
+
+    def __str__(self) -> str:
+        text = str(self.value)
+        mode = self._config.LOG_PAYLOAD_MODE
+        max_chars = self._config.LOG_PAYLOAD_MAX_CHARS
+
+        if mode == "hash":
+            digest = hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+            return f"<{len(text)} chars sha1:{digest}>"
+        if mode == "truncate" and len(text) > max_chars:
+            return f"{text[:max_chars]}... <{len(text)} chars>"
+        return text
+
+
+class CallStats:
+    """Call count and cumulative duration of a decorated function."""
+
+    __slots__ = ("calls", "total_seconds")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.total_seconds = 0.0
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formats each record as one JSON object per line, without colour codes."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Puts records on the queue untouched. QueueHandler.prepare formats the
+    message and traceback on the calling thread and drops exc_info, so the
+    sinks could neither do that work nor write the exception as a field.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
 class Logger:
     """Class to handle logging configuration."""
 
@@ -24,67 +95,119 @@ class Logger:
     # Create the directory for log files if it doesn't exist
     if not os.path.exists(os.path.dirname(_log_file_path)):
         os.makedirs(os.path.dirname(_log_file_path))
-    _logging_config = {
-        "version": 1,
-        "disable_existing_loggers": False,
-        "formatters": {
-            "color": {
-                "()": "colorlog.ColoredFormatter",
-                "format": "%(log_color)s%(levelname)s:%(message)s",
-                "log_colors": _config.LOG_COLORS,
-            },
-        },
-        "handlers": {
-            "file": {
-                "class": "logging.FileHandler",
-                "formatter": "color",
-                "filename": _log_file_path,
-            },
-            "console": {
-                "class": "logging.StreamHandler",
-                "formatter": "color",
-            },
-        },
-        "loggers": {
-            _log_name: {
-                "handlers": ["file", "console"],
-                "level": logging.INFO,
-            },
-        },
+
+    _formatters: dict[str, logging.Formatter] = {
+        "color": colorlog.ColoredFormatter(
+            "%(log_color)s%(levelname)s:%(message)s",
+            log_colors=_config.LOG_COLORS,
+        ),
+        "plain": logging.Formatter("%(asctime)s %(levelname)s:%(message)s"),
+        "json": JsonLinesFormatter(),
     }
+    if _config.LOG_FORMAT not in _formatters:
+        raise ValueError(
+            f"LOG_FORMAT must be one of {sorted(_formatters)}, "
+            f"got {_config.LOG_FORMAT!r}"
+        )
+
+    # The sinks do the slow work (interpolating the message and LogPayloads,
+    # formatting tracebacks, colouring, disk I/O) on the listener thread, see
+    # DeferredQueueHandler; callers only pay for putting a record on the queue.
+    # Logged values are formatted after the call returns, so log a snapshot of
+    # values that are mutated afterwards.
+    _file_handler = RotatingFileHandler(
+        _log_file_path,
+        maxBytes=_config.LOG_MAX_BYTES,
+        backupCount=_config.LOG_BACKUP_COUNT,
+        encoding="utf-8",
+    )
+    _file_handler.setFormatter(_formatters[_config.LOG_FORMAT])
+    _console_handler = logging.StreamHandler()
+    _console_handler.setFormatter(_formatters["color"])
 
-    # Load the logging configuration using dictConfig
-    try:
-        logging.config.dictConfig(_logging_config)
-    except ValueError as e:
-        print(f"Error occurred during logging configuration: {e!s}")
-        raise
+    _queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    _listener = QueueListener(
+        _queue, _file_handler, _console_handler, respect_handler_level=True
+    )
 
     app_logger = logging.getLogger(_log_name)
+    app_logger.setLevel(logging.INFO)
+    app_logger.addHandler(DeferredQueueHandler(_queue))
+    _listener.start()
+    # Stopping the listener flushes whatever is still queued at shutdown.
+    atexit.register(_listener.stop)
+
     app_logger.debug("Logging is configured.")
 
+    _calls_level = logging.getLevelName(_config.LOG_CALLS_LEVEL)
+    _call_stats: dict[str, CallStats] = {}
+    _stats_lock = threading.Lock()
+
     @classmethod
     def log(
         cls,
         func: Callable[..., T],
         logger: logging.Logger | None = None,
     ) -> Callable[..., T]:
-        """Decorator to log function calls and return values."""
+        """
+        Decorator to log function calls and return values.
+
+        Records are only built when LOG_CALLS_LEVEL is enabled, and return values
+        are formatted lazily. Call counts and durations are always recorded, see
+        get_call_stats().
+        """
         if logger is None:
             logger = cls.app_logger
 
+        name = func.__qualname__
+        level = cls._calls_level
+        stats = cls._call_stats.setdefault(name, CallStats())
+
         @wraps(func)  # preserve the metadata of the decorated function.
         def wrapper(*args: Any, **kwargs: Any) -> T:
-            logging.info("Calling %s", func.__name__)
-            result = func(*args, **kwargs)
-            timestamp: str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            enabled = logger.isEnabledFor(level)
+            if enabled:
+                logger.log(level, "Calling %s", name)
 
-            if logger:
-                logger.info("%s: %s returned %s", timestamp, func.__name__, result)
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with cls._stats_lock:
+                    stats.calls += 1
+                    stats.total_seconds += elapsed
+
+            if enabled:
+                logger.log(
+                    level,
+                    "%s returned %s (%.1f ms)",
+                    name,
+                    LogPayload(result),
+                    elapsed * 1000,
+                )
             return result
 
         return wrapper
 
+    @classmethod
+    def get_call_stats(cls) -> dict[str, dict[str, float]]:
+        """Return the call count and cumulative seconds of each decorated function."""
+        with cls._stats_lock:
+            return {
+                name: {"calls": stats.calls, "total_seconds": stats.total_seconds}
+                for name, stats in cls._call_stats.items()
+                if stats.calls
+            }
+
+    @classmethod
+    def reset_call_stats(cls) -> None:
+        """Reset the call counts and durations."""
+        with cls._stats_lock:
+            for stats in cls._call_stats.values():
+                stats.calls = 0
+                stats.total_seconds = 0.0
+
     @classmethod
     def get_app_logger(cls) -> logging.Logger:
         """Class method to access the app_logger attribute."""
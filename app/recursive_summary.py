@@ -1,199 +1,242 @@
 """
-This script will take a reddit URL and use OpenAI's GPT-3 model to generate
-a summary of the reddit thread.
+Summarize long text files with an LLM, map-reducing over token-sized chunks.
 
 NOTE: provided as a helper script for your GPT apps, not used by the Streamlit app.
+
+Usage:
+    recursive-summary inputs/ notes.txt --output-dir outputs --model openai/gpt-4o
 """
-# Import necessary modules
 
+import argparse
 import os
 import sys
-from typing import Any
+from collections.abc import Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from config import ConfigVars, get_models
+from data_types.summary import GenerateSettings, MapReduceStats
+from llm_handler import complete_text
+from utils.llm_utils import (
+    estimate_word_count,
+    num_tokens_from_string,
+    split_to_tokens,
+)
+from utils.map_reduce import map_reduce
 
-import openai
-from dotenv import load_dotenv
-from pyrate_limiter import Duration, Limiter, RequestRate
-from services.openai_connector import complete_openai_text
-from utils.llm_utils import estimate_word_count, num_tokens_from_string
+config = ConfigVars()
 
 # Constants
 SUMMARY_SIZE = 500
 MAX_CHUNK_TOKEN_SIZE = 1000
-MAX_TOKENS = 2049  # max number of token (note: text-curie-001 has a max of 2048)
-GPT_MODEL = "text-curie-001"  # GPT-3 model to use
-MAX_CHUNK_LENGTH = 2000
-
-# Token bucket rate limiting parameters
-RATE_LIMIT = 10  # max number of requests per minute
-RATE_LIMIT_PERIOD = 60  # period in seconds
-
-try:
-    load_dotenv()
-except FileNotFoundError:
-    print("Could not find .env file. Please create one.")
-    sys.exit(1)
-
-openai.organization = os.environ.get("OPENAI_ORG_ID")
-openai.api_key = os.environ.get("OPENAI_API_KEY")
-
-
-rate_limits = (RequestRate(10, Duration.MINUTE),)  # 10 requests a minute
+SYSTEM_ROLE = "Please summarize the following text:"
 
 
-# Create the rate limiter
-# Pyrate Limiter instance
-limiter = Limiter(*rate_limits)
-
-
-def load_text_file(filename: str) -> str:
-    """
-    Load a text file from the same directory as this script.
-    """
-    script_directory = os.path.dirname(os.path.abspath(__file__))
-    file_path = os.path.join(script_directory, filename)
-    with open(file_path, encoding="utf-8") as file:
-        file_read_data = file.read()
-    return file_read_data
-
-
-def write_text_file(text: str, filename: str) -> str:
-    """
-    Write a text file from the same directory as this script.
-    """
-    script_directory = os.path.dirname(os.path.abspath(__file__))
-    file_path = os.path.join(script_directory, filename)
-
-    with open(file_path, "w", encoding="utf-8") as output_file:
-        output_file.write(text)
-
-    return file_path
-
-
-def recursive_summarization(
-    summary_size: int,
-    chunk_text: str,
-    prefix_text: str = "",
-) -> str:
-    """
-    Recursive summarization function.
-    """
-    summary_string = (
-        f"```{prefix_text}```\n\n"
-        + "new text:\n\n```"
-        # + f"{estimate_word_count(max_token_length)} words:\n"
-        + chunk_text
-        + "```\n\nsummarize then append to last text, write close to [replace] "
+def summarize_prompt(text: str, summary_size: int) -> str:
+    """Build the prompt summarizing a chunk, or merging chunk summaries."""
+    return (
+        f"summarize this text, write close to {estimate_word_count(summary_size)}"
         " words, use extractive summarization if you have too much text, use"
-        " abstractive summarization (no gibberish) if you don't have enough:\n\n```"
+        " abstractive summarization (no gibberish) if you don't have enough:"
+        f"\n\n```{text}```"
     )
 
-    summary_string = summary_string.replace(
-        "[replace]",
-        str(estimate_word_count(summary_size)),
-    )
 
-    response: dict[str, Any] = openai.completions.create(  # type: ignore
-        model=GPT_MODEL,
-        prompt=summary_string,
-        max_tokens=MAX_TOKENS
-        - num_tokens_from_string(summary_string),  # eg 4000-(len chunk+len string)
+def cleanup_prompt(text: str, summary_size: int) -> str:
+    """Build the prompt smoothing out a machine generated summary."""
+    return (
+        "cleanup this machine generated summarization, notably in the ligatures"
+        f" between passages, write close to {estimate_word_count(summary_size)}"
+        " words, use extractive summarization if you have too much text, use"
+        " abstractive summarization if you don't have enough, no gibberish or bad"
+        f" formatting:\n```{text}```"
     )
 
-    if len(response) == 0:
-        print("response=", response)  # error
-        return "Error: unable to generate response."
 
-    response_text = response["choices"][0]["text"]
-    return response_text
+def complete(prompt: str, summary_size: int, settings: GenerateSettings) -> str:
+    """Complete the prompt, raising instead of returning an error message."""
+    max_tokens = min(
+        summary_size,
+        settings["max_context_length"]
+        - num_tokens_from_string(prompt, settings["selected_model"]),
+    )
+    return complete_text(
+        prompt=prompt,
+        max_tokens=max_tokens,
+        settings={**settings, "raise_errors": True},
+    )
 
 
 def summarize_text(
     text: str,
-    max_token_length: int,
-    max_tokens: int = MAX_TOKENS,
-) -> str:
+    settings: GenerateSettings,
+    summary_size: int = SUMMARY_SIZE,
+    fan_in: int = config.MAP_REDUCE_FAN_IN,
+) -> tuple[str, MapReduceStats]:
     """
-    Summarize the prompt using GPT-3.
+    Summarize the text chunk by chunk, then merge the chunk summaries fan_in
+    at a time until one of at most summary_size tokens is left.
     """
-
-    original_num_tokens = num_tokens_from_string(text)
-
-    summary_size = max_token_length if max_token_length <= max_tokens else max_tokens
-
-    chunks = [
-        text[i : i + MAX_CHUNK_LENGTH] for i in range(0, len(text), MAX_CHUNK_LENGTH)
-    ]
-    result = ""
-    summary = ""
-    for chunk in chunks:
-        print("chunk=", chunk)
-
-        limiter.try_acquire("summarize_text")
-        summary = complete_openai_text(
-            chunk,
+    model = settings["selected_model"]
+    chunks = split_to_tokens(text, settings["chunk_token_length"], model)
+
+    return map_reduce(
+        chunks or [text],
+        summarize=lambda chunk: complete(
+            summarize_prompt(chunk, summary_size), summary_size, settings
+        ),
+        combine=lambda summaries: complete(
+            summarize_prompt("\n\n".join(summaries), summary_size),
             summary_size,
-            settings={
-                "selected_model": GPT_MODEL,
-                "system_role": "Please summarize the following text:",
-            },
-        )
-        result += summary
-
-    num_tokens = num_tokens_from_string(result)
-    print("num_tokens=", num_tokens, "original_num_tokens=", original_num_tokens)
-
-    if num_tokens > max_token_length:
-        # iterate again, EXPENSIVE try again
-        print("dividing prompt")
-        return summarize_text(result, max_token_length)
-
-    return result
-
-
-def cleanup_summary(text: str, summary_size: int, max_tokens: int = MAX_TOKENS) -> str:
-    """
-    Cleanup the summary using GPT-3.
-
-    Args:
-        text (str): The text to summarize.
-        summary_size (int): The desired summary size in tokens.
-        max_tokens (int): The maximum number of tokens to use.
-    """
+            settings,
+        ),
+        fits=lambda summary: num_tokens_from_string(summary, model) <= summary_size,
+        fan_in=fan_in,
+        max_workers=settings.get("max_concurrency", 1),
+    )
 
-    summary_size = summary_size if summary_size <= max_tokens else max_tokens
 
-    cleanup_prompt = (
-        "cleanup this machine generated summarization, notably "
-        + "in the ligatures between passages, write close to [replace] words, use"
-        " extractive summarization if you have too much text, use abstractive"
-        " summarization if you don't have enough, no gibberish or bad"
-        f" formatting:\n```{text}```"
+def cleanup_summary(
+    text: str,
+    settings: GenerateSettings,
+    summary_size: int = SUMMARY_SIZE,
+) -> str:
+    """Smooth out the seams between the merged passages of a summary."""
+    return complete(cleanup_prompt(text, summary_size), summary_size, settings)
+
+
+def iter_input_files(paths: Sequence[str], pattern: str = ".txt") -> Iterator[str]:
+    """Yield the given files, and the files ending in pattern in given directories."""
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                file_path = os.path.join(path, name)
+                if name.endswith(pattern) and os.path.isfile(file_path):
+                    yield file_path
+        else:
+            yield path
+
+
+def output_path_for(input_path: str, output_dir: str) -> str:
+    """Return where the summary of input_path is written."""
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    return os.path.join(output_dir, f"{stem}_summary.txt")
+
+
+def summarize_file(
+    input_path: str,
+    output_dir: str,
+    settings: GenerateSettings,
+    summary_size: int = SUMMARY_SIZE,
+    fan_in: int = config.MAP_REDUCE_FAN_IN,
+    cleanup: bool = True,
+) -> tuple[str, MapReduceStats]:
+    """Summarize one file and write the result, return its path and stats."""
+    with open(input_path, encoding="utf-8") as input_file:
+        text = input_file.read()
+
+    summary, stats = summarize_text(text, settings, summary_size, fan_in)
+    if cleanup:
+        summary = cleanup_summary(summary, settings, summary_size)
+        stats["calls"] += 1
+
+    output_path = output_path_for(input_path, output_dir)
+    with open(output_path, "w", encoding="utf-8") as output_file:
+        output_file.write(summary)
+    return output_path, stats
+
+
+def build_settings(model_id: str, chunk_token_length: int) -> GenerateSettings:
+    """Build the settings for a model listed in models.json."""
+    models = {model.id: model for model in get_models()}
+    if model_id not in models:
+        raise ValueError(f"Unknown model {model_id!r}, see models.json")
+    model = models[model_id]
+    return {
+        "query": "",
+        "chunk_token_length": chunk_token_length,
+        "max_number_of_summaries": 0,
+        "max_token_length": model.max_token_length,
+        "selected_model": model.id,
+        "system_role": SYSTEM_ROLE,
+        "max_context_length": model.max_context_length,
+        "max_concurrency": model.max_concurrency,
+    }
+
+
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(
+        prog="recursive-summary",
+        description="Summarize text files, or the .txt files in directories.",
     )
-
-    cleanup_prompt = cleanup_prompt.replace(
-        "[replace]",
-        str(estimate_word_count(summary_size)),
+    parser.add_argument("paths", nargs="+", help="files or directories to summarize")
+    parser.add_argument("--output-dir", default="outputs")
+    parser.add_argument(
+        "--model",
+        default=get_models()[0].id,
+        choices=[model.id for model in get_models()],
+        metavar="MODEL",
+        help="a model id from models.json (default: %(default)s)",
     )
-
-    response: dict[str, Any] = openai.completions.create(  # type: ignore
-        model="text-davinci-003",
-        prompt=cleanup_prompt,
-        best_of=3,
-        max_tokens=max_tokens - num_tokens_from_string(cleanup_prompt),
+    parser.add_argument(
+        "--summary-size",
+        type=int,
+        default=SUMMARY_SIZE,
+        help="target summary length in tokens",
     )
-    if len(response) == 0:
-        print("response error=", response)  # error
-        return "Error: unable to generate response."
-
-    response_text = response["choices"][0]["text"]
-    print("response_text=", response_text)
-    return response_text
-
+    parser.add_argument("--chunk-tokens", type=int, default=MAX_CHUNK_TOKEN_SIZE)
+    parser.add_argument("--fan-in", type=int, default=config.MAP_REDUCE_FAN_IN)
+    parser.add_argument(
+        "--workers", type=int, default=4, help="files summarized in parallel"
+    )
+    parser.add_argument(
+        "--pattern", default=".txt", help="suffix of the files read from directories"
+    )
+    parser.add_argument(
+        "--no-cleanup", action="store_true", help="skip the final cleanup pass"
+    )
+    return parser.parse_args(argv)
 
-print("go")
-filetext = load_text_file("../inputs/HomeSummary.txt")
-output = summarize_text(filetext, SUMMARY_SIZE)
-output = cleanup_summary(output, SUMMARY_SIZE)  # perform a cleanup pass
 
-path = write_text_file(output, "../outputs/recursive_summary_test_output.txt")
-print("Output written to", path)
+def main(argv: Sequence[str] | None = None) -> int:
+    """
+    Summarize every input file in parallel, writing each summary as soon as it
+    is done. Returns 1 if any file failed.
+    """
+    args = parse_args(argv)
+    settings = build_settings(args.model, args.chunk_tokens)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    input_paths = list(iter_input_files(args.paths, args.pattern))
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = {
+            executor.submit(
+                summarize_file,
+                input_path,
+                args.output_dir,
+                settings,
+                args.summary_size,
+                args.fan_in,
+                not args.no_cleanup,
+            ): input_path
+            for input_path in input_paths
+        }
+        for future in as_completed(futures):
+            try:
+                output_path, stats = future.result()
+            except Exception as exc:  # pylint: disable=broad-except
+                failed += 1
+                print(f"{futures[future]}: failed: {exc}", file=sys.stderr)
+                continue
+            print(
+                f"{futures[future]} -> {output_path}"
+                f" ({stats['calls']} calls, {stats['levels']} levels)"
+            )
+
+    print(f"Summarized {len(input_paths) - failed} of {len(input_paths)} files")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
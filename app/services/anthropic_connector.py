@@ -1,16 +1,67 @@
 """Anthropic Connector"""
 
-import anthropic
+from typing import TYPE_CHECKING
+
 from config import ConfigVars
 from data_types.summary import GenerateSettings
 from env import EnvVarsLoader
 from log_tools import Logger
+from services.base import provider_model_name
+from utils.async_tools import BackgroundLoop
+
+if TYPE_CHECKING:
+    import anthropic
 
 config = ConfigVars()
 app_logger = Logger.get_app_logger()
 env_vars = EnvVarsLoader.load_env()
 
 
+class AnthropicConnector:
+    """Anthropic messages API connector with a shared async client."""
+
+    def __init__(self) -> None:
+        self._client: "anthropic.AsyncAnthropic | None" = None
+
+    @property
+    def client(self) -> "anthropic.AsyncAnthropic":
+        """The pooled client, created on first use with the SDK."""
+        if self._client is None:
+            import anthropic
+
+            self._client = anthropic.AsyncAnthropic(
+                api_key=env_vars["ANTHROPIC_API_KEY"]
+            )
+        return self._client
+
+    async def acomplete(
+        self,
+        prompt: str,
+        max_tokens: int,
+        settings: GenerateSettings,
+    ) -> str:
+        """Complete the prompt with the Anthropic messages API."""
+        message = await self.client.messages.create(
+            model=provider_model_name(settings["selected_model"]),
+            max_tokens=max_tokens,
+            system=settings["system_role"],
+            messages=[
+                {"role": "user", "content": prompt},
+            ],
+        )
+
+        # Extracting the text from the first text item in the response list
+        if message.content and isinstance(message.content, list):
+            response_text = next(
+                (item.text for item in message.content if item.type == "text"), ""
+            )
+            return response_text.strip()
+        return "No response received."
+
+
+anthropic_connector = AnthropicConnector()
+
+
 @Logger.log
 def complete_anthropic_text(
     prompt: str,
@@ -31,24 +82,8 @@ def complete_anthropic_text(
     """
 
     try:
-        anthropic_client = anthropic.Anthropic(api_key=env_vars["ANTHROPIC_API_KEY"])
-        message = anthropic_client.messages.create(
-            model=settings["selected_model"],
-            max_tokens=max_tokens,
-            messages=[
-                {"role": "user", "content": prompt},
-                # Optionally, you can add an assistant's last turn here if needed
-            ],
+        return BackgroundLoop.run(
+            anthropic_connector.acomplete(prompt, max_tokens, settings)
         )
-
-        # Assuming the response is a list of dictionaries with "type" and "text"
-        # Extracting the text from the first item in the response list
-        if message.content and isinstance(message.content, list):
-            response_text = next(
-                (item.text for item in message.content if item.type == "text"), ""
-            )
-            return response_text.strip()
-        else:
-            return "No response received."
     except Exception as err:  # pylint: disable=broad-except
         return f"error: {err}"
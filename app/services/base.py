@@ -0,0 +1,37 @@
+"""Common interface for the LLM connectors."""
+
+from collections.abc import AsyncIterator
+from typing import Protocol
+
+from data_types.summary import GenerateSettings
+
+
+class Connector(Protocol):
+    """An LLM provider that completes a prompt asynchronously."""
+
+    async def acomplete(
+        self,
+        prompt: str,
+        max_tokens: int,
+        settings: GenerateSettings,
+    ) -> str:
+        """Complete the prompt, raising on provider errors."""
+        ...
+
+
+class StreamingConnector(Connector, Protocol):
+    """A connector that can also yield the completion as it is generated."""
+
+    def astream(
+        self,
+        prompt: str,
+        max_tokens: int,
+        settings: GenerateSettings,
+    ) -> AsyncIterator[str]:
+        """Yield the completion text in deltas, raising on provider errors."""
+        ...
+
+
+def provider_model_name(model_id: str) -> str:
+    """Strip the provider prefix from a models.json id, e.g. "openai/gpt-4"."""
+    return model_id.split("/", 1)[-1]
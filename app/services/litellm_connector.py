@@ -1,14 +1,14 @@
 """LiteLLM Connector."""
 
 import os
+from collections.abc import AsyncIterator
 from typing import Any
 
 from config import ConfigVars
 from data_types.summary import GenerateSettings
 from env import EnvVarsLoader
-from litellm import completion
-from litellm.types.utils import ModelResponse
 from log_tools import Logger
+from utils.async_tools import BackgroundLoop
 
 config = ConfigVars()
 app_logger = Logger.get_app_logger()
@@ -21,47 +21,94 @@ os.environ["ANTHROPIC_API_KEY"] = env_vars["ANTHROPIC_API_KEY"]
 os.environ["GEMINI_API_KEY"] = env_vars["GEMINI_API_KEY"]
 
 
-@Logger.log
-def complete_litellm_text(
-    prompt: str,
-    max_tokens: int,
-    settings: GenerateSettings,
-) -> str:
-    try:
-        common_args = {
-            "model": settings["selected_model"],
-            "max_tokens": max_tokens,
-        }
+def extract_content(response: Any) -> str:
+    """Extract the completion text from a LiteLLM response."""
+    from litellm.types.utils import ModelResponse
+
+    if isinstance(response, ModelResponse):
+        if response.choices and len(response.choices) > 0:
+            choice: Any = response.choices[0]
+            if hasattr(choice, "message"):
+                return choice.message.content.strip() if choice.message.content else ""
+            elif hasattr(choice, "text"):
+                return choice.text.strip() if choice.text else ""
+    elif isinstance(response, dict):
+        if "choices" in response and len(response["choices"]) > 0:
+            choice = response["choices"][0]
+            if "message" in choice and "content" in choice["message"]:
+                return choice["message"]["content"].strip()
+            elif "text" in choice:
+                return choice["text"].strip()
 
-        response = completion(
-            **common_args,
+    return "Unable to extract content from the response."
+
+
+class LiteLLMConnector:
+    """
+    LiteLLM connector.
+
+    LiteLLM caches its provider clients per event loop, running every request
+    on the shared BackgroundLoop keeps those connection pools alive. LiteLLM
+    itself is imported on the first request, it is slow to import.
+    """
+
+    async def acomplete(
+        self,
+        prompt: str,
+        max_tokens: int,
+        settings: GenerateSettings,
+    ) -> str:
+        """Complete the prompt with LiteLLM's async completion API."""
+        import litellm
+
+        response = await litellm.acompletion(
+            model=settings["selected_model"],
+            max_tokens=max_tokens,
             messages=[
                 {"role": "system", "content": settings["system_role"]},
                 {"role": "user", "content": prompt},
             ],
         )
+        app_logger.debug("response=%s", response)
+
+        return extract_content(response)
 
-        print("response=", response)
-
-        if isinstance(response, ModelResponse):
-            if response.choices and len(response.choices) > 0:
-                choice: Any = response.choices[0]
-                if hasattr(choice, "message"):
-                    return (
-                        choice.message.content.strip() if choice.message.content else ""
-                    )
-                elif hasattr(choice, "text"):
-                    return choice.text.strip() if choice.text else ""
-        elif isinstance(response, dict):
-            if "choices" in response and len(response["choices"]) > 0:
-                choice = response["choices"][0]
-                if "message" in choice and "content" in choice["message"]:
-                    return choice["message"]["content"].strip()
-                elif "text" in choice:
-                    return choice["text"].strip()
-
-        return "Unable to extract content from the response."
+    async def astream(
+        self,
+        prompt: str,
+        max_tokens: int,
+        settings: GenerateSettings,
+    ) -> AsyncIterator[str]:
+        """Yield the completion in deltas with LiteLLM's streaming API."""
+        import litellm
 
+        response = await litellm.acompletion(
+            model=settings["selected_model"],
+            max_tokens=max_tokens,
+            messages=[
+                {"role": "system", "content": settings["system_role"]},
+                {"role": "user", "content": prompt},
+            ],
+            stream=True,
+        )
+        async for chunk in response:
+            if chunk.choices and (delta := chunk.choices[0].delta.content):
+                yield delta
+
+
+litellm_connector = LiteLLMConnector()
+
+
+@Logger.log
+def complete_litellm_text(
+    prompt: str,
+    max_tokens: int,
+    settings: GenerateSettings,
+) -> str:
+    try:
+        return BackgroundLoop.run(
+            litellm_connector.acomplete(prompt, max_tokens, settings)
+        )
     except ValueError as err:
         return f"Value error: {err}"
     except Exception as err:
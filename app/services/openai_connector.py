@@ -1,19 +1,64 @@
 """OpenAI Connector."""
 
-import openai
+from typing import TYPE_CHECKING
+
 from config import ConfigVars
 from data_types.summary import GenerateSettings
 from env import EnvVarsLoader
 from log_tools import Logger
-from openai import OpenAI
+from services.base import provider_model_name
+from utils.async_tools import BackgroundLoop
+
+if TYPE_CHECKING:
+    import openai
 
-client = OpenAI()
 config = ConfigVars()
 app_logger = Logger.get_app_logger()
 env_vars = EnvVarsLoader.load_env()
 
-openai.organization = env_vars["OPENAI_ORG_ID"]
-openai.api_key = env_vars["OPENAI_API_KEY"]
+
+class OpenAIConnector:
+    """OpenAI chat completions connector with a shared async client."""
+
+    def __init__(self) -> None:
+        self._client: "openai.AsyncOpenAI | None" = None
+
+    @property
+    def client(self) -> "openai.AsyncOpenAI":
+        """The pooled client, created on first use with the SDK."""
+        if self._client is None:
+            import openai
+
+            self._client = openai.AsyncOpenAI(
+                api_key=env_vars["OPENAI_API_KEY"],
+                organization=env_vars["OPENAI_ORG_ID"],
+            )
+        return self._client
+
+    async def acomplete(
+        self,
+        prompt: str,
+        max_tokens: int,
+        settings: GenerateSettings,
+    ) -> str:
+        """Complete the prompt with the OpenAI chat completions API."""
+        response = await self.client.chat.completions.create(
+            model=provider_model_name(settings["selected_model"]),
+            max_tokens=max_tokens,
+            messages=[
+                {"role": "system", "content": settings["system_role"]},
+                {"role": "user", "content": prompt},
+            ],
+        )
+
+        if response.choices:
+            content = response.choices[0].message.content
+            return content.strip() if content else ""
+
+        return "Response doesn't have choices or choices have no text."
+
+
+openai_connector = OpenAIConnector()
 
 
 @Logger.log
@@ -35,29 +80,12 @@ def complete_openai_text(
         str: The completed text.
     """
 
-    try:
-        common_args = {
-            "model": settings["selected_model"],
-            "max_tokens": max_tokens,
-        }
+    import openai
 
-        response = openai.chat.completions.create(
-            **common_args,
-            messages=[
-                {"role": "system", "content": settings["system_role"]},
-                {"role": "user", "content": prompt},
-            ],
+    try:
+        return BackgroundLoop.run(
+            openai_connector.acomplete(prompt, max_tokens, settings)
         )
-
-        # if not isinstance(response, OpenAIObject):
-        #     raise ValueError("Invalid Response")
-
-        if response.choices:
-            content = response.choices[0].message.content
-            return content.strip()
-
-        return "Response doesn't have choices or choices have no text."
-
     except openai.OpenAIError as err:
         return f"OpenAI Error: {err}"
     except ValueError as err:
@@ -0,0 +1,39 @@
+"""Shared pytest configuration."""
+
+import os
+
+import pytest
+
+# Modules such as generate_data load the environment at import time; provide
+# placeholders so the tests never need real credentials.
+for _name in (
+    "OPENAI_ORG_ID",
+    "OPENAI_API_KEY",
+    "REDDIT_CLIENT_ID",
+    "REDDIT_CLIENT_SECRET",
+    "REDDIT_USER_AGENT",
+    "ANTHROPIC_API_KEY",
+    "GEMINI_API_KEY",
+):
+    os.environ.setdefault(_name, "test")
+
+
+@pytest.fixture(autouse=True)
+def isolated_response_cache(tmp_path, monkeypatch):
+    """Keep the LLM response cache of each test in a temporary directory."""
+    import llm_handler
+    from utils.response_cache import ResponseCache
+
+    cache = ResponseCache(
+        str(tmp_path / "responses.sqlite3"), max_entries=100, ttl_seconds=60
+    )
+    monkeypatch.setattr(llm_handler, "response_cache", cache)
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def isolated_rate_limiters(monkeypatch):
+    """Give each test fresh rate limiters, so budgets don't leak between tests."""
+    import llm_handler
+
+    monkeypatch.setattr(llm_handler, "rate_limiters", {})
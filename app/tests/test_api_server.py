@@ -0,0 +1,129 @@
+"""Test api_server.py."""
+
+import asyncio
+import json
+
+import llm_handler
+from aiohttp.test_utils import TestClient, TestServer
+from api_server import SummaryService, make_app
+from data_types.summary import GenerateSettings
+from utils.rate_limiter import RateLimiter
+
+THREAD = [
+    {
+        "kind": "Listing",
+        "data": {
+            "children": [
+                {
+                    "kind": "t3",
+                    "data": {"title": "Title", "selftext": "Body", "subreddit": "test"},
+                }
+            ]
+        },
+    },
+    {
+        "kind": "Listing",
+        "data": {
+            "children": [
+                {
+                    "kind": "t1",
+                    "data": {
+                        "id": f"c{i}",
+                        "author": "alice",
+                        "body": f"comment number {i} " * 20,
+                        "created_utc": 1_686_000_000 + i,
+                        "replies": "",
+                    },
+                }
+                for i in range(30)
+            ]
+        },
+    },
+]
+REQUEST = {
+    "thread": THREAD,
+    "model": "openai/gpt-4",
+    "settings": {"chunk_token_length": 200, "use_cache": False},
+}
+
+
+class SlowConnector:
+    """Connector stub with some latency, counting its calls."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def acomplete(
+        self, prompt: str, max_tokens: int, settings: GenerateSettings
+    ) -> str:
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return f"summary {self.calls}"
+
+
+def parse_events(body: str) -> list[tuple[str, dict]]:
+    """Split a server-sent event stream into (event, data) pairs."""
+    events = []
+    for block in body.strip().split("\n\n"):
+        event_line, data_line = block.split("\n")
+        events.append((event_line[len("event: ") :], json.loads(data_line[6:])))
+    return events
+
+
+def post_summaries(service: SummaryService, *bodies) -> list:
+    """POST every body concurrently and return the responses' status and text."""
+
+    async def run() -> list:
+        async with TestClient(TestServer(make_app(service))) as client:
+
+            async def post(body):
+                response = await client.post("/summaries", json=body)
+                return response.status, await response.text()
+
+            return await asyncio.gather(*(post(body) for body in bodies))
+
+    return asyncio.run(run())
+
+
+def test_summaries_stream_chunks_then_output(monkeypatch) -> None:
+    """Test every chunk summary is streamed before the final output."""
+    monkeypatch.setitem(llm_handler.CONNECTORS, "litellm", SlowConnector())
+    monkeypatch.setattr(llm_handler, "get_rate_limiter", lambda _: RateLimiter())
+
+    [(status, body)] = post_summaries(SummaryService(), REQUEST)
+
+    assert status == 200
+    events = parse_events(body)
+    assert [event for event, _ in events] == ["chunk", "chunk", "chunk", "done"]
+    assert [data["index"] for _, data in events[:-1]] == [1, 2, 3]
+    assert all(data["summary"] in events[-1][1]["output"] for _, data in events[:-1])
+
+
+def test_identical_requests_share_one_run(monkeypatch) -> None:
+    """Test concurrent identical requests are coalesced into one pipeline run."""
+    connector = SlowConnector()
+    monkeypatch.setitem(llm_handler.CONNECTORS, "litellm", connector)
+    monkeypatch.setattr(llm_handler, "get_rate_limiter", lambda _: RateLimiter())
+    service = SummaryService()
+
+    responses = post_summaries(service, REQUEST, REQUEST, REQUEST)
+
+    assert service.started == 1 and service.coalesced == 2
+    assert connector.calls == 4  # three chunks and one condensed selftext context
+    assert len({body for _, body in responses}) == 1
+    assert not service.runs
+
+
+def test_bad_requests_are_rejected() -> None:
+    """Test invalid bodies get a 400 without starting a run."""
+    service = SummaryService()
+
+    responses = post_summaries(
+        service,
+        {"url": "https://example.com/"},
+        {"thread": THREAD, "settings": {"bogus": 1}},
+        {},
+    )
+
+    assert [status for status, _ in responses] == [400, 400, 400]
+    assert service.started == 0
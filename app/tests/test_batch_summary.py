@@ -0,0 +1,185 @@
+"""Test batch_summary.py."""
+
+import json
+from types import SimpleNamespace
+
+import batch_summary
+import generate_data
+import llm_handler
+from batch_summary import main
+from config import ConfigVars
+from data_types.summary import GenerateSettings
+from utils.rate_limiter import RateLimiter
+
+
+def saved_thread(title: str) -> str:
+    """Build a saved Reddit listing with one comment."""
+    return json.dumps(
+        [
+            {
+                "kind": "Listing",
+                "data": {
+                    "children": [
+                        {
+                            "kind": "t3",
+                            "data": {
+                                "title": title,
+                                "selftext": "Body",
+                                "subreddit": "test",
+                            },
+                        }
+                    ]
+                },
+            },
+            {
+                "kind": "Listing",
+                "data": {
+                    "children": [
+                        {
+                            "kind": "t1",
+                            "data": {
+                                "id": "a",
+                                "author": "alice",
+                                "body": f"a comment on {title}",
+                                "created_utc": 1_686_000_000,
+                                "replies": "",
+                            },
+                        }
+                    ]
+                },
+            },
+        ]
+    )
+
+
+class ThreadConnector:
+    """Connector stub that fails on the threads listed in fail_on."""
+
+    def __init__(self, *fail_on: str) -> None:
+        self.fail_on = fail_on
+        self.prompts: list[str] = []
+
+    async def acomplete(
+        self, prompt: str, max_tokens: int, settings: GenerateSettings
+    ) -> str:
+        self.prompts.append(prompt)
+        if any(title in prompt for title in self.fail_on):
+            raise RuntimeError("provider down")
+        return "summary"
+
+
+def test_main_checkpoints_and_resumes(tmp_path, monkeypatch, capsys) -> None:
+    """Test finished threads are checkpointed and skipped by the next run."""
+    for title in ("Alpha", "Beta"):
+        (tmp_path / f"{title}.json").write_text(saved_thread(title))
+    thread_list = tmp_path / "threads.txt"
+    thread_list.write_text(
+        f"# nightly\n{tmp_path / 'Alpha.json'}\n\n{tmp_path / 'Beta.json'}\n"
+    )
+    output_dir = tmp_path / "out"
+    monkeypatch.setattr(llm_handler, "get_rate_limiter", lambda _: RateLimiter())
+    argv = [str(thread_list), "--output-dir", str(output_dir), "--model"]
+    argv.append("openai/gpt-4")
+
+    monkeypatch.setitem(llm_handler.CONNECTORS, "litellm", ThreadConnector("Beta"))
+    assert main(argv) == 1
+    assert "Beta.json: failed" in capsys.readouterr().err
+    assert len(list(output_dir.glob("*.json"))) == 1
+
+    connector = ThreadConnector()
+    monkeypatch.setitem(llm_handler.CONNECTORS, "litellm", connector)
+    assert main(argv) == 0
+
+    out = capsys.readouterr().out
+    assert "1 of 2 threads already done" in out
+    assert "Summarized 1 of 1 pending threads" in out
+    assert not any("Alpha" in prompt for prompt in connector.prompts)
+    results = [json.loads(path.read_text()) for path in output_dir.glob("*.json")]
+    assert sorted(result["title"] for result in results) == ["Alpha", "Beta"]
+    assert len(list(output_dir.glob("*_Alpha.txt"))) == 1
+
+
+def test_summary_quoting_an_error_is_not_a_failure(tmp_path, monkeypatch) -> None:
+    """Test failures come from the LLM calls, not from the summary's text."""
+
+    class QuotingConnector:
+        async def acomplete(
+            self, prompt: str, max_tokens: int, settings: GenerateSettings
+        ) -> str:
+            return "Users quote 'Error completing text: timeout' from the app."
+
+    (tmp_path / "Alpha.json").write_text(saved_thread("Alpha"))
+    thread_list = tmp_path / "threads.txt"
+    thread_list.write_text(f"{tmp_path / 'Alpha.json'}\n")
+    monkeypatch.setitem(llm_handler.CONNECTORS, "litellm", QuotingConnector())
+    monkeypatch.setattr(llm_handler, "get_rate_limiter", lambda _: RateLimiter())
+
+    argv = [str(thread_list), "--output-dir", str(tmp_path / "out"), "--model"]
+    assert main([*argv, "openai/gpt-4"]) == 0
+    assert len(list((tmp_path / "out").glob("*.json"))) == 1
+
+
+def test_url_threads_are_fetched_whole_to_select_comments(
+    tmp_path, monkeypatch
+) -> None:
+    """Test URL threads are selected from a larger fetch, not streamed."""
+    comments = [
+        SimpleNamespace(
+            id=f"c{i}",
+            author=SimpleNamespace(name=f"user{i}"),
+            created_utc=1_686_000_000,
+            score=1000 if i == 29 else 1,
+            body=f"comment {i} about topic{i} with its own words{i} here{i}",
+            replies=[],
+        )
+        for i in range(30)
+    ]
+    budgets: list[int | None] = []
+
+    def get_reddit_praw(json_url, logger, token_budget=None, model=None):
+        budgets.append(token_budget)
+        return generate_data.build_reddit_data(
+            "Alpha", "Body", "test", comments, logger
+        )
+
+    def stream_reddit_praw(json_url, logger):
+        raise AssertionError("a thread to select comments from was streamed")
+
+    monkeypatch.setattr(generate_data, "get_reddit_praw", get_reddit_praw)
+    monkeypatch.setattr(generate_data, "stream_reddit_praw", stream_reddit_praw)
+    connector = ThreadConnector()
+    monkeypatch.setitem(llm_handler.CONNECTORS, "litellm", connector)
+    monkeypatch.setattr(llm_handler, "get_rate_limiter", lambda _: RateLimiter())
+    thread_list = tmp_path / "threads.txt"
+    thread_list.write_text("https://www.reddit.com/r/test/comments/abc/alpha/\n")
+
+    argv = [str(thread_list), "--output-dir", str(tmp_path / "out")]
+    argv += ["--chunk-tokens", "120", "--summaries", "1", "--model", "openai/gpt-4"]
+    assert main(argv) == 0
+    assert budgets == [120 * ConfigVars().SELECTION_FETCH_MULTIPLE]
+    assert "comment 29 " in connector.prompts[0]  # past what streaming reads
+
+
+def test_resumed_run_keeps_the_dated_query(tmp_path, monkeypatch) -> None:
+    """Test a run resumed the next day finds its checkpoints and prompts."""
+    for title in ("Alpha", "Beta"):
+        (tmp_path / f"{title}.json").write_text(saved_thread(title))
+    thread_list = tmp_path / "threads.txt"
+    thread_list.write_text(f"{tmp_path / 'Alpha.json'}\n{tmp_path / 'Beta.json'}\n")
+    monkeypatch.setattr(llm_handler, "get_rate_limiter", lambda _: RateLimiter())
+    argv = [str(thread_list), "--output-dir", str(tmp_path / "out"), "--model"]
+    argv.append("openai/gpt-4")
+
+    monkeypatch.setattr(batch_summary.config, "DEFAULT_QUERY_TEXT", "(Day 1) Sum up.")
+    monkeypatch.setitem(llm_handler.CONNECTORS, "litellm", ThreadConnector("Beta"))
+    assert main(argv) == 1
+
+    monkeypatch.setattr(batch_summary.config, "DEFAULT_QUERY_TEXT", "(Day 2) Sum up.")
+    connector = ThreadConnector()
+    monkeypatch.setitem(llm_handler.CONNECTORS, "litellm", connector)
+    assert main(argv) == 0
+
+    assert connector.prompts, "Beta was not summarized again"
+    assert not any("Alpha" in prompt for prompt in connector.prompts)
+    assert all("(Day 1)" in prompt for prompt in connector.prompts)
+    assert len(list((tmp_path / "out").glob("*.json"))) == 2
@@ -0,0 +1,73 @@
+"""Test ui/cached_data.py."""
+
+import generate_data
+import pytest
+from data_types.summary import RedditData
+from ui import cached_data
+from ui.cached_data import clear_caches, fetch_thread, plan_chunks
+
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    """Start and end every test with empty caches."""
+    clear_caches()
+    yield
+    clear_caches()
+
+
+def test_fetch_thread_is_cached_by_url_until_cleared(monkeypatch) -> None:
+    """Test a thread is fetched again only for more comments, or once cleared."""
+    fetched: list[tuple[str, int | None]] = []
+
+    def get_reddit_praw(
+        json_url: str, logger, token_budget=None, model=None
+    ) -> RedditData:
+        fetched.append((json_url[-6:], token_budget))
+        return RedditData(title="T", selftext="", subreddit="s", comments="c")
+
+    monkeypatch.setattr(generate_data, "get_reddit_praw", get_reddit_praw)
+
+    assert fetch_thread("https://reddit.com/r/a/1.json", 100)["title"] == "T"
+    fetch_thread("https://reddit.com/r/a/1.json", 100)
+    fetch_thread("https://reddit.com/r/a/1.json", 50)  # fewer summaries
+    fetch_thread("https://reddit.com/r/a/2.json", 100)
+    assert fetched == [("1.json", 100), ("2.json", 100)]
+
+    fetch_thread("https://reddit.com/r/a/1.json", 400)  # longer chunks
+    fetch_thread("https://reddit.com/r/a/1.json", None)  # the whole thread
+    fetch_thread("https://reddit.com/r/a/1.json", 800)
+    assert fetched[2:] == [("1.json", 400), ("1.json", None)]
+
+    clear_caches()
+    fetch_thread("https://reddit.com/r/a/1.json", 100)
+    assert len(fetched) == 5
+
+
+def test_plan_chunks_is_shared_by_tokenizer(monkeypatch) -> None:
+    """Test chunk plans are reused across models with the same tokenizer."""
+    calls: list[tuple[int, str | None]] = []
+
+    def chunk_comments(
+        reddit_data, token_length, model=None, max_chunks=None
+    ) -> list[str]:
+        calls.append((token_length, model))
+        return [reddit_data["comments"]]
+
+    monkeypatch.setattr(cached_data, "chunk_comments", chunk_comments)
+
+    def thread(comments: str) -> RedditData:
+        return RedditData(title="T", selftext="", subreddit="s", comments=comments)
+
+    # both use cl100k_base
+    assert plan_chunks(thread("comments"), 500, "openai/gpt-4") == ["comments"]
+    assert plan_chunks(thread("comments"), 500, "openai/gpt-3.5-turbo") == ["comments"]
+    plan_chunks(thread("comments"), 800, "openai/gpt-4")
+    plan_chunks(thread("other comments"), 500, "openai/gpt-4")
+    plan_chunks(thread("comments"), 500, "openai/gpt-4o")  # o200k_base
+
+    assert calls == [
+        (500, "openai/gpt-4"),
+        (800, "openai/gpt-4"),
+        (500, "openai/gpt-4"),
+        (500, "openai/gpt-4o"),
+    ]
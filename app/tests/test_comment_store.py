@@ -0,0 +1,160 @@
+"""Test utils/comment_store.py."""
+
+import pickle
+from types import SimpleNamespace
+
+from generate_data import get_comments
+from utils.comment_store import CommentStore, chunk_comments, select_chunks
+from utils.llm_utils import normalize_line, num_tokens_from_string
+
+
+def make_comment(i: int, replies=(), body: str | None = None, score: int | None = None):
+    """Build a stand-in for a PRAW comment."""
+    return SimpleNamespace(
+        id=f"c{i}",
+        author=SimpleNamespace(name=f"user{i}") if i % 3 else None,
+        created_utc=1_686_000_000 + i * 60,
+        score=i if score is None else score,
+        body=body if body is not None else f"comment {i} " + "words " * (i % 7),
+        replies=list(replies),
+    )
+
+
+def make_thread():
+    """Build two top-level comments, the first with nested multi-line replies."""
+    return [
+        make_comment(
+            1,
+            [
+                make_comment(2, body="first line\n\nsecond line"),
+                make_comment(3, [make_comment(4)]),
+            ],
+        ),
+        make_comment(5),
+    ]
+
+
+def test_store_keeps_transcript_order_and_columns() -> None:
+    """Test the records follow the transcript and format to the same string."""
+    thread = make_thread()
+
+    store = CommentStore.from_comments(thread)
+
+    assert len(store) == 5
+    assert store.ids == ["c1", "c3", "c4", "c2", "c5"]  # newest reply first
+    assert list(store.parents) == [-1, 0, 1, 0, -1]
+    assert list(store.depths) == [0, 1, 2, 1, 0]
+    assert store.authors[1] == "[deleted]"
+    assert list(store.scores) == [1, 3, 4, 2, 5]
+    assert store.transcript() == "".join(get_comments(c) for c in thread)
+
+
+def test_iter_chunks_uses_cached_counts_and_keeps_budget() -> None:
+    """Test chunks stay within the budget and the counts are computed once."""
+    thread = [make_comment(i, [make_comment(100 + i)]) for i in range(60)]
+    store = CommentStore.from_comments(thread)
+    expected = "".join(map(normalize_line, store.transcript()[:-1].split("\n")))
+
+    chunks = list(store.iter_chunks(80, "openai/gpt-4"))
+
+    assert len(chunks) > 1
+    assert "".join(chunks) == expected
+    assert all(num_tokens_from_string(chunk) <= 80 for chunk in chunks)
+    # comments are never split between chunks
+    assert all(chunk.startswith(("2023", "> ")) for chunk in chunks)
+    # gpt-3.5-turbo shares gpt-4's tokenizer, and so its counts
+    assert store.token_counts("openai/gpt-4") is store.token_counts(
+        "openai/gpt-3.5-turbo"
+    )
+
+
+def test_iter_chunks_splits_long_comment_between_lines() -> None:
+    """Test a comment longer than the budget is cut at line boundaries."""
+    body = "\n".join(f"line {i} " + "word " * 10 for i in range(20))
+    store = CommentStore.from_comments([make_comment(1, body=body), make_comment(2)])
+
+    chunks = list(store.iter_chunks(50))
+
+    assert len(chunks) > 2
+    assert all(num_tokens_from_string(chunk) <= 50 for chunk in chunks)
+    assert "comment 2" in chunks[-1]
+
+
+def test_iter_chunks_never_yields_an_empty_chunk() -> None:
+    """Test a comment with an overlong first line does not flush an empty chunk."""
+    store = CommentStore.from_comments(
+        [
+            make_comment(1, body="short"),
+            make_comment(2, body="x" * 500),
+            make_comment(3, body="another"),
+        ]
+    )
+
+    chunks = list(store.iter_chunks(60))
+
+    assert all(chunk.strip() for chunk in chunks)
+    assert "short" in chunks[0] and "x" * 100 in chunks[1]
+    assert "another" in chunks[-1]
+
+
+def test_store_pickles_with_its_counts() -> None:
+    """Test a store survives st.cache_data's pickling, caches included."""
+    store = CommentStore.from_comments(make_thread())
+    counts = store.token_counts()
+
+    copy = pickle.loads(pickle.dumps(store))
+
+    assert copy.transcript() == store.transcript()
+    assert copy.token_counts() == counts
+
+
+def test_chunk_comments_falls_back_to_the_transcript() -> None:
+    """Test threads without a store are chunked from their transcript."""
+    thread = {"title": "T", "selftext": "", "subreddit": "s", "comments": "a\nb\n"}
+
+    assert chunk_comments(thread, 100) == ["a\nb\n\n"]
+
+
+def ranked_thread():
+    """
+    A long low-score chain first, then a weak comment with a great reply, then
+    a removed comment and a high-score comment last.
+    """
+    chain = make_comment(10, body="meh " * 40, score=1)
+    for i in range(11, 20):
+        chain = make_comment(i, [chain], body="meh " * 40, score=1)
+    return [
+        chain,
+        make_comment(20, [make_comment(21, body="great insight", score=900)], score=0),
+        make_comment(22, body="[removed]", score=50),
+        make_comment(23, body="the answer", score=500),
+    ]
+
+
+def test_select_prefers_valuable_comments_and_keeps_context() -> None:
+    """Test late high-score comments beat a long low-score subtree."""
+    store = CommentStore.from_comments(ranked_thread())
+    counts = store.token_counts()
+    budget = sum(counts[store.ids.index(f"c{i}")] for i in (20, 21, 23)) + 10
+
+    picked = [store.ids[i] for i in store.select(budget)]
+
+    assert picked == ["c20", "c21", "c23"]  # the weak parent comes with its reply
+    assert sum(counts[store.ids.index(i)] for i in picked) <= budget
+
+
+def test_select_chunks_fills_at_most_max_chunks() -> None:
+    """Test the picked comments pack into the requested number of chunks."""
+    # same length comments, all by deleted authors
+    thread = [
+        make_comment(i, body=f"comment {i:03d} text", score=i * 10)
+        for i in range(3, 240, 3)
+    ]
+    store = CommentStore.from_comments(thread)
+
+    chunks = select_chunks(store, 60, 2)
+
+    assert len(chunks) == 2
+    assert all(num_tokens_from_string(chunk) <= 60 for chunk in chunks)
+    assert "comment 237" in "".join(chunks)  # the best score made it
+    assert "comment 003" not in "".join(chunks)
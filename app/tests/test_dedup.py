@@ -0,0 +1,97 @@
+"""Test utils/dedup.py."""
+
+from types import SimpleNamespace
+
+from generate_data import iter_forest, make_comment_filter
+from utils.comment_store import CommentStore, format_date
+from utils.dedup import dedup_comments, similarity, sketch
+
+TEXT = (
+    "the moderators closed the subreddit for two days to protest the new api"
+    " pricing which would shut down most third party apps"
+)
+
+
+def make_comment(i: int, body: str, author: str = "user", replies=()):
+    """Build a stand-in for a PRAW comment."""
+    return SimpleNamespace(
+        id=f"c{i}",
+        name=f"t1_c{i}",
+        author=SimpleNamespace(name=f"{author}{i}" if author == "user" else author),
+        created_utc=1_686_000_000 + i,
+        score=1,
+        body=body,
+        replies=list(replies),
+    )
+
+
+def test_similarity_estimates_shingle_jaccard() -> None:
+    """Test a one word edit keeps most shingles, other texts share none."""
+    words = TEXT.split()
+    edited = words[:5] + ["mods"] + words[6:]
+    other = "i switched to the official app and it is honestly fine".split()
+
+    # 20 shingles each, 3 replaced: 17 shared of 23
+    assert similarity(sketch(words, 3), sketch(edited, 3)) == 17 / 23
+    assert similarity(sketch(words, 3), sketch(other, 3)) == 0
+    assert len(sketch(words * 3, 1)) == len(set(words))
+
+
+def make_thread() -> list[SimpleNamespace]:
+    """Build a thread with copies, bot and noise comments, some replied to."""
+    return [
+        make_comment(
+            0,
+            TEXT,
+            replies=[
+                make_comment(
+                    1, "+1", replies=[make_comment(2, "why do you agree so much")]
+                )
+            ],
+        ),
+        make_comment(3, "same", replies=[make_comment(4, "same as what exactly")]),
+        make_comment(5, TEXT.upper() + "!!"),
+        make_comment(6, TEXT.replace("two days", "two whole days")),
+        make_comment(7, "Your post was removed.", author="AutoModerator"),
+        make_comment(8, "Here is the archive link. I am a bot, beep boop."),
+        make_comment(9, "I am a botanist and that plant needs more light"),
+    ]
+
+
+# the transcript left, replies of removed comments take their place
+TRANSCRIPT = (
+    f"{format_date(1_686_000_000)} [user0] {TEXT}\n"
+    f"> {format_date(1_686_000_002)} [user2] why do you agree so much\n"
+    f"{format_date(1_686_000_004)} [user4] same as what exactly\n"
+    f"{format_date(1_686_000_009)} [user9]"
+    " I am a botanist and that plant needs more light\n"
+)
+
+
+def test_dedup_comments_drops_copies_bots_and_noise() -> None:
+    """Test copy-pasted, bot and short comments go, their replies stay."""
+    store = CommentStore.from_comments(make_thread())
+    counts = store.token_counts()
+
+    kept, stats = dedup_comments(store)
+
+    assert kept.ids == ["c0", "c2", "c4", "c9"]
+    assert list(kept.parents) == [-1, 0, -1, -1]
+    assert list(kept.depths) == [0, 1, 0, 0]
+    assert kept.transcript() == TRANSCRIPT
+    # cached before dedup, the texts of re-depthed comments are redone
+    assert kept.chunk_texts() == list(map(kept.chunk_text, range(len(kept))))
+    assert stats == {
+        "comments_removed": 6,
+        "duplicates": 2,
+        "noise": 4,
+        "tokens_removed": sum(counts[i] for i in (1, 3, 5, 6, 7, 8)),
+        "tokenizer": "cl100k_base",
+    }
+
+
+def test_streamed_comments_are_filtered_like_the_store() -> None:
+    """Test the comment filter of a stream leaves the same transcript."""
+    entries = iter_forest(make_thread(), keep=make_comment_filter())
+
+    assert "".join(entries) == TRANSCRIPT
@@ -0,0 +1,518 @@
+"""Test generate_data.py."""
+
+import asyncio
+import itertools
+import threading
+import time
+from types import SimpleNamespace
+
+import generate_data
+import llm_handler
+import praw  # type: ignore
+from data_types.summary import GenerateSettings
+from generate_data import (
+    reduce_summaries,
+    adjust_prompt_length,
+    expand_more_comments,
+    generate_complete_prompt,
+    generate_summaries,
+    generate_summary_data,
+    get_comments,
+    iter_comment_lines,
+    iter_forest,
+)
+from praw.models.comment_forest import CommentForest  # type: ignore
+from utils.llm_utils import num_tokens_from_string
+from utils.rate_limiter import RateLimiter
+
+SETTINGS: GenerateSettings = {
+    "query": "Summarize the comments.",
+    "chunk_token_length": 2000,
+    "max_number_of_summaries": 3,
+    "max_token_length": 512,
+    "selected_model": "openai/gpt-4",
+    "system_role": "You are a helpful assistant.",
+    "max_context_length": 4096,
+}
+
+
+def test_adjust_prompt_length_keeps_prompt_that_fits() -> None:
+    """Test adjust_prompt_length() leaves a short prompt untouched."""
+    group = "first comment\nsecond comment\n"
+
+    prompt, dropped = adjust_prompt_length(group, "Title", SETTINGS, 4096, "test")
+
+    assert prompt == generate_complete_prompt(group, "Title", SETTINGS, "test")
+    assert dropped == 0
+
+
+def test_adjust_prompt_length_drops_whole_lines(monkeypatch) -> None:
+    """Test adjust_prompt_length() cuts at a line boundary in few token counts."""
+    lines = [f"comment number {i} with a few more words\n" for i in range(1000)]
+    group = "".join(lines)
+    max_context_length = num_tokens_from_string(
+        generate_complete_prompt("".join(lines[:400]), "Title", SETTINGS, "test")
+    )
+
+    calls = 0
+
+    def counting_num_tokens(string: str, model: str | None = None) -> int:
+        nonlocal calls
+        calls += 1
+        return num_tokens_from_string(string, model)
+
+    monkeypatch.setattr(generate_data, "num_tokens_from_string", counting_num_tokens)
+
+    prompt, dropped = adjust_prompt_length(
+        group, "Title", SETTINGS, max_context_length, "test"
+    )
+
+    assert prompt == generate_complete_prompt(
+        "".join(lines[:400]), "Title", SETTINGS, "test"
+    )
+    assert dropped == 600
+    assert calls <= 12
+
+
+def test_adjust_prompt_length_cuts_single_line_at_token_offset() -> None:
+    """Test adjust_prompt_length() keeps part of a line when none fits whole."""
+    group = "word " * 500 + "\n"
+    overhead = num_tokens_from_string(
+        generate_complete_prompt("", "Title", SETTINGS, "test")
+    )
+
+    prompt, dropped = adjust_prompt_length(
+        group, "Title", SETTINGS, overhead + 50, "test"
+    )
+
+    assert dropped == 1
+    assert "word word" in prompt
+    assert num_tokens_from_string(prompt) <= overhead + 50
+
+
+def test_generate_summaries_runs_groups_concurrently(monkeypatch) -> None:
+    """Test generate_summaries() overlaps LLM calls but reports in order."""
+    latency = 0.2
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    class SlowConnector:
+        async def acomplete(
+            self, prompt: str, max_tokens: int, settings: GenerateSettings
+        ) -> str:
+            nonlocal in_flight, max_in_flight
+            if prompt.startswith("shorten this text"):
+                return "condensed context"
+            with lock:
+                in_flight += 1
+                max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(latency)
+            with lock:
+                in_flight -= 1
+            return f"summary of {len(prompt)} chars"
+
+    monkeypatch.setitem(llm_handler.CONNECTORS, "litellm", SlowConnector())
+    monkeypatch.setattr(llm_handler, "get_rate_limiter", lambda _: RateLimiter())
+
+    groups = [f"comment {i}\n" for i in range(4)]
+    reported: list[int] = []
+
+    def run(max_concurrency: int) -> tuple[float, list[str]]:
+        settings: GenerateSettings = {
+            **SETTINGS,
+            "max_concurrency": max_concurrency,
+            "use_cache": False,
+        }
+        reported.clear()
+        start = time.perf_counter()
+        _, summaries, _ = generate_summaries(
+            settings=settings,
+            groups=groups,
+            prompt="Title",
+            subreddit="test",
+            progress_callback=lambda _progress, idx, _prompt, _summary: (
+                reported.append(idx)
+            ),
+        )
+        return time.perf_counter() - start, summaries
+
+    sequential, expected = run(1)
+    concurrent, summaries = run(len(groups))
+
+    assert summaries == expected
+    assert reported == [1, 2, 3, 4]
+    assert max_in_flight == len(groups)
+    assert sequential / concurrent > len(groups) * 0.6
+
+
+class RecordingConnector:
+    """Connector stub that records every prompt it completes."""
+
+    def __init__(self) -> None:
+        self.prompts: list[str] = []
+
+    async def acomplete(
+        self, prompt: str, max_tokens: int, settings: GenerateSettings
+    ) -> str:
+        self.prompts.append(prompt)
+        if prompt.startswith("shorten this text"):
+            return "condensed context"
+        return f"summary {len(self.prompts)}"
+
+
+def test_generate_summaries_condenses_prompt_once(monkeypatch) -> None:
+    """Test the prompt is condensed once per run and shared by later groups."""
+    connector = RecordingConnector()
+    monkeypatch.setitem(llm_handler.CONNECTORS, "litellm", connector)
+    settings: GenerateSettings = {**SETTINGS, "max_concurrency": 3}
+
+    prompts, _, stats = generate_summaries(
+        settings=settings,
+        groups=[f"comment {i}\n" for i in range(5)],
+        prompt="Title\nSelftext",
+        subreddit="test",
+    )
+
+    shorten_calls = [p for p in connector.prompts if p.startswith("shorten this")]
+    assert len(shorten_calls) == 1
+    assert "Title: Title\nSelftext" in prompts[0]
+    assert all("Title: condensed context" in prompt for prompt in prompts[1:])
+    assert stats["llm_calls"] == 6
+    assert stats["llm_calls_saved"] == 3
+    assert stats["tokens_saved"] > 0
+
+
+def test_generate_summaries_rolling_mode(monkeypatch) -> None:
+    """Test rolling mode feeds each summary forward instead of condensing."""
+    connector = RecordingConnector()
+    monkeypatch.setitem(llm_handler.CONNECTORS, "litellm", connector)
+    settings: GenerateSettings = {**SETTINGS, "summary_mode": "rolling"}
+
+    prompts, summaries, stats = generate_summaries(
+        settings=settings,
+        groups=[f"comment {i}\n" for i in range(3)],
+        prompt="Title\nSelftext",
+        subreddit="test",
+    )
+
+    assert not any(p.startswith("shorten this") for p in connector.prompts)
+    assert f"Title: Title\n{summaries[0]}" in prompts[1]
+    assert f"Title: Title\n{summaries[1]}" in prompts[2]
+    assert stats["llm_calls"] == 3
+    assert stats["llm_calls_saved"] == 2
+
+
+def test_reduce_summaries_combines_group_summaries(monkeypatch) -> None:
+    """Test the group summaries are combined a few at a time into one."""
+    connector = RecordingConnector()
+    monkeypatch.setitem(llm_handler.CONNECTORS, "litellm", connector)
+
+    summary, stats = reduce_summaries(
+        [f"group summary {i}" for i in range(6)], "Title", SETTINGS
+    )
+
+    # 6 -> 2 -> 1 with a fan-in of 4
+    assert stats == {"levels": 2, "calls": 3}
+    assert summary == "summary 3"
+    assert "group summary 0" in connector.prompts[0]
+    assert "group summary 5" in connector.prompts[1]
+
+
+class StreamingConnector:
+    """Connector stub that streams word by word, the first group slowest."""
+
+    async def acomplete(
+        self, prompt: str, max_tokens: int, settings: GenerateSettings
+    ) -> str:
+        return "condensed context"
+
+    async def astream(self, prompt: str, max_tokens: int, settings: GenerateSettings):
+        group = prompt.split("comment ", 1)[1][0]
+        delay = 0.02 if group == "0" else 0.0
+        for word in (f"group {group} ", "streamed ", "summary"):
+            await asyncio.sleep(delay)
+            yield word
+
+
+def test_generate_summaries_streams_in_group_order(monkeypatch) -> None:
+    """Test deltas reach stream_callback in group order from the caller."""
+    monkeypatch.setitem(llm_handler.CONNECTORS, "litellm", StreamingConnector())
+    settings: GenerateSettings = {**SETTINGS, "max_concurrency": 3}
+    caller = threading.current_thread()
+    received: list[tuple[int, str]] = []
+
+    def stream_callback(idx: int, delta: str) -> None:
+        assert threading.current_thread() is caller
+        received.append((idx, delta))
+
+    _, summaries, _ = generate_summaries(
+        settings=settings,
+        groups=[f"comment {i}\n" for i in range(3)],
+        prompt="Title\nSelftext",
+        subreddit="test",
+        stream_callback=stream_callback,
+    )
+
+    assert [idx for idx, _ in received] == sorted(idx for idx, _ in received)
+    for idx, summary in enumerate(summaries, 1):
+        assert "".join(d for i, d in received if i == idx) == summary
+        assert summary == f"group {idx - 1} streamed summary"
+
+
+def make_comment(name: str | None, created_utc: int, body: str, replies=()):
+    """Build a stand-in for a PRAW comment."""
+    return SimpleNamespace(
+        author=SimpleNamespace(name=name) if name else None,
+        created_utc=created_utc,
+        body=body,
+        replies=list(replies),
+    )
+
+
+def test_get_comments_flattens_newest_reply_first() -> None:
+    """Test get_comments() output matches the original recursive format."""
+    thread = make_comment(
+        "op",
+        1_686_000_000,
+        "top",
+        [
+            make_comment("a", 1_686_000_100, "older\nsecond line"),
+            make_comment(
+                None,
+                1_686_000_200,
+                "newer",
+                [make_comment("b", 1_686_000_300, "nested")],
+            ),
+        ],
+    )
+
+    lines = get_comments(thread).splitlines()
+
+    assert lines[0].endswith(" [op] top")
+    assert lines[1].startswith("> ") and lines[1].endswith(" [[deleted]] newer")
+    assert lines[2].startswith("    > ") and lines[2].endswith(" [b] nested")
+    assert lines[3].startswith("> ") and lines[3].endswith(" [a] older")
+    assert lines[4] == "second line"
+
+
+def test_get_comments_handles_deep_threads() -> None:
+    """Test very deep reply chains do not hit the recursion limit."""
+    depth = 5000
+    comment = make_comment("leaf", 1_686_000_000, "leaf")
+    for i in range(depth):
+        comment = make_comment(f"user{i}", 1_686_000_000, "reply", [comment])
+
+    transcript = get_comments(comment)
+
+    assert transcript.count("\n") == depth + 1
+    last_line = transcript.split("\n")[-2]
+    assert last_line.startswith("    " * (depth - 1) + "> ")
+    assert last_line.endswith(" [leaf] leaf")
+    assert list(iter_comment_lines([comment])) == transcript.split("\n")
+
+
+def praw_thread(num_stubs: int):
+    """Build an offline praw forest whose top comment has num_stubs stubs."""
+    reddit = praw.Reddit(client_id="test", client_secret="test", user_agent="test")
+    submission = reddit.submission(id="post")
+
+    def comment(comment_id: str, parent_id: str, replies: object = "") -> dict:
+        return {
+            "kind": "t1",
+            "data": {
+                "id": comment_id,
+                "name": f"t1_{comment_id}",
+                "parent_id": parent_id,
+                "link_id": "t3_post",
+                "author": "user",
+                "body": f"comment {comment_id} " * 10,
+                "created_utc": 1_686_000_000,
+                "replies": replies,
+            },
+        }
+
+    stubs = [
+        {
+            "kind": "more",
+            "data": {
+                "id": f"more{i}",
+                "name": f"t1_more{i}",
+                "parent_id": "t1_top",
+                "count": 2,
+                "children": [f"s{i}a", f"s{i}b"],
+            },
+        }
+        for i in range(num_stubs)
+    ]
+    listing = {
+        "kind": "Listing",
+        "data": {
+            "children": [
+                comment(
+                    "top", "t3_post", {"kind": "Listing", "data": {"children": stubs}}
+                )
+            ]
+        },
+    }
+    forest = CommentForest(submission)
+    forest._update(reddit._objector.objectify(data=listing).children)
+
+    def fetch(more) -> list:
+        time.sleep(0.05)
+        first, second = more.children
+        return reddit._objector.objectify(
+            data=[comment(first, "t1_top"), comment(second, f"t1_{first}")]
+        )
+
+    return forest, fetch
+
+
+def test_expand_more_comments_fetches_concurrently() -> None:
+    """Test every stub is fetched, overlapping requests, and spliced in place."""
+    forest, fetch = praw_thread(8)
+    start = time.perf_counter()
+
+    skipped = expand_more_comments(forest, fetch=fetch, max_workers=4)
+
+    assert time.perf_counter() - start < 8 * 0.05 / 2
+    assert skipped == 0
+    top = forest[0]
+    assert len(forest) == 1
+    assert len(top.replies) == 8
+    assert all(len(reply.replies) == 1 for reply in top.replies)
+    assert "comment top" in get_comments(top)
+
+
+def test_expand_more_comments_stops_at_token_budget() -> None:
+    """Test no new fetch starts once the forest holds enough tokens."""
+    forest, fetch = praw_thread(8)
+    fetched: list[str] = []
+
+    def recording_fetch(more) -> list:
+        fetched.append(more.id)
+        return fetch(more)
+
+    skipped = expand_more_comments(
+        forest, token_budget=100, fetch=recording_fetch, max_workers=2
+    )
+
+    assert 0 < len(fetched) < 8
+    assert skipped == 8 - len(fetched)
+    assert len(forest[0].replies) == len(fetched)
+
+
+def test_iter_forest_fetches_stubs_when_reached() -> None:
+    """Test a stub is fetched only once the iteration gets to it."""
+    forest, fetch = praw_thread(8)
+    fetched: list[str] = []
+
+    def recording_fetch(more) -> list:
+        fetched.append(more.id)
+        return fetch(more)
+
+    entries = iter_forest(forest, fetch=recording_fetch)
+    first = list(itertools.islice(entries, 3))
+
+    assert fetched == ["more0"]
+    assert "comment top" in first[0]
+    assert first[1].startswith("> ") and "comment s0a" in first[1]
+    assert first[2].startswith("    > ") and "comment s0b" in first[2]
+
+    rest = list(entries)
+    assert len(fetched) == 8
+    assert len(first) + len(rest) == 1 + 8 * 2
+
+
+def test_generate_summary_data_streams_comment_lines(monkeypatch) -> None:
+    """Test chunks are summarized while later lines are read, and no further."""
+    first_call = threading.Event()
+
+    class Connector:
+        async def acomplete(
+            self, prompt: str, max_tokens: int, settings: GenerateSettings
+        ) -> str:
+            if "comment 0 " in prompt:
+                first_call.set()
+            return "summary"
+
+    monkeypatch.setitem(llm_handler.CONNECTORS, "litellm", Connector())
+    monkeypatch.setattr(llm_handler, "get_rate_limiter", lambda _: RateLimiter())
+    settings: GenerateSettings = {
+        **SETTINGS,
+        "chunk_token_length": 500,
+        "max_number_of_summaries": 3,
+        "max_concurrency": 2,
+    }
+    pulled = 0
+
+    def comment_lines():
+        nonlocal pulled
+        for i in itertools.count():
+            if i == 40:  # past the first chunk, before the third
+                assert first_call.wait(5), "the first chunk waited for the rest"
+            pulled += 1
+            yield f"comment {i} " + "word " * 20
+
+    output = generate_summary_data(
+        settings=settings,
+        reddit_data={
+            "title": "Title",
+            "selftext": "body",
+            "subreddit": "test",
+            "comment_lines": comment_lines(),
+        },
+        logger=generate_data.app_logger,
+    )
+
+    assert output.count("SUMMARY COUNT") == 3
+    lines_per_chunk = 500 // num_tokens_from_string("comment 10 " + "word " * 20)
+    assert pulled <= 3 * (lines_per_chunk + 1) + 1
+
+
+def test_fetch_more_comments_uses_one_reddit_per_thread(monkeypatch) -> None:
+    """Test concurrent fetches never share a praw Reddit instance."""
+    instances: list[tuple[int, object]] = []
+
+    class Reddit:
+        def __init__(self) -> None:
+            instances.append((threading.get_ident(), self))
+
+        def post(self, path: str, data: dict) -> list:
+            return [f"{data['children']} by {id(self)}"]
+
+    monkeypatch.setattr(generate_data, "make_reddit", Reddit)
+    monkeypatch.setattr(generate_data, "_thread_reddit", threading.local())
+    more = SimpleNamespace(
+        count=2,
+        children=["a", "b"],
+        submission=SimpleNamespace(fullname="t3_post", comment_sort="top"),
+    )
+
+    def fetch_twice() -> None:
+        assert generate_data.fetch_more_comments(more) == (
+            generate_data.fetch_more_comments(more)
+        )
+
+    workers = [threading.Thread(target=fetch_twice) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert len(instances) == 3
+    assert len({ident for ident, _ in instances}) == 3
+
+
+def test_expand_more_comments_falls_back_to_replace_more() -> None:
+    """Test a forest without the expected praw internals still expands."""
+    limits: list[int | None] = []
+
+    class Forest:
+        def replace_more(self, limit: int | None = 32) -> list:
+            limits.append(limit)
+            return ["stub"] * 3
+
+    assert expand_more_comments(Forest(), token_budget=100) == 3
+    assert expand_more_comments(Forest()) == 3
+    assert limits == [generate_data.config.MORE_COMMENTS_FALLBACK_LIMIT, None]
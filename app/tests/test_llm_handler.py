@@ -0,0 +1,151 @@
+"""Test llm_handler.py."""
+
+import asyncio
+from types import SimpleNamespace
+
+import llm_handler
+import pytest
+from data_types.summary import GenerateSettings
+from llm_handler import complete_text, get_connector, rate_limit_wait, stream_text
+
+SETTINGS: GenerateSettings = {
+    "query": "Summarize the comments.",
+    "chunk_token_length": 2000,
+    "max_number_of_summaries": 3,
+    "max_token_length": 512,
+    "selected_model": "openai/gpt-4",
+    "system_role": "You are a helpful assistant.",
+    "max_context_length": 4096,
+}
+
+
+class EchoConnector:
+    """Connector stub that echoes the prompt and records its event loops."""
+
+    def __init__(self) -> None:
+        self.loops: list[object] = []
+
+    async def acomplete(
+        self, prompt: str, max_tokens: int, settings: GenerateSettings
+    ) -> str:
+        self.loops.append(asyncio.get_running_loop())
+        if prompt == "fail":
+            raise RuntimeError("provider down")
+        return f"{settings['selected_model']}:{prompt}:{max_tokens}"
+
+
+def test_get_connector_defaults_to_litellm(monkeypatch) -> None:
+    """Test models dispatch to their configured connector."""
+    monkeypatch.setitem(llm_handler.MODEL_CONNECTORS, "openai/gpt-4", "openai")
+
+    assert get_connector("openai/gpt-4") is llm_handler.CONNECTORS["openai"]
+    assert get_connector("unknown/model") is llm_handler.CONNECTORS["litellm"]
+
+
+def test_complete_text_reuses_one_event_loop(monkeypatch) -> None:
+    """Test complete_text() dispatches through the shared loop."""
+    connector = EchoConnector()
+    monkeypatch.setitem(llm_handler.CONNECTORS, "litellm", connector)
+
+    assert complete_text("hi", 10, SETTINGS) == "openai/gpt-4:hi:10"
+    assert complete_text("again", 5, SETTINGS) == "openai/gpt-4:again:5"
+    assert complete_text("fail", 5, SETTINGS).startswith("Error completing text")
+    assert len(set(map(id, connector.loops))) == 1
+
+
+def test_raise_errors_raises_instead_of_answering(monkeypatch) -> None:
+    """Test settings["raise_errors"] surfaces provider errors to the caller."""
+    monkeypatch.setitem(llm_handler.CONNECTORS, "litellm", EchoConnector())
+    settings: GenerateSettings = {**SETTINGS, "raise_errors": True}
+
+    with pytest.raises(RuntimeError, match="provider down"):
+        complete_text("fail", 5, settings)
+    with pytest.raises(RuntimeError, match="provider down"):
+        list(stream_text("fail", 5, settings))
+
+
+def test_complete_text_uses_response_cache(
+    monkeypatch, isolated_response_cache
+) -> None:
+    """Test identical requests are served from the cache unless bypassed."""
+    connector = EchoConnector()
+    monkeypatch.setitem(llm_handler.CONNECTORS, "litellm", connector)
+
+    first = complete_text("hi", 10, SETTINGS)
+    second = complete_text("hi", 10, SETTINGS)
+    bypassed = complete_text("hi", 10, {**SETTINGS, "use_cache": False})
+
+    assert first == second == bypassed
+    assert len(connector.loops) == 2
+    assert isolated_response_cache.hits == 1
+
+
+class RateLimitedError(Exception):
+    """Provider error carrying a Retry-After header, like a 429 response."""
+
+    def __init__(self, retry_after: str) -> None:
+        super().__init__("rate limited")
+        self.response = SimpleNamespace(headers={"retry-after": retry_after})
+
+
+def test_complete_text_honours_retry_after(monkeypatch) -> None:
+    """Test a request answered with Retry-After is retried after the delay."""
+    attempts: list[str] = []
+
+    class FlakyConnector:
+        async def acomplete(
+            self, prompt: str, max_tokens: int, settings: GenerateSettings
+        ) -> str:
+            attempts.append(prompt)
+            if len(attempts) == 1:
+                raise RateLimitedError("0.2")
+            return "ok"
+
+    monkeypatch.setitem(llm_handler.CONNECTORS, "litellm", FlakyConnector())
+
+    assert complete_text("hi", 10, {**SETTINGS, "use_cache": False}) == "ok"
+    assert attempts == ["hi", "hi"]
+    # The retry already waited out the block, later requests are not held back.
+    assert rate_limit_wait("openai/gpt-4") == 0
+
+
+class WordStreamConnector(EchoConnector):
+    """Connector stub that streams the echoed prompt word by word."""
+
+    async def astream(self, prompt: str, max_tokens: int, settings: GenerateSettings):
+        for word in prompt.split():
+            yield f"{word} "
+
+
+def test_stream_text_yields_deltas(monkeypatch, isolated_response_cache) -> None:
+    """Test streaming yields deltas, caches the text and falls back to acomplete."""
+    monkeypatch.setitem(llm_handler.CONNECTORS, "litellm", WordStreamConnector())
+
+    assert list(stream_text("one two three", 10, SETTINGS)) == [
+        "one ",
+        "two ",
+        "three ",
+    ]
+    assert list(stream_text("one two three", 10, SETTINGS)) == ["one two three"]
+    assert isolated_response_cache.hits == 1
+
+    monkeypatch.setitem(llm_handler.CONNECTORS, "litellm", EchoConnector())
+    assert list(stream_text("hi", 10, SETTINGS)) == ["openai/gpt-4:hi:10"]
+    assert list(stream_text("fail", 10, SETTINGS))[-1].startswith(
+        "Error completing text"
+    )
+
+
+def test_stream_text_closes_early(monkeypatch, isolated_response_cache) -> None:
+    """Test abandoning a stream closes it without caching the partial text."""
+    monkeypatch.setitem(llm_handler.CONNECTORS, "litellm", WordStreamConnector())
+
+    stream = stream_text("one two three", 10, SETTINGS)
+    assert next(stream) == "one "
+    stream.close()
+
+    assert list(stream_text("one two three", 10, SETTINGS)) == [
+        "one ",
+        "two ",
+        "three ",
+    ]
@@ -0,0 +1,122 @@
+"""Test log_tools.py."""
+
+import json
+import logging
+import queue
+import sys
+import time
+from logging.handlers import QueueHandler
+
+from log_tools import DeferredQueueHandler, JsonLinesFormatter, Logger, LogPayload
+
+
+class Unformattable:
+    """A value whose formatting fails, to prove it is never formatted."""
+
+    def __str__(self) -> str:
+        raise AssertionError("payload was formatted")
+
+
+def test_log_payload_truncates_and_hashes(monkeypatch) -> None:
+    """Test LogPayload shortens large values according to the config."""
+    monkeypatch.setattr(LogPayload._config, "LOG_PAYLOAD_MAX_CHARS", 10)
+
+    monkeypatch.setattr(LogPayload._config, "LOG_PAYLOAD_MODE", "truncate")
+    assert str(LogPayload("x" * 50)) == "xxxxxxxxxx... <50 chars>"
+    assert str(LogPayload("short")) == "short"
+
+    monkeypatch.setattr(LogPayload._config, "LOG_PAYLOAD_MODE", "hash")
+    assert str(LogPayload("x" * 50)).startswith("<50 chars sha1:")
+
+
+def test_log_skips_formatting_when_level_disabled() -> None:
+    """Test the decorator does no formatting work for a disabled level."""
+    logger = logging.getLogger("test_log_tools.disabled")
+    logger.setLevel(logging.WARNING)
+
+    def make_value() -> Unformattable:
+        return Unformattable()
+
+    decorated = Logger.log(make_value, logger)
+
+    assert isinstance(decorated(), Unformattable)
+
+
+def test_log_records_call_stats() -> None:
+    """Test call counts and durations are recorded per function."""
+    Logger.reset_call_stats()
+
+    def add(a: int, b: int) -> int:
+        return a + b
+
+    decorated = Logger.log(add)
+    for i in range(3):
+        decorated(i, i)
+
+    stats = Logger.get_call_stats()[add.__qualname__]
+    assert stats["calls"] == 3
+    assert stats["total_seconds"] >= 0
+
+
+def test_json_lines_formatter() -> None:
+    """Test records become single-line JSON objects without colour codes."""
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        exc_info = sys.exc_info()
+    record = logging.LogRecord(
+        "app", logging.ERROR, __file__, 1, "failed %s", ("twice",), exc_info
+    )
+
+    line = JsonLinesFormatter().format(record)
+
+    assert "\n" not in line
+    assert "\x1b[" not in line
+    entry = json.loads(line)
+    assert entry["level"] == "ERROR"
+    assert entry["message"] == "failed twice"
+    assert "ValueError: boom" in entry["exc_info"]
+
+
+def test_app_logger_writes_through_queue() -> None:
+    """Test the app logger only enqueues and the listener writes the file."""
+    assert all(isinstance(h, QueueHandler) for h in Logger.app_logger.handlers)
+
+    marker = f"queued message {time.time_ns()}"
+    Logger.app_logger.warning(marker)
+
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        Logger._file_handler.flush()
+        with open(Logger._log_file_path, encoding="utf-8") as log_file:
+            if marker in log_file.read():
+                break
+        time.sleep(0.01)
+    else:
+        raise AssertionError("queued record never reached the log file")
+
+
+def test_queue_handler_leaves_formatting_to_the_listener() -> None:
+    """Test records are queued unformatted, with their exception info."""
+    records: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    handler = DeferredQueueHandler(records)
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        exc_info = sys.exc_info()
+
+    handler.handle(
+        logging.LogRecord(
+            "app", logging.INFO, __file__, 1, "%s", (Unformattable(),), None
+        )
+    )
+    handler.handle(
+        logging.LogRecord(
+            "app", logging.ERROR, __file__, 1, "failed %s", ("twice",), exc_info
+        )
+    )
+
+    assert isinstance(records.get_nowait().args[0], Unformattable)
+    entry = json.loads(JsonLinesFormatter().format(records.get_nowait()))
+    assert entry["message"] == "failed twice"
+    assert "ValueError: boom" in entry["exc_info"]
@@ -0,0 +1,66 @@
+"""Test utils/map_reduce.py."""
+
+import math
+import threading
+
+import pytest
+from utils.map_reduce import map_reduce, tree_reduce
+
+
+def test_map_reduce_bounds_levels_and_calls() -> None:
+    """Test the tree reduce takes logarithmic levels and linear calls."""
+    lock = threading.Lock()
+    calls: list[str] = []
+
+    def summarize(chunk: str) -> str:
+        with lock:
+            calls.append(chunk)
+        return f"s({chunk})"
+
+    def combine(parts: list[str]) -> str:
+        with lock:
+            calls.append("combine")
+        return f"c{len(parts)}"
+
+    chunks = [f"chunk {i}" for i in range(50)]
+    summary, stats = map_reduce(
+        chunks, summarize, combine, fits=lambda _: True, fan_in=4, max_workers=8
+    )
+
+    # map, then 50 -> 13 -> 4 -> 1
+    assert summary == "c4"
+    assert stats == {"levels": 4, "calls": 50 + 12 + 4 + 1}
+    assert stats["calls"] == len(calls)
+    assert stats["levels"] <= 1 + math.ceil(math.log(50, 4)) + 1
+    assert stats["calls"] <= 50 + (50 - 1) / (4 - 1) + stats["levels"]
+
+
+def test_tree_reduce_stops_when_combine_does_not_shrink() -> None:
+    """Test one extra pass is made for an oversized summary, then it stops."""
+    calls = 0
+
+    def combine(parts: list[str]) -> str:
+        nonlocal calls
+        calls += 1
+        return "x" * 100
+
+    summary, stats = tree_reduce(
+        ["a", "b", "c"], combine, fits=lambda text: len(text) < 10, fan_in=2
+    )
+
+    assert summary == "x" * 100
+    assert stats == {"levels": 3, "calls": 3} and calls == 3
+
+
+def test_tree_reduce_single_summary_that_fits() -> None:
+    """Test a single fitting summary needs no calls."""
+    assert tree_reduce(["done"], list, fits=lambda _: True) == (
+        "done",
+        {"levels": 0, "calls": 0},
+    )
+
+
+def test_tree_reduce_rejects_bad_fan_in() -> None:
+    """Test a fan-in below two is refused, it could never finish."""
+    with pytest.raises(ValueError):
+        tree_reduce(["a", "b"], list, fits=lambda _: True, fan_in=1)
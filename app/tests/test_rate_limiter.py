@@ -0,0 +1,95 @@
+"""Test utils/rate_limiter.py."""
+
+import asyncio
+import email.utils
+import time
+from types import SimpleNamespace
+
+from utils.rate_limiter import RateLimiter, retry_after_seconds
+
+
+class FakeClock:
+    """A clock that only moves when told to."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_requests_per_minute() -> None:
+    """Test the request bucket empties and refills at its rate."""
+    clock = FakeClock()
+    limiter = RateLimiter(requests_per_minute=2, clock=clock)
+
+    assert limiter.try_acquire() == 0
+    assert limiter.try_acquire() == 0
+    assert limiter.try_acquire() == 30.0
+    assert limiter.wait_time() == 30.0
+
+    clock.now = 30.0
+    assert limiter.try_acquire() == 0
+
+
+def test_tokens_per_minute() -> None:
+    """Test token budgets, including requests larger than the bucket."""
+    clock = FakeClock()
+    limiter = RateLimiter(tokens_per_minute=600, clock=clock)
+
+    assert limiter.try_acquire(500) == 0
+    assert limiter.try_acquire(200) == 10.0
+    clock.now = 10.0
+    assert limiter.try_acquire(200) == 0
+
+    # A request above the budget waits for a full bucket, not forever.
+    assert limiter.wait_time(10_000) == 60.0
+
+
+def test_block_for_holds_back_requests() -> None:
+    """Test a Retry-After block applies on top of the budgets."""
+    clock = FakeClock()
+    limiter = RateLimiter(requests_per_minute=100, clock=clock)
+
+    limiter.block_for(5)
+    assert limiter.try_acquire() == 5.0
+    clock.now = 5.0
+    assert limiter.try_acquire() == 0
+
+
+def test_unlimited_limiter_never_waits() -> None:
+    """Test a limiter without limits admits every request."""
+    limiter = RateLimiter()
+
+    assert all(limiter.try_acquire(10**6) == 0 for _ in range(100))
+
+
+def test_sync_and_async_acquire_wait() -> None:
+    """Test both acquire paths sleep until the bucket refills."""
+    limiter = RateLimiter(requests_per_minute=600)  # one request per 0.1s
+    for _ in range(600):
+        limiter.try_acquire()
+
+    start = time.monotonic()
+    limiter.acquire()
+    asyncio.run(limiter.aacquire())
+
+    assert time.monotonic() - start >= 0.15
+
+
+def test_retry_after_seconds() -> None:
+    """Test Retry-After parsing of seconds, milliseconds and HTTP dates."""
+
+    def error(headers: dict[str, str] | None) -> Exception:
+        exc = Exception()
+        exc.response = SimpleNamespace(headers=headers)  # type: ignore[attr-defined]
+        return exc
+
+    assert retry_after_seconds(Exception()) is None
+    assert retry_after_seconds(error({})) is None
+    assert retry_after_seconds(error({"retry-after": "7"})) == 7.0
+    assert retry_after_seconds(error({"retry-after-ms": "250"})) == 0.25
+    assert retry_after_seconds(error({"retry-after": "soon"})) is None
+
+    date = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert 25 < retry_after_seconds(error({"retry-after": date})) <= 30
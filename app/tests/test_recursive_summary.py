@@ -0,0 +1,90 @@
+"""Test recursive_summary.py."""
+
+import llm_handler
+import recursive_summary
+from data_types.summary import GenerateSettings
+from recursive_summary import build_settings, main, summarize_text
+from utils.llm_utils import num_tokens_from_string
+
+
+class CountingConnector:
+    """Connector stub that answers every prompt with a short summary."""
+
+    def __init__(self, fail_on: str | None = None) -> None:
+        self.fail_on = fail_on
+        self.calls = 0
+
+    async def acomplete(
+        self, prompt: str, max_tokens: int, settings: GenerateSettings
+    ) -> str:
+        self.calls += 1
+        if self.fail_on and self.fail_on in prompt:
+            raise RuntimeError("provider down")
+        return "a short summary"
+
+
+def test_main_summarizes_files_and_directories(tmp_path, monkeypatch, capsys) -> None:
+    """Test every input gets a summary file, written through complete_text."""
+    connector = CountingConnector()
+    monkeypatch.setitem(llm_handler.CONNECTORS, "litellm", connector)
+    inputs = tmp_path / "inputs"
+    inputs.mkdir()
+    (inputs / "first.txt").write_text("\n".join(f"line {i}" for i in range(200)))
+    (inputs / "ignored.md").write_text("not a text file")
+    single = tmp_path / "second.txt"
+    single.write_text("just one line")
+    output_dir = tmp_path / "outputs"
+
+    exit_code = main(
+        [str(inputs), str(single), "--output-dir", str(output_dir)]
+        + ["--chunk-tokens", "100", "--model", "openai/gpt-4"]
+    )
+
+    assert exit_code == 0
+    assert sorted(path.name for path in output_dir.iterdir()) == [
+        "first_summary.txt",
+        "second_summary.txt",
+    ]
+    assert (output_dir / "first_summary.txt").read_text() == "a short summary"
+    assert "Summarized 2 of 2 files" in capsys.readouterr().out
+    assert connector.calls > 4  # several chunks, reduce and cleanup calls
+
+
+def test_main_reports_failed_files(tmp_path, monkeypatch, capsys) -> None:
+    """Test a failing file is reported without stopping the others."""
+    monkeypatch.setitem(
+        llm_handler.CONNECTORS, "litellm", CountingConnector(fail_on="broken")
+    )
+    (tmp_path / "good.txt").write_text("fine text")
+    (tmp_path / "bad.txt").write_text("broken text")
+    output_dir = tmp_path / "outputs"
+
+    exit_code = main(
+        [str(tmp_path / "good.txt"), str(tmp_path / "bad.txt")]
+        + ["--output-dir", str(output_dir), "--model", "openai/gpt-4"]
+    )
+
+    assert exit_code == 1
+    assert [path.name for path in output_dir.iterdir()] == ["good_summary.txt"]
+    assert "bad.txt: failed" in capsys.readouterr().err
+
+
+def test_summarize_text_keeps_long_lines_whole(monkeypatch) -> None:
+    """Test a paragraph on one line is split at token offsets, not truncated."""
+    chunks: list[str] = []
+
+    def map_reduce(items, **kwargs):
+        chunks.extend(items)
+        return "a short summary", {"levels": 1, "calls": len(items)}
+
+    monkeypatch.setattr(recursive_summary, "map_reduce", map_reduce)
+    paragraph = " ".join(
+        f"sentence {i} of a long paragraph, façade." for i in range(80)
+    )
+    assert len(paragraph) > 2000 and "\n" not in paragraph
+
+    summarize_text(paragraph, build_settings("openai/gpt-4", 100))
+
+    assert "".join(chunks) == paragraph
+    assert len(chunks) > 1
+    assert all(num_tokens_from_string(chunk, "openai/gpt-4") <= 100 for chunk in chunks)
@@ -0,0 +1,82 @@
+"""Test reddit_json.py."""
+
+import json
+
+import generate_data
+from generate_data import get_comments, get_reddit_json
+from log_tools import Logger
+from utils.reddit_json import parse_thread
+
+
+def comment(comment_id: str, author: str, body: str, created_utc: int, replies=""):
+    """Build a t1 listing child."""
+    return {
+        "kind": "t1",
+        "data": {
+            "id": comment_id,
+            "parent_id": "t3_post",
+            "author": author,
+            "body": body,
+            "created_utc": created_utc,
+            "score": 5,
+            "replies": replies,
+        },
+    }
+
+
+def listing(*children):
+    """Build a listing wrapper."""
+    return {"kind": "Listing", "data": {"children": list(children)}}
+
+
+THREAD = json.dumps(
+    [
+        listing(
+            {
+                "kind": "t3",
+                "data": {"title": "Title", "selftext": "Body", "subreddit": "test"},
+            }
+        ),
+        listing(
+            comment(
+                "a",
+                "alice",
+                "top",
+                1_686_000_000,
+                listing(
+                    comment("b", "[deleted]", "reply", 1_686_000_100),
+                    {"kind": "more", "data": {"children": ["x", "y"]}},
+                ),
+            ),
+            comment("c", "carol", "second", 1_686_000_200),
+            {"kind": "more", "data": {"children": ["z"]}},
+        ),
+    ]
+)
+
+
+def test_parse_thread_builds_comment_forest() -> None:
+    """Test parse_thread() nests replies and skips "more" stubs."""
+    post, comments, skipped = parse_thread(THREAD)
+
+    assert post["title"] == "Title"
+    assert [c.body for c in comments] == ["top", "second"]
+    assert comments[0].replies[0].author is None
+    assert comments[0].replies[0].body == "reply"
+    assert skipped == 2
+
+
+def test_get_reddit_json_matches_praw_transcript(monkeypatch) -> None:
+    """Test get_reddit_json() formats comments like the PRAW path."""
+    # the one word comments would be filtered as noise
+    monkeypatch.setattr(generate_data.config, "DEDUP_ENABLED", False)
+    _, comments, _ = parse_thread(THREAD.encode("utf-8"))
+
+    reddit_data = get_reddit_json(THREAD.encode("utf-8"), Logger.get_app_logger())
+
+    assert reddit_data["title"] == "Title"
+    assert reddit_data["selftext"] == "Body"
+    assert reddit_data["subreddit"] == "test"
+    assert reddit_data["comments"] == "".join(get_comments(c) for c in comments)
+    assert "> " in reddit_data["comments"]
+    assert "[[deleted]] reply" in reddit_data["comments"]
@@ -0,0 +1,48 @@
+"""Test response_cache.py."""
+
+import time
+
+from utils.response_cache import ResponseCache
+
+
+def test_response_cache_hits_and_misses(tmp_path) -> None:
+    """Test a stored response is returned for the same request only."""
+    cache = ResponseCache(str(tmp_path / "cache.db"), max_entries=10, ttl_seconds=60)
+    key = ResponseCache.make_key("openai/gpt-4", "role", "prompt", 100)
+
+    assert cache.get(key) is None
+    cache.set(key, "response")
+
+    assert cache.get(key) == "response"
+    assert (
+        cache.get(ResponseCache.make_key("openai/gpt-4", "role", "prompt", 99)) is None
+    )
+    assert cache.stats() == {"hits": 1, "misses": 2, "entries": 1}
+
+
+def test_response_cache_evicts_least_recently_used(tmp_path) -> None:
+    """Test the cache keeps at most max_entries, dropping the stalest."""
+    cache = ResponseCache(str(tmp_path / "cache.db"), max_entries=2, ttl_seconds=60)
+
+    cache.set("a", "1")
+    time.sleep(0.01)
+    cache.set("b", "2")
+    time.sleep(0.01)
+    cache.get("a")
+    time.sleep(0.01)
+    cache.set("c", "3")
+
+    assert cache.get("a") == "1"
+    assert cache.get("b") is None
+    assert cache.get("c") == "3"
+
+
+def test_response_cache_expires_entries(tmp_path) -> None:
+    """Test entries older than the ttl are treated as misses."""
+    cache = ResponseCache(str(tmp_path / "cache.db"), max_entries=10, ttl_seconds=0)
+
+    cache.set("a", "1")
+    time.sleep(0.01)
+
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
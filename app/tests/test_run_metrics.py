@@ -0,0 +1,144 @@
+"""Test utils/run_metrics.py."""
+
+import json
+import threading
+from types import SimpleNamespace
+
+import generate_data
+import llm_handler
+from data_types.summary import GenerateSettings
+from generate_data import build_reddit_data, generate_summary_data
+from utils.llm_utils import num_tokens_from_string
+from utils.rate_limiter import RateLimiter
+from utils.run_metrics import (
+    RunMetrics,
+    carry_context,
+    record,
+    record_llm_request,
+    stage,
+    track_run,
+)
+
+SETTINGS: GenerateSettings = {
+    "query": "Summarize the comments.",
+    "chunk_token_length": 120,
+    "max_number_of_summaries": 3,
+    "max_token_length": 512,
+    "selected_model": "openai/gpt-4",
+    "system_role": "You are a helpful assistant.",
+    "max_context_length": 4096,
+    "max_concurrency": 2,
+}
+
+
+def test_records_go_to_the_innermost_stage_of_the_current_run() -> None:
+    """Test nested stages, worker threads and code outside any run."""
+    record(tokenizer_calls=1)  # no run tracked, nothing to record into
+    metrics = RunMetrics()
+
+    with track_run(metrics):
+        with stage("summarize"):
+            record(tokenizer_calls=2)
+            with stage("fit_prompt"):
+                record(tokenizer_calls=3)
+            worker = threading.Thread(
+                target=carry_context(record), kwargs={"tokenizer_calls": 4}
+            )
+            worker.start()
+            worker.join()
+            record_llm_request("m", 0.5, 10, 5, cached=False, rate_limit_wait_seconds=1)
+            record_llm_request("m", 0.0, cached=True)
+        record(tokenizer_calls=5)
+
+    stages = metrics.as_dict()["stages"]
+    assert stages["summarize"]["tokenizer_calls"] == 6
+    assert stages["fit_prompt"]["tokenizer_calls"] == 3
+    assert stages["other"]["tokenizer_calls"] == 5
+    assert stages["summarize"]["calls"] == 1
+    assert stages["summarize"]["seconds"] >= stages["fit_prompt"]["seconds"]
+    assert metrics.totals()["llm_calls"] == 2
+    assert stages["summarize"]["cache_hits"] == stages["summarize"]["cache_misses"] == 1
+    assert stages["summarize"]["prompt_tokens"] == 10
+    assert metrics.llm_requests[0]["stage"] == "summarize"
+    assert metrics.seconds > 0
+
+
+def test_exports_json_and_prometheus_text() -> None:
+    """Test both exports carry every stage counter."""
+    metrics = RunMetrics()
+    metrics.add("fetch", calls=1, seconds=2.5)
+    metrics.add('odd "stage"', calls=1)
+
+    data = json.loads(metrics.to_json())
+    text = metrics.to_prometheus(labels={"model": "openai/gpt-4"})
+
+    assert data["stages"]["fetch"]["seconds"] == 2.5
+    assert "# TYPE reddit_summary_stage_seconds_total counter" in text
+    assert (
+        'reddit_summary_stage_seconds_total{model="openai/gpt-4",stage="fetch"} 2.5'
+        in text
+    )
+    assert 'stage="odd \\"stage\\""' in text
+    assert text.count("# TYPE") == 10
+
+
+def test_summary_run_records_each_stage(monkeypatch) -> None:
+    """Test a run is accounted per stage, and repeated from the cache."""
+
+    class Connector:
+        async def acomplete(
+            self, prompt: str, max_tokens: int, settings: GenerateSettings
+        ) -> str:
+            return "summary"
+
+    monkeypatch.setitem(llm_handler.CONNECTORS, "litellm", Connector())
+    monkeypatch.setattr(llm_handler, "get_rate_limiter", lambda _: RateLimiter())
+    comments = [
+        SimpleNamespace(
+            id=f"c{i}",
+            author=SimpleNamespace(name=f"user{i}"),
+            created_utc=1_686_000_000 + i,
+            score=1,
+            body=f"comment {i} about topic{i} with its own words{i} here{i}",
+            replies=[],
+        )
+        for i in range(30)
+    ]
+
+    def run() -> RunMetrics:
+        metrics = RunMetrics()
+        with track_run(metrics):
+            reddit_data = build_reddit_data(
+                "Title", "body", "test", comments, generate_data.app_logger
+            )
+            generate_summary_data(
+                settings=SETTINGS,
+                reddit_data=reddit_data,
+                logger=generate_data.app_logger,
+            )
+        return metrics
+
+    first, second = run(), run()
+
+    stages = first.as_dict()["stages"]
+    assert {
+        "flatten",
+        "dedup",
+        "transcript",
+        "chunk",
+        "fit_prompt",
+        "summarize",
+        "condense",
+    } <= set(stages)
+    assert stages["flatten"]["calls"] == stages["transcript"]["calls"] == 1
+    assert stages["summarize"]["llm_calls"] == 3
+    assert stages["summarize"]["cache_misses"] == 3
+    assert stages["summarize"]["prompt_tokens"] > 3 * 100
+    assert stages["summarize"]["completion_tokens"] == 3 * num_tokens_from_string(
+        "summary", SETTINGS["selected_model"]
+    )
+    assert stages["condense"]["llm_calls"] == 1
+    assert stages["fit_prompt"]["calls"] == 3
+    assert stages["fit_prompt"]["tokenizer_calls"] >= 3
+    assert second.totals()["cache_hits"] == 4
+    assert second.totals()["prompt_tokens"] == 0
@@ -0,0 +1,45 @@
+"""Startup tests: the app renders without importing the LLM SDKs."""
+
+import subprocess
+import sys
+import textwrap
+
+from benchmarks.bench_startup import (
+    APP_DIR,
+    LAZY_MODULES,
+    app_env,
+    import_times,
+)
+
+RENDER_SETTINGS_PAGE = textwrap.dedent(
+    f"""
+    import sys
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file("main.py", default_timeout=60).run()
+    assert not app.exception, app.exception
+    assert app.button, "the settings page did not render"
+    print(",".join(sorted({{m.split(".")[0] for m in sys.modules}} & {set(LAZY_MODULES)!r})))
+    """
+)
+
+
+def test_import_main_imports_no_sdk():
+    """Importing the app entry point leaves every SDK unimported."""
+    imported = {name.split(".")[0] for name, _, _ in import_times("main")}
+    assert "streamlit" in imported
+    assert not imported & set(LAZY_MODULES)
+
+
+def test_settings_page_renders_before_any_sdk_import(tmp_path):
+    """A full script run of the settings page imports no SDK."""
+    result = subprocess.run(
+        [sys.executable, "-c", RENDER_SETTINGS_PAGE],
+        capture_output=True,
+        check=False,
+        cwd=APP_DIR,
+        env=app_env(),
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ""
@@ -4,7 +4,13 @@ import os
 
 import tiktoken
 from utils.common import generate_filename, get_timestamp, save_output
-from utils.llm_utils import num_tokens_from_string
+from utils.llm_utils import (
+    estimate_word_count,
+    group_bodies_into_chunks,
+    iter_chunks,
+    num_tokens_from_string,
+)
+from utils.tokenizers import HeuristicTokenizer, TokenizerRegistry
 
 
 def test_num_tokens_from_string() -> None:
@@ -18,6 +24,90 @@ def test_num_tokens_from_string() -> None:
     assert result == 3
 
 
+def test_tokenizer_registry_caches_per_encoding() -> None:
+    """Test TokenizerRegistry.get() reuses one tokenizer per encoding."""
+    gpt4 = TokenizerRegistry.get("openai/gpt-4")
+
+    assert TokenizerRegistry.get("openai/gpt-4") is gpt4
+    assert TokenizerRegistry.get("openai/gpt-3.5-turbo") is gpt4
+    assert TokenizerRegistry.encoding_name("openai/gpt-4o") == "o200k_base"
+    assert TokenizerRegistry.encoding_name("anthropic/claude-3-haiku-20240307") == (
+        TokenizerRegistry.encoding_name(None)
+    )
+
+
+def test_tokenizer_count_many_matches_count() -> None:
+    """Test count_many() agrees with count() for every text."""
+    tokenizer = TokenizerRegistry.get("openai/gpt-4")
+    texts = ["Hello World!", "", "a longer sentence, with punctuation..."]
+
+    assert tokenizer.count_many(texts) == [tokenizer.count(text) for text in texts]
+
+
+def test_tokenizer_registry_falls_back_offline(monkeypatch) -> None:
+    """Test an encoding that cannot be loaded is replaced by an estimate."""
+
+    def unavailable(encoding_name: str) -> None:
+        raise ConnectionError(encoding_name)
+
+    monkeypatch.setattr("utils.tokenizers.TiktokenTokenizer", unavailable)
+    monkeypatch.setattr(TokenizerRegistry, "_tokenizers", {})
+    monkeypatch.setitem(TokenizerRegistry.model_encodings(), "test/model", "offline")
+
+    tokenizer = TokenizerRegistry.get("test/model")
+
+    assert isinstance(tokenizer, HeuristicTokenizer)
+    assert tokenizer.count("12345678") == 2
+    # counts add up across lines, as the chunkers expect
+    assert (
+        tokenizer.count("12345\n678\n")
+        == 3
+        == sum(tokenizer.count_many(["12345\n", "678\n"]))
+    )
+    assert tokenizer.truncate("12345678", 1) == "1234"
+
+
+def test_group_bodies_into_chunks_matches_full_retokenization() -> None:
+    """Test group_bodies_into_chunks() against re-tokenizing every chunk."""
+    contents = (
+        "First comment, with punctuation...\n\n\n"
+        "    > 2023-Jun-12 10:00 [someone] a reply: yes!\n"
+        "\n"
+        "        > nested   reply with   spacing \t\n"
+        + "filler words " * 40
+        + "\n\n> last line 12345"
+    )
+
+    for token_length in (1, 5, 20, 80, 1000):
+        expected: list[str] = []
+        current_chunk = ""
+        for line in contents.split("\n"):
+            line = line.strip()[: estimate_word_count(1000)] + "\n"
+            if num_tokens_from_string(current_chunk + line) > token_length:
+                expected.append(current_chunk)
+                current_chunk = ""
+            current_chunk += line
+        if current_chunk:
+            expected.append(current_chunk)
+
+        assert group_bodies_into_chunks(contents, token_length) == expected
+
+
+def test_iter_chunks_is_lazy() -> None:
+    """Test iter_chunks() yields a chunk before consuming the remaining lines."""
+    consumed: list[str] = []
+
+    def lines():
+        for line in ("alpha beta gamma", "delta epsilon zeta", "eta theta iota"):
+            consumed.append(line)
+            yield line
+
+    chunks = iter_chunks(lines(), 4, lambda text: len(text.split()))
+
+    assert next(chunks) == "alpha beta gamma\n"
+    assert len(consumed) == 2
+
+
 def test_generate_filename() -> None:
     """Test generate_filename()."""
     title: str = "Hello World!"
@@ -0,0 +1,112 @@
+"""
+Streamlit caches for the slow steps before summarizing, shared by every
+session, so prompt experiments don't re-fetch and re-chunk the thread.
+"""
+
+import hashlib
+import threading
+
+import streamlit as st
+from config import ConfigVars
+from data_types.summary import RedditData
+from log_tools import Logger
+from utils.comment_store import chunk_comments
+from utils.tokenizers import TokenizerRegistry
+
+config = ConfigVars()
+
+
+class CachedThread:
+    """A fetched thread and the token budget it was fetched with."""
+
+    __slots__ = ("lock", "reddit_data", "token_budget")
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.reddit_data: RedditData | None = None
+        self.token_budget: int | None = None
+
+    def covers(self, token_budget: int | None) -> bool:
+        """Whether the thread holds the comments of a fetch with token_budget."""
+        if self.reddit_data is None:
+            return False
+        if self.token_budget is None:  # the whole thread
+            return True
+        return token_budget is not None and token_budget <= self.token_budget
+
+
+@st.cache_resource(
+    ttl=config.THREAD_CACHE_TTL_SECONDS,
+    max_entries=config.THREAD_CACHE_MAX_ENTRIES,
+    show_spinner=False,
+)
+def _cached_thread(json_url: str) -> CachedThread:
+    return CachedThread()
+
+
+def fetch_thread(
+    json_url: str, token_budget: int | None = None, model: str | None = None
+) -> RedditData:
+    """
+    get_reddit_praw, cached by URL. The thread is fetched again only when a
+    run needs more of it than was fetched, a larger token_budget or the whole
+    thread (None), so changing the chunk length or the number of summaries
+    reuses it.
+    """
+    import generate_data
+
+    cached = _cached_thread(json_url)
+    with cached.lock:
+        if not cached.covers(token_budget):
+            cached.reddit_data = generate_data.get_reddit_praw(
+                json_url=json_url,
+                logger=Logger.get_app_logger(),
+                token_budget=token_budget,
+                model=model,
+            )
+            cached.token_budget = token_budget
+        return cached.reddit_data
+
+
+@st.cache_data(max_entries=config.CHUNK_CACHE_MAX_ENTRIES, show_spinner=False)
+def _cached_chunks(
+    comments_hash: str,
+    chunk_token_length: int,
+    tokenizer: str,
+    max_chunks: int | None,
+    _reddit_data: RedditData,
+    _model: str | None,
+) -> list[str]:
+    # _reddit_data and _model are not hashed, comments_hash and tokenizer stand in
+    return chunk_comments(_reddit_data, chunk_token_length, _model, max_chunks)
+
+
+def plan_chunks(
+    reddit_data: RedditData,
+    chunk_token_length: int,
+    model: str | None = None,
+    max_chunks: int | None = None,
+) -> list[str]:
+    """
+    chunk_comments, cached by the hash of the comments and their scores, the
+    chunk length, the model's tokenizer and max_chunks, so models sharing a
+    tokenizer share the plan. The scores are hashed as selecting comments
+    depends on them, and a refetch may only change those.
+    """
+    comments_hash = hashlib.sha256((reddit_data["comments"] or "").encode("utf-8"))
+    if (store := reddit_data.get("comment_store")) is not None:
+        comments_hash.update(store.scores.tobytes())
+    return _cached_chunks(
+        comments_hash.hexdigest(),
+        chunk_token_length,
+        TokenizerRegistry.encoding_name(model),
+        max_chunks,
+        reddit_data,
+        model,
+    )
+
+
+def clear_caches() -> None:
+    """Forget every cached thread and chunk plan."""
+    _cached_thread.clear()
+    _cached_chunks.clear()
@@ -4,13 +4,15 @@ UI functions
 # Import necessary modules
 
 import logging
+from typing import Any
 
 import streamlit as st
 from config import ConfigVars
 from data_types.summary import GenerateSettings
-from generate_data import generate_summary_data, get_reddit_praw
+from ui.cached_data import clear_caches, fetch_thread, plan_chunks
 from ui.settings import render_settings
 from utils.common import is_valid_reddit_url, replace_last_token_with_json, save_output
+from utils.run_metrics import RunMetrics, track_run
 
 config = ConfigVars()
 
@@ -29,65 +31,132 @@ def render_input_box() -> str | None:
     return reddit_url
 
 
+def render_metrics(metrics: RunMetrics) -> None:
+    """
+    Render where the time and tokens of a run went, per stage, with the run
+    as JSON and in the Prometheus text format to copy into dashboards.
+    """
+    totals = metrics.totals()
+    with st.expander("Run metrics"):
+        st.caption(
+            f"{metrics.seconds:.1f}s, {totals['llm_calls']:.0f} LLM calls"
+            f" ({totals['cache_hits']:.0f} cached), {totals['prompt_tokens']:.0f}"
+            f" prompt and {totals['completion_tokens']:.0f} completion tokens,"
+            f" {totals['rate_limit_wait_seconds']:.1f}s rate limited."
+        )
+        st.dataframe(
+            [
+                {"stage": name, **stage_metrics}
+                for name, stage_metrics in metrics.as_dict()["stages"].items()
+            ]
+        )
+        json_tab, prometheus_tab = st.tabs(["JSON", "Prometheus"])
+        json_tab.code(metrics.to_json(), language="json")
+        prometheus_tab.code(metrics.to_prometheus(), language="text")
+
+
 def render_output(
-    reddit_url: str,
+    reddit_url: str | None,
     app_logger: logging.Logger | None = None,
     settings: GenerateSettings | None = None,
+    reddit_json: bytes | None = None,
 ) -> None:
     """
-    Render the placeholder for the summary.
+    Render the placeholder for the summary. A saved thread in reddit_json is
+    used instead of fetching reddit_url.
     """
+    # imported here so the page renders before the Reddit and LLM SDKs load
+    from generate_data import fetch_token_budget, generate_summary_data, get_reddit_json
+    from llm_handler import rate_limit_wait
+
     output_placeholder = st.empty()
+    metrics = RunMetrics()
 
     with output_placeholder.container():
-        if app_logger:
-            app_logger.info("Generating summary data")
-
-        progress_text = "Operation in progress. Please wait."
-        my_bar = st.progress(0, text=progress_text)
-
-        def progress_callback(
-            progress: int,
-            idx: int,
-            prompt: str,
-            summary: str,
-        ) -> None:
-            my_bar.progress(progress, text=progress_text)
-            with st.expander(f"Prompt {idx}"):
-                st.text(prompt)
-            st.subheader(f"Response: {idx}")
-            st.markdown(summary)
-
-        try:
-            reddit_data = get_reddit_praw(
-                json_url=replace_last_token_with_json(reddit_url),
-                logger=app_logger,
-            )
-
-            if not reddit_data:
-                st.error("no reddit data")
-                st.stop()
-
-            st.text("Original Content:")
-            st.subheader(reddit_data["title"])
-            st.text(reddit_data["selftext"])
-
-            str_output = generate_summary_data(
-                settings=settings,
-                reddit_data=reddit_data,
-                logger=app_logger,
-                progress_callback=progress_callback,
-            )
-
-            save_output(str(reddit_data["title"]), str(str_output))
-
+        with track_run(metrics):
             if app_logger:
-                app_logger.info("Summary data generated")
-
-        except Exception as ex:  # pylint: disable=broad-except
-            st.error(f"Unexpected error trying to generate_summary_data: {ex}")
-
-        st.success("Done!")
+                app_logger.info("Generating summary data")
+
+            progress_text = "Operation in progress. Please wait."
+            my_bar = st.progress(0, text=progress_text)
+
+            # group number -> (prompt placeholder, response placeholder, deltas)
+            streams: dict[int, tuple[Any, Any, list[str]]] = {}
+
+            def stream_callback(idx: int, delta: str) -> None:
+                if idx not in streams:
+                    prompt_slot = st.empty()
+                    st.subheader(f"Response: {idx}")
+                    streams[idx] = (prompt_slot, st.empty(), [])
+                _, response_slot, deltas = streams[idx]
+                deltas.append(delta)
+                response_slot.markdown("".join(deltas))
+
+            def progress_callback(
+                progress: int,
+                idx: int,
+                prompt: str,
+                summary: str,
+            ) -> None:
+                text = progress_text
+                if settings and (wait := rate_limit_wait(settings["selected_model"])):
+                    text += f" Rate limited, next request in {wait:.0f}s."
+                my_bar.progress(progress, text=text)
+                if idx in streams:
+                    prompt_slot, response_slot, _ = streams.pop(idx)
+                    with prompt_slot.container(), st.expander(f"Prompt {idx}"):
+                        st.text(prompt)
+                    response_slot.markdown(summary)
+                    return
+                with st.expander(f"Prompt {idx}"):
+                    st.text(prompt)
+                st.subheader(f"Response: {idx}")
+                st.markdown(summary)
+
+            try:
+                if reddit_json:
+                    reddit_data = get_reddit_json(reddit_json, logger=app_logger)
+                else:
+                    reddit_data = fetch_thread(
+                        json_url=replace_last_token_with_json(str(reddit_url)),
+                        token_budget=fetch_token_budget(settings) if settings else None,
+                        model=settings["selected_model"] if settings else None,
+                    )
+
+                if not reddit_data:
+                    st.error("no reddit data")
+                    st.stop()
+
+                st.text("Original Content:")
+                st.subheader(reddit_data["title"])
+                st.text(reddit_data["selftext"])
+                if dedup_stats := reddit_data.get("dedup_stats"):
+                    st.caption(
+                        f"Skipped {dedup_stats['comments_removed']} duplicate or noise"
+                        f" comments, ~{dedup_stats['tokens_removed']}"
+                        f" {dedup_stats['tokenizer']} tokens."
+                    )
+
+                str_output = generate_summary_data(
+                    settings=settings,
+                    reddit_data=reddit_data,
+                    logger=app_logger,
+                    progress_callback=progress_callback,
+                    stream_callback=stream_callback,
+                    chunker=plan_chunks,
+                )
+
+                save_output(str(reddit_data["title"]), str(str_output))
+
+                if app_logger:
+                    app_logger.info("Summary data generated")
+
+            except Exception as ex:  # pylint: disable=broad-except
+                st.error(f"Unexpected error trying to generate_summary_data: {ex}")
+
+            st.success("Done!")
+
+        render_metrics(metrics)
 
     if st.button("Clear"):
         output_placeholder.empty()
@@ -107,8 +176,14 @@ def render_layout(
     # Create an input box for url
     if not reddit_url:
         reddit_url = render_input_box()
-        if not reddit_url:
-            return
+
+    uploaded_file = st.file_uploader(
+        "Or load a saved thread (the .json of a Reddit URL):", type="json"
+    )
+    reddit_json = uploaded_file.getvalue() if uploaded_file else None
+
+    if not reddit_url and not reddit_json:
+        return
 
     settings = settings or render_settings()
 
@@ -116,10 +191,19 @@ def render_layout(
         st.error("No settings (not sure how this happened)")
         return
 
+    generate_col, refresh_col = st.columns([1, 5])
+    if refresh_col.button(
+        "Refresh thread",
+        help="Fetched threads are reused for a while, fetch them again.",
+    ):
+        clear_caches()
+        refresh_col.caption("Cleared, the next run fetches the thread again.")
+
     # Create a button to submit the url
-    if st.button("Generate it!"):
+    if generate_col.button("Generate it!"):
         render_output(
             app_logger=app_logger,
             settings=settings,
             reddit_url=reddit_url,
+            reddit_json=reddit_json,
         )
@@ -1,20 +1,17 @@
 """This module contains the settings UI for the app."""
 
 import streamlit as st
-from config import (
-    MODELS,
-    ConfigVars,
-)
+from config import ConfigVars, get_models
 from data_types.summary import GenerateSettings
 from utils.streamlit_decorators import expander_decorator
 
 config = ConfigVars()
 
 
-def model_selection(col) -> tuple[str, int, int, int, int]:
+def model_selection(col) -> tuple[str, int, int, int, int, int]:
     """Render the model selection and return the selected model and settings."""
 
-    models = MODELS
+    models = get_models()
     model_ids_sorted = {
         model.id: model for model in sorted(models, key=lambda x: x.name)
     }
@@ -51,6 +48,13 @@ def model_selection(col) -> tuple[str, int, int, int, int]:
             value=getattr(selected_model_config, "max_context_length", 0),
             step=1,
         ),
+        col.number_input(
+            "Max Concurrent Requests",
+            value=selected_model_config.max_concurrency,
+            min_value=1,
+            max_value=10,
+            step=1,
+        ),
     )
 
 
@@ -75,10 +79,34 @@ def render_settings() -> GenerateSettings:
         max_number_of_summaries,
         max_token_length,
         max_context_length,
+        max_concurrency,
     ) = model_selection(col1)
 
+    summary_mode: str = col1.radio(
+        "Context for Later Summaries",
+        options=["condensed", "rolling"],
+        format_func={
+            "condensed": "Condensed post (parallel)",
+            "rolling": "Previous summary (rolling)",
+        }.get,
+    )
+
     with col2:
         st.markdown(config.HELP_TEXT)
+        bypass_cache: bool = st.checkbox(
+            "Bypass response cache",
+            help="Always call the model, even for a prompt it has answered before.",
+        )
+        reduce_summaries: bool = st.checkbox(
+            "Combine into one final summary",
+            help="Merge the summaries a few at a time until one is left.",
+        )
+        select_comments: bool = st.checkbox(
+            "Pick the best comments",
+            value=True,
+            help="Fill the summaries with the comments with the best score,"
+            " depth and recency for their length, instead of the first ones.",
+        )
 
     return {
         "system_role": system_role,
@@ -88,4 +116,9 @@ def render_settings() -> GenerateSettings:
         "max_token_length": max_token_length,
         "selected_model": selected_model,
         "max_context_length": max_context_length,
+        "max_concurrency": max_concurrency,
+        "use_cache": not bypass_cache,
+        "summary_mode": summary_mode,
+        "reduce_summaries": reduce_summaries,
+        "select_comments": select_comments,
     }
@@ -0,0 +1,70 @@
+"""Run coroutines from synchronous code on one shared event loop."""
+
+import asyncio
+import threading
+from collections.abc import AsyncIterator, Coroutine, Iterator
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+class BackgroundLoop:
+    """
+    A process-wide event loop running on a daemon thread.
+
+    Async clients hold connection pools bound to the loop they were first used
+    on, running every request on the same loop lets them be shared across
+    Streamlit reruns and worker threads.
+    """
+
+    _loop: asyncio.AbstractEventLoop | None = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_loop(cls) -> asyncio.AbstractEventLoop:
+        """Return the shared loop, starting it on first use."""
+        if cls._loop is None:
+            with cls._lock:
+                if cls._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(
+                        target=loop.run_forever,
+                        name="background-event-loop",
+                        daemon=True,
+                    ).start()
+                    cls._loop = loop
+        return cls._loop
+
+    @classmethod
+    def run(cls, coro: Coroutine[Any, Any, T]) -> T:
+        """Run a coroutine on the shared loop and block until it completes."""
+        loop = cls.get_loop()
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is loop:
+            coro.close()
+            raise RuntimeError("BackgroundLoop.run() called from the loop thread")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    @classmethod
+    def iterate(cls, aiterator: AsyncIterator[T]) -> Iterator[T]:
+        """
+        Iterate an async iterator on the shared loop from synchronous code,
+        fetching one item per round trip. Closing the generator early closes
+        the async iterator too.
+        """
+
+        async def next_item() -> T:
+            return await aiterator.__anext__()
+
+        try:
+            while True:
+                try:
+                    yield cls.run(next_item())
+                except StopAsyncIteration:
+                    return
+        finally:
+            if aclose := getattr(aiterator, "aclose", None):
+                cls.run(aclose())
@@ -0,0 +1,346 @@
+"""A columnar store of the comments of one thread."""
+
+import heapq
+import math
+from array import array
+from collections.abc import Iterable, Iterator, Sequence
+from datetime import datetime
+from typing import Any
+
+from config import ConfigVars
+from data_types.summary import RedditData
+from utils.llm_utils import group_bodies_into_chunks, iter_chunks, normalize_line
+from utils.tokenizers import TokenizerRegistry
+
+config = ConfigVars()
+
+# bodies of comments whose text is gone, never worth a token
+REMOVED_BODIES = frozenset(("[deleted]", "[removed]"))
+
+
+def format_date(timestamp: float) -> str:
+    """Format a timestamp into a human-readable date."""
+    date: datetime = datetime.fromtimestamp(timestamp)
+    return date.strftime("%Y-%b-%d %H:%M")
+
+
+class CommentStore:
+    """
+    The comments of a thread in transcript order (depth-first, newest reply
+    first), one parallel column per field, filled once at ingestion.
+
+    The chunk text of every comment is built from the columns on first use,
+    and its token count once per tokenizer, so chunking a thread again for
+    another chunk length or model never re-parses or re-tokenizes it.
+    """
+
+    __slots__ = (
+        "ids",
+        "parents",
+        "depths",
+        "authors",
+        "created",
+        "scores",
+        "bodies",
+        "_chunk_texts",
+        "_token_counts",
+    )
+
+    def __init__(self) -> None:
+        self.ids: list[str] = []
+        self.parents = array("l")  # index of the parent comment, -1 at the top
+        self.depths = array("l")
+        self.authors: list[str] = []
+        self.created = array("d")
+        self.scores = array("l")
+        self.bodies: list[str] = []
+        self._chunk_texts: list[str] | None = None
+        # encoding name -> the token count of every chunk text
+        self._token_counts: dict[str, array[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def append(
+        self,
+        comment_id: str,
+        parent: int,
+        depth: int,
+        author: str,
+        created_utc: float,
+        score: int,
+        body: str,
+    ) -> int:
+        """Add a comment after the others, return its index."""
+        self.ids.append(comment_id)
+        self.parents.append(parent)
+        self.depths.append(depth)
+        self.authors.append(author)
+        self.created.append(created_utc)
+        self.scores.append(score)
+        self.bodies.append(body)
+        self._chunk_texts = None
+        self._token_counts.clear()
+        return len(self.ids) - 1
+
+    @classmethod
+    def from_comments(cls, comments: Iterable[Any]) -> "CommentStore":
+        """
+        Store praw or JsonComment comment trees in the order iter_comments
+        flattens them, without the "load more comments" stubs.
+        """
+        store = cls()
+        stack: list[tuple[Any, int, int]] = [
+            (comment, -1, 0) for comment in reversed(list(comments))
+        ]
+
+        while stack:
+            node, parent, depth = stack.pop()
+            index = store.append(
+                getattr(node, "id", ""),
+                parent,
+                depth,
+                node.author.name if node.author else "[deleted]",
+                node.created_utc,
+                getattr(node, "score", 0),
+                node.body,
+            )
+            replies = sorted(
+                (reply for reply in node.replies if hasattr(reply, "body")),
+                key=lambda reply: reply.created_utc,
+                reverse=True,
+            )
+            stack.extend((reply, index, depth + 1) for reply in reversed(replies))
+
+        return store
+
+    def subset(self, indices: Sequence[int]) -> "CommentStore":
+        """
+        Return a store of the comments at indices, in order, keeping their
+        cached chunk texts and token counts. A comment whose parent is left
+        out hangs from its nearest ancestor kept, one level below it, or
+        becomes top-level when no ancestor is kept, so it is never quoted
+        under a comment it does not reply to.
+        """
+        subset = CommentStore()
+        # old index -> new index of the comment or its nearest ancestor kept
+        position = array("l", [-1]) * len(self)
+        keep = set(indices)
+        redepthed: list[int] = []
+        for i in range(len(self)):
+            parent = position[self.parents[i]] if self.parents[i] >= 0 else -1
+            if i in keep:
+                depth = subset.depths[parent] + 1 if parent >= 0 else 0
+                if depth != self.depths[i]:
+                    redepthed.append(len(subset))
+                position[i] = subset.append(
+                    self.ids[i],
+                    parent,
+                    depth,
+                    self.authors[i],
+                    self.created[i],
+                    self.scores[i],
+                    self.bodies[i],
+                )
+            else:
+                position[i] = parent
+
+        ordered = sorted(keep)
+        if self._chunk_texts is not None:
+            subset._chunk_texts = [self._chunk_texts[i] for i in ordered]
+            for i in redepthed:
+                subset._chunk_texts[i] = subset.chunk_text(i)
+        if not redepthed:
+            subset._token_counts = {
+                encoding: array("l", (counts[i] for i in ordered))
+                for encoding, counts in self._token_counts.items()
+            }
+        return subset
+
+    def entry(self, i: int) -> str:
+        """Format comment i the way iter_comments does, quoting replies."""
+        depth = self.depths[i]
+        prefix = "    " * (depth - 1) + "> " if depth else ""
+        return (
+            f"{prefix}{format_date(self.created[i])} [{self.authors[i]}]"
+            f" {self.bodies[i]}\n"
+        )
+
+    def transcript(self) -> str:
+        """Return the flattened thread, the same string as joining iter_comments."""
+        return "".join(map(self.entry, range(len(self))))
+
+    def chunk_texts(self) -> list[str]:
+        """Return every comment's entry with its lines normalized for chunking."""
+        if self._chunk_texts is None:
+            self._chunk_texts = list(map(self.chunk_text, range(len(self))))
+        return self._chunk_texts
+
+    def chunk_text(self, i: int) -> str:
+        """Return comment i's entry with its lines normalized for chunking."""
+        return "".join(map(normalize_line, self.entry(i)[:-1].split("\n")))
+
+    def token_counts(self, model: str | None = None) -> "array[int]":
+        """Return the token count of every chunk text for the model's tokenizer."""
+        encoding = TokenizerRegistry.encoding_name(model)
+        if encoding not in self._token_counts:
+            tokenizer = TokenizerRegistry.get(model)
+            self._token_counts[encoding] = array(
+                "l", tokenizer.count_many(self.chunk_texts())
+            )
+        return self._token_counts[encoding]
+
+    def values(
+        self,
+        depth_decay: float = config.SELECTION_DEPTH_DECAY,
+        half_life_hours: float = config.SELECTION_RECENCY_HALF_LIFE_HOURS,
+    ) -> list[float]:
+        """
+        Return how informative every comment is likely to be: growing with the
+        log of its score, shrinking by depth_decay per reply level and halving
+        for every half_life_hours it is older than the newest comment.
+        Removed comments are worth nothing.
+        """
+        newest = max(self.created, default=0.0)
+        half_life = half_life_hours * 3600
+        return [
+            0.0
+            if body in REMOVED_BODIES
+            else math.log2(2 + max(score, 0))
+            * depth_decay**depth
+            * 0.5 ** ((newest - created) / half_life)
+            for body, score, depth, created in zip(
+                self.bodies, self.scores, self.depths, self.created
+            )
+        ]
+
+    def select(self, token_budget: int, model: str | None = None) -> list[int]:
+        """
+        Pick the comments worth the most per token that fit in token_budget
+        tokens together, returning their indices in transcript order.
+
+        Greedy best-first over the tree with a heap: a reply becomes a
+        candidate once its parent is picked, so every picked reply keeps its
+        context. A candidate is ranked by the best value per token in its
+        subtree, so a weak parent is still picked to reach a great reply, and
+        a long weak subtree is never walked for nothing. Candidates that no
+        longer fit are skipped with their subtree.
+        """
+        counts = self.token_counts(model)
+        density = [value / max(count, 1) for value, count in zip(self.values(), counts)]
+
+        # a child always comes after its parent, so one reverse pass suffices
+        best_below = density[:]
+        children: list[list[int]] = [[] for _ in range(len(self))]
+        for i in range(len(self) - 1, -1, -1):
+            parent = self.parents[i]
+            if parent >= 0:
+                best_below[parent] = max(best_below[parent], best_below[i])
+                children[parent].append(i)
+
+        candidates = [
+            (-best_below[i], i) for i in range(len(self)) if self.parents[i] < 0
+        ]
+        heapq.heapify(candidates)
+        selected: list[int] = []
+        spent = 0
+
+        while candidates:
+            _, i = heapq.heappop(candidates)
+            if spent + counts[i] > token_budget or not best_below[i]:
+                continue
+            selected.append(i)
+            spent += counts[i]
+            for child in children[i]:
+                heapq.heappush(candidates, (-best_below[child], child))
+
+        return sorted(selected)
+
+    def iter_chunks(
+        self,
+        token_length: int,
+        model: str | None = None,
+        indices: Sequence[int] | None = None,
+    ) -> Iterator[str]:
+        """
+        Yield newline-delimited chunks of at most token_length tokens from the
+        cached token counts, keeping comments whole. Every chunk text starts
+        with a non-whitespace character right after a newline, a stable
+        pre-token boundary, so the counts of a chunk add up to its exact
+        length. Only a comment longer than token_length is tokenized again, to
+        split it between its lines, and no chunk is empty. indices limits the
+        chunks to some comments, e.g. those picked by select.
+        """
+        chunk: list[str] = []
+        tokens = 0
+        texts, counts = self.chunk_texts(), self.token_counts(model)
+        if indices is None:
+            indices = range(len(self))
+
+        for text, count in ((texts[i], counts[i]) for i in indices):
+            if count > token_length:
+                if chunk:
+                    yield "".join(chunk)
+                    chunk, tokens = [], 0
+                # a first line over token_length makes iter_chunks yield ""
+                yield from filter(
+                    None,
+                    iter_chunks(
+                        text[:-1].split("\n"),
+                        token_length,
+                        TokenizerRegistry.get(model).count,
+                    ),
+                )
+                continue
+
+            if tokens + count > token_length:
+                yield "".join(chunk)
+                chunk, tokens = [], 0
+            chunk.append(text)
+            tokens += count
+
+        if chunk:
+            yield "".join(chunk)
+
+
+def select_chunks(
+    store: CommentStore,
+    token_length: int,
+    max_chunks: int,
+    model: str | None = None,
+) -> list[str]:
+    """
+    Return at most max_chunks chunks of the comments that store.select picks
+    for max_chunks chunks' worth of tokens. Comments are kept whole, so if
+    the picks do not pack into max_chunks chunks the budget shrinks by the
+    overflow and they are picked again.
+    """
+    budget = token_length * max_chunks
+    while True:
+        chunks = list(
+            store.iter_chunks(token_length, model, store.select(budget, model))
+        )
+        overflow = chunks[max_chunks:]
+        if not overflow:
+            return chunks
+        budget -= sum(TokenizerRegistry.get(model).count_many(overflow))
+
+
+def chunk_comments(
+    reddit_data: RedditData,
+    token_length: int,
+    model: str | None = None,
+    max_chunks: int | None = None,
+) -> list[str]:
+    """
+    Split a thread's comments into groups of at most token_length tokens,
+    from its comment store when it has one, else from the transcript. With
+    max_chunks, the store's most valuable comments are selected to fill that
+    many groups, see select_chunks, instead of taking all in thread order.
+    """
+    store = reddit_data.get("comment_store")
+    if store is not None:
+        if max_chunks is not None:
+            return select_chunks(store, token_length, max_chunks, model)
+        return list(store.iter_chunks(token_length, model))
+    return group_bodies_into_chunks(reddit_data["comments"] or "", token_length, model)
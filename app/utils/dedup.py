@@ -0,0 +1,149 @@
+"""
+Drop near-duplicate, bot and noise comments before they are chunked.
+
+Near-duplicates are found with MinHash: each comment is sketched by the
+SKETCH_SIZE smallest hashes of its word shingles, which estimates the
+Jaccard similarity of two comments (exactly, for comments with fewer
+shingles). Only comments sharing one of their INDEX_HASHES smallest hashes
+are compared, so a thread is filtered in near-linear time, and comments can
+be filtered one at a time as they are fetched, see CommentFilter.
+"""
+
+import heapq
+import re
+from collections.abc import Sequence
+from zlib import crc32
+
+from config import ConfigVars
+from data_types.summary import DedupStats
+from utils.comment_store import REMOVED_BODIES, CommentStore
+from utils.tokenizers import TokenizerRegistry
+
+config = ConfigVars()
+
+SKETCH_SIZE = 32
+# smallest hashes a sketch is indexed by, near-duplicates share one of them
+INDEX_HASHES = 8
+# comments indexed per hash, common shingles like "i don t" stop being indexed
+MAX_BUCKET_SIZE = 32
+# the signature of bot comments, as words so "i am a botanist" is not one
+BOT_SIGNATURE_RE = re.compile(r"\bi am a bot\b")
+
+WORD_RE = re.compile(r"\w+")
+
+
+def shingle_hashes(words: Sequence[str], shingle_size: int) -> set[int]:
+    """Return the crc32 of every run of shingle_size words."""
+    return {
+        crc32(" ".join(words[start : start + shingle_size]).encode("utf-8"))
+        for start in range(max(1, len(words) - shingle_size + 1))
+    }
+
+
+def sketch(words: Sequence[str], shingle_size: int) -> list[int]:
+    """Return the bottom-k MinHash sketch of the word shingles, ascending."""
+    return heapq.nsmallest(SKETCH_SIZE, shingle_hashes(words, shingle_size))
+
+
+def similarity(first: Sequence[int], second: Sequence[int]) -> float:
+    """Estimate the Jaccard similarity of two sketched comments."""
+    first_set, second_set = set(first), set(second)
+    union = heapq.nsmallest(SKETCH_SIZE, first_set | second_set)
+    shared = sum(1 for h in union if h in first_set and h in second_set)
+    return shared / len(union)
+
+
+def is_noise(words: Sequence[str], body: str, author: str, min_words: int) -> bool:
+    """Whether a comment is removed, a bot's, or too short to say anything."""
+    return (
+        body in REMOVED_BODIES
+        or author in config.DEDUP_BOT_AUTHORS
+        or BOT_SIGNATURE_RE.search(body.lower()) is not None
+        or len(words) < min_words
+    )
+
+
+class CommentFilter:
+    """
+    Filters comments one at a time, in thread order: keep() rejects noise
+    comments and comments at least min_similarity similar to one it kept,
+    and counts what it rejected.
+    """
+
+    __slots__ = (
+        "shingle_size",
+        "min_similarity",
+        "min_words",
+        "duplicates",
+        "noise",
+        "_sketches",
+        "_buckets",
+    )
+
+    def __init__(
+        self,
+        shingle_size: int = config.DEDUP_SHINGLE_SIZE,
+        min_similarity: float = config.DEDUP_MIN_SIMILARITY,
+        min_words: int = config.DEDUP_MIN_WORDS,
+    ) -> None:
+        self.shingle_size = shingle_size
+        self.min_similarity = min_similarity
+        self.min_words = min_words
+        self.duplicates = 0
+        self.noise = 0
+        self._sketches: list[list[int]] = []
+        self._buckets: dict[int, list[int]] = {}
+
+    def keep(self, body: str, author: str) -> bool:
+        """Whether to keep the next comment, indexing it when kept."""
+        words = WORD_RE.findall(body.lower())
+        if is_noise(words, body, author, self.min_words):
+            self.noise += 1
+            return False
+
+        comment_sketch = sketch(words, self.shingle_size)
+        keys = comment_sketch[:INDEX_HASHES]
+        candidates = {other for key in keys for other in self._buckets.get(key, ())}
+        if any(
+            similarity(comment_sketch, self._sketches[other]) >= self.min_similarity
+            for other in candidates
+        ):
+            self.duplicates += 1
+            return False
+
+        for key in keys:
+            bucket = self._buckets.setdefault(key, [])
+            if len(bucket) < MAX_BUCKET_SIZE:
+                bucket.append(len(self._sketches))
+        self._sketches.append(comment_sketch)
+        return True
+
+
+def dedup_comments(
+    store: CommentStore,
+    shingle_size: int = config.DEDUP_SHINGLE_SIZE,
+    min_similarity: float = config.DEDUP_MIN_SIMILARITY,
+    min_words: int = config.DEDUP_MIN_WORDS,
+    model: str | None = None,
+) -> tuple[CommentStore, DedupStats]:
+    """
+    Return the store without the comments CommentFilter rejects, and what was
+    removed, the tokens counted with the model's tokenizer. The first of
+    near-duplicates is kept, replies of removed comments are kept.
+    """
+    comment_filter = CommentFilter(shingle_size, min_similarity, min_words)
+    kept: list[int] = []
+    removed: list[int] = []
+    for i, (body, author) in enumerate(zip(store.bodies, store.authors)):
+        (kept if comment_filter.keep(body, author) else removed).append(i)
+
+    texts = store.chunk_texts()
+    tokenizer = TokenizerRegistry.get(model)
+    stats: DedupStats = {
+        "comments_removed": len(removed),
+        "duplicates": comment_filter.duplicates,
+        "noise": comment_filter.noise,
+        "tokens_removed": sum(tokenizer.count_many(texts[i] for i in removed)),
+        "tokenizer": TokenizerRegistry.encoding_name(model),
+    }
+    return store.subset(kept), stats
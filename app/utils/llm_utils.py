@@ -2,51 +2,97 @@
 
 import math
 import re
+from collections.abc import Callable, Iterable, Iterator
 
-import tiktoken
-from anthropic import Anthropic
+from utils.tokenizers import TokenizerRegistry
 
 
-def group_bodies_into_chunks(contents: str, token_length: int) -> list[str]:
+def normalize_line(line: str) -> str:
+    """Collapse, strip and truncate a comment line, terminating it with a newline."""
+    line = re.sub(r"\n+", "\n", line).strip()
+    return line[: estimate_word_count(1000)] + "\n"
+
+
+def iter_chunks(
+    lines: Iterable[str],
+    token_length: int,
+    count_tokens: Callable[[str], int] | None = None,
+) -> Iterator[str]:
+    """
+    Yield newline-delimited chunks of at most token_length tokens, one chunk as
+    soon as its boundary is known.
+
+    Each line is tokenized a constant number of times. A line that starts with a
+    non-whitespace character right after a newline is a stable pre-token
+    boundary, so only the "tail" (the last non-blank line plus any blank lines
+    after it) has to be re-counted together with the incoming line. This keeps
+    the totals identical to tokenizing the whole chunk.
+    """
+    count_tokens = count_tokens or TokenizerRegistry.get().count
+    chunk: list[str] = []
+    stable_tokens = 0  # tokens in the chunk before the tail
+    tail = ""
+
+    for raw_line in lines:
+        line = normalize_line(raw_line)
+        tail_tokens = count_tokens(tail + line)
+
+        if stable_tokens + tail_tokens > token_length:
+            yield "".join(chunk)
+            chunk, stable_tokens, tail = [], 0, ""
+            tail_tokens = count_tokens(line)
+
+        chunk.append(line)
+
+        if line[0].isspace():
+            tail += line
+        else:
+            if tail:
+                stable_tokens += tail_tokens - count_tokens(line)
+            tail = line
+
+    if chunk:
+        yield "".join(chunk)
+
+
+def group_bodies_into_chunks(
+    contents: str,
+    token_length: int,
+    model: str | None = None,
+) -> list[str]:
     """
     Concatenate the content lines into a list of newline-delimited strings
     that are less than token_length tokens long.
     """
-    results: list[str] = []
-    current_chunk = ""
+    tokenizer = TokenizerRegistry.get(model)
+    return list(iter_chunks(contents.split("\n"), token_length, tokenizer.count))
 
-    for line in contents.split("\n"):
-        line = re.sub(r"\n+", "\n", line).strip()
-        line = line[: estimate_word_count(1000)] + "\n"
 
-        if num_tokens_from_string(current_chunk + line) > token_length:
-            results.append(current_chunk)
-            current_chunk = ""
-
-        current_chunk += line
-
-    if current_chunk:
-        results.append(current_chunk)
-
-    return results
+def num_tokens_from_string(string: str, model: str | None = None) -> int:
+    """
+    Returns the number of tokens in a text string for the given model id.
+    NOTE: openAI and Anthropics have different token counting mechanisms.
+    https://help.openai.com/en/articles/4936856-what-are-tokens-and-how-to-count-them
+    """
+    return TokenizerRegistry.get(model).count(string)
 
 
-def anthropic_sync_count_tokens(text: str) -> int:
-    """Count the number of tokens in a text string using the Anthropic API."""
-    client = Anthropic()
-    number_of_tokens = client.count_tokens(text)
-    return number_of_tokens
+def truncate_to_tokens(string: str, max_tokens: int, model: str | None = None) -> str:
+    """Cut a text string at a token offset so it is at most max_tokens long."""
+    if max_tokens <= 0:
+        return ""
+    return TokenizerRegistry.get(model).truncate(string, max_tokens)
 
 
-def num_tokens_from_string(string: str) -> int:
+def split_to_tokens(
+    string: str, max_tokens: int, model: str | None = None
+) -> list[str]:
     """
-    Returns the number of tokens in a text string.
-    NOTE: openAI and Anthropics have different token counting mechanisms.
-    https://help.openai.com/en/articles/4936856-what-are-tokens-and-how-to-count-them
+    Cut a text string into pieces of at most max_tokens tokens at token
+    offsets, dropping nothing, unlike group_bodies_into_chunks which is meant
+    for comment transcripts and truncates long lines.
     """
-
-    num_tokens = len(tiktoken.get_encoding("gpt2").encode(string))
-    return num_tokens
+    return TokenizerRegistry.get(model).split(string, max_tokens)
 
 
 def estimate_word_count(num_tokens: int) -> int:
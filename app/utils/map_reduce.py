@@ -0,0 +1,71 @@
+"""Map-reduce summarization: summarize chunks in parallel, then combine the
+summaries in a tree until one fits."""
+
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+
+from data_types.summary import MapReduceStats
+
+
+def tree_reduce(
+    summaries: Sequence[str],
+    combine: Callable[[list[str]], str],
+    fits: Callable[[str], bool],
+    fan_in: int = 4,
+    max_workers: int = 1,
+) -> tuple[str, MapReduceStats]:
+    """
+    Combine summaries fan_in at a time, level by level, until one is left,
+    running the combine calls of a level on up to max_workers threads. If the
+    last summary does not fit it is combined on its own once more, and kept
+    whether or not that made it fit. n summaries so take at most
+    ceil(log(n, fan_in)) + 1 levels, and at most (n - 1) / (fan_in - 1) calls
+    plus one per level.
+    """
+    if not summaries:
+        raise ValueError("tree_reduce needs at least one summary")
+    if fan_in < 2:
+        raise ValueError(f"fan_in must be at least 2, got {fan_in}")
+
+    stats: MapReduceStats = {"levels": 0, "calls": 0}
+    level = list(summaries)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        while len(level) > 1:
+            batches = [level[i : i + fan_in] for i in range(0, len(level), fan_in)]
+            # a lone summary left over at the end moves up a level as it is
+            carried = batches.pop() if len(batches[-1]) == 1 else []
+            level = list(executor.map(combine, batches)) + carried
+            stats["levels"] += 1
+            stats["calls"] += len(batches)
+
+    if not fits(level[0]):
+        level = [combine(level)]
+        stats["levels"] += 1
+        stats["calls"] += 1
+
+    return level[0], stats
+
+
+def map_reduce(
+    chunks: Sequence[str],
+    summarize: Callable[[str], str],
+    combine: Callable[[list[str]], str],
+    fits: Callable[[str], bool],
+    fan_in: int = 4,
+    max_workers: int = 1,
+) -> tuple[str, MapReduceStats]:
+    """
+    Summarize every chunk on up to max_workers threads, then tree_reduce the
+    summaries. The map counts as one level in the returned stats.
+    """
+    if not chunks:
+        raise ValueError("map_reduce needs at least one chunk")
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        summaries = list(executor.map(summarize, chunks))
+
+    summary, stats = tree_reduce(summaries, combine, fits, fan_in, max_workers)
+    stats["levels"] += 1
+    stats["calls"] += len(chunks)
+    return summary, stats
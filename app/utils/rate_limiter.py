@@ -0,0 +1,148 @@
+"""Token-bucket rate limiting for LLM requests."""
+
+import asyncio
+import email.utils
+import threading
+import time
+from collections.abc import Callable
+
+
+class TokenBucket:
+    """
+    A bucket holding up to capacity units, refilled continuously at
+    capacity per period seconds. Not thread-safe, RateLimiter locks it.
+    """
+
+    def __init__(
+        self,
+        capacity: float,
+        period: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = capacity
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Return the seconds until amount units are available."""
+        self._refill()
+        # A request larger than the bucket waits for a full bucket instead of
+        # waiting forever.
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def consume(self, amount: float) -> None:
+        """Take amount units, wait_time must have returned 0 first."""
+        self.tokens -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """
+    Limits requests and tokens per minute for one model. A None limit is not
+    enforced. Providers' Retry-After values block every caller until they pass.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int | None = None,
+        tokens_per_minute: int | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._clock = clock
+        self._requests = (
+            TokenBucket(requests_per_minute, clock=clock)
+            if requests_per_minute
+            else None
+        )
+        self._tokens = (
+            TokenBucket(tokens_per_minute, clock=clock) if tokens_per_minute else None
+        )
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _wait_time(self, tokens: int) -> float:
+        wait = max(0.0, self._blocked_until - self._clock())
+        if self._requests:
+            wait = max(wait, self._requests.wait_time(1))
+        if self._tokens:
+            wait = max(wait, self._tokens.wait_time(tokens))
+        return wait
+
+    def wait_time(self, tokens: int = 1) -> float:
+        """Return the seconds a request of this many tokens would wait now."""
+        with self._lock:
+            return self._wait_time(tokens)
+
+    def try_acquire(self, tokens: int = 1) -> float:
+        """
+        Take a slot for a request of this many tokens if one is free and
+        return 0, otherwise take nothing and return the seconds to wait.
+        """
+        with self._lock:
+            wait = self._wait_time(tokens)
+            if wait == 0:
+                if self._requests:
+                    self._requests.consume(1)
+                if self._tokens:
+                    self._tokens.consume(tokens)
+            return wait
+
+    def acquire(self, tokens: int = 1) -> float:
+        """Block until the request may be sent, return the seconds waited."""
+        waited = 0.0
+        while (wait := self.try_acquire(tokens)) > 0:
+            time.sleep(wait)
+            waited += wait
+        return waited
+
+    async def aacquire(self, tokens: int = 1) -> float:
+        """Like acquire, but sleeps without blocking the event loop."""
+        waited = 0.0
+        while (wait := self.try_acquire(tokens)) > 0:
+            await asyncio.sleep(wait)
+            waited += wait
+        return waited
+
+    def block_for(self, seconds: float) -> None:
+        """Hold back every request for seconds, e.g. from a Retry-After header."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, self._clock() + seconds)
+
+
+def retry_after_seconds(exc: BaseException) -> float | None:
+    """
+    Return the Retry-After delay carried by a provider error, if any. The
+    OpenAI, Anthropic and LiteLLM errors keep the HTTP response on .response.
+    """
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    if value := headers.get("retry-after-ms"):
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
@@ -0,0 +1,76 @@
+"""Parse saved Reddit thread JSON (the `.json` listing of a thread URL)."""
+
+import json
+from typing import Any
+
+try:  # orjson is optional, it parses large threads several times faster
+    import orjson
+
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
+
+
+class JsonRedditor:
+    """The author of a comment, mirroring praw's Redditor.name."""
+
+    __slots__ = ("name",)
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+
+class JsonComment:
+    """A comment parsed from listing JSON, with the praw attributes we use."""
+
+    __slots__ = ("id", "parent_id", "author", "created_utc", "score", "body", "replies")
+
+    def __init__(self, data: dict[str, Any], replies: list["JsonComment"]) -> None:
+        author = data.get("author")
+        self.id: str = data.get("id", "")
+        self.parent_id: str = data.get("parent_id", "")
+        self.author = JsonRedditor(author) if author and author != "[deleted]" else None
+        self.created_utc: float = data.get("created_utc", 0.0)
+        self.score: int = data.get("score", 0)
+        self.body: str = data.get("body", "")
+        self.replies = replies
+
+
+def parse_comments(listing: Any) -> tuple[list[JsonComment], int]:
+    """
+    Build the comment forest of a listing, skipping "more" stubs.
+
+    Returns the top-level comments and the number of skipped stubs.
+    """
+    if not isinstance(listing, dict):  # an empty "replies" is ""
+        return [], 0
+
+    comments: list[JsonComment] = []
+    skipped = 0
+    # (children still to visit, list receiving the parsed comments)
+    stack = [(listing["data"]["children"], comments)]
+
+    while stack:
+        children, target = stack.pop()
+        for child in children:
+            if child.get("kind") != "t1":
+                skipped += 1
+                continue
+            replies = child["data"].get("replies")
+            comment = JsonComment(child["data"], [])
+            target.append(comment)
+            if isinstance(replies, dict):
+                stack.append((replies["data"]["children"], comment.replies))
+
+    return comments, skipped
+
+
+def parse_thread(data: bytes | str) -> tuple[dict[str, Any], list[JsonComment], int]:
+    """
+    Parse a saved thread into the post data, its comment forest and the number
+    of skipped "more" stubs.
+    """
+    post_listing, comment_listing = loads(data)
+    post = post_listing["data"]["children"][0]["data"]
+    comments, skipped = parse_comments(comment_listing)
+    return post, comments, skipped
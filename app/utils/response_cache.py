@@ -0,0 +1,109 @@
+"""Persistent, content-addressed cache for LLM responses."""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class ResponseCache:
+    """
+    SQLite-backed response cache keyed by a hash of the request.
+
+    Entries expire after ttl_seconds, and the least recently used entries are
+    evicted once the cache holds more than max_entries.
+    """
+
+    def __init__(self, path: str, max_entries: int, ttl_seconds: float) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._connection: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model: str, system_role: str, prompt: str, max_tokens: int) -> str:
+        """Return the content hash identifying a request."""
+        payload = json.dumps([model, system_role, prompt, max_tokens])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " response TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed_at"
+                " ON responses (accessed_at)"
+            )
+        return self._connection
+
+    def get(self, key: str) -> str | None:
+        """Return the cached response for key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    connection.commit()
+                self.misses += 1
+                return None
+
+            connection.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            connection.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, response: str) -> None:
+        """Store a response and evict expired and least recently used entries."""
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            connection.execute(
+                "DELETE FROM responses WHERE created_at < ?",
+                (now - self.ttl_seconds,),
+            )
+            connection.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY accessed_at DESC"
+                " LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            connection.commit()
+
+    def stats(self) -> dict[str, int]:
+        """Return the hit and miss counters and the number of entries."""
+        with self._lock:
+            (entries,) = (
+                self._connect().execute("SELECT COUNT(*) FROM responses").fetchone()
+            )
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def clear(self) -> None:
+        """Remove every entry and reset the counters."""
+        with self._lock:
+            self._connect().execute("DELETE FROM responses")
+            self._connect().commit()
+            self.hits = 0
+            self.misses = 0
@@ -0,0 +1,274 @@
+"""
+Per-run metrics of the summary pipeline: wall time, tokenizer calls, LLM
+tokens, response cache hits and rate limiter waits per stage.
+
+A run is tracked with track_run, which makes it the current run of the
+calling context, so concurrent Streamlit sessions never mix their metrics.
+Code deep in the pipeline records into the current run with stage() and
+record(), and does nothing when no run is tracked. Worker threads only see
+the run when their function is wrapped with carry_context.
+"""
+
+import contextvars
+import json
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+# the counters of a stage, in the order they are exported
+COUNTERS = (
+    "calls",
+    "seconds",
+    "tokenizer_calls",
+    "llm_calls",
+    "prompt_tokens",
+    "completion_tokens",
+    "cache_hits",
+    "cache_misses",
+    "rate_limit_wait_seconds",
+)
+COUNTER_HELP = {
+    "calls": "Times the stage ran.",
+    "seconds": "Wall time spent in the stage, including the stages run inside it.",
+    "tokenizer_calls": "Tokenizer calls, a batch counts once.",
+    "llm_calls": "LLM requests, including those answered from the cache.",
+    "prompt_tokens": "Prompt tokens sent to the LLM provider.",
+    "completion_tokens": "Completion tokens received from the LLM provider.",
+    "cache_hits": "LLM requests answered from the response cache.",
+    "cache_misses": "LLM requests the response cache could not answer.",
+    "rate_limit_wait_seconds": "Time LLM requests waited for the rate limiter.",
+}
+# counters outside any stage
+UNSTAGED = "other"
+
+
+class StageMetrics:
+    """The counters of one pipeline stage, summed over every time it ran."""
+
+    __slots__ = COUNTERS
+
+    def __init__(self) -> None:
+        for name in COUNTERS:
+            setattr(self, name, 0)
+
+    def as_dict(self) -> dict[str, float]:
+        """Return the counters by name."""
+        return {name: getattr(self, name) for name in COUNTERS}
+
+
+class RunMetrics:
+    """
+    The metrics of one summary run, by stage, and every LLM request made.
+    Stages nest, a stage's wall time includes the stages run inside it, while
+    the other counters go to the innermost stage only. Thread-safe.
+    """
+
+    def __init__(self) -> None:
+        self.stages: dict[str, StageMetrics] = {}
+        self.llm_requests: list[dict[str, Any]] = []
+        self.started = time.time()
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, stage_name: str, **counts: float) -> None:
+        """Add counts to the counters of a stage."""
+        with self._lock:
+            stage_metrics = self.stages.get(stage_name)
+            if stage_metrics is None:
+                stage_metrics = self.stages[stage_name] = StageMetrics()
+            for name, count in counts.items():
+                setattr(stage_metrics, name, getattr(stage_metrics, name) + count)
+
+    def add_llm_request(self, stage_name: str, request: dict[str, Any]) -> None:
+        """Keep an LLM request and add it to the counters of its stage."""
+        self.add(
+            stage_name,
+            llm_calls=1,
+            prompt_tokens=request["prompt_tokens"],
+            completion_tokens=request["completion_tokens"],
+            cache_hits=int(request["cached"] is True),
+            cache_misses=int(request["cached"] is False),
+            rate_limit_wait_seconds=request["rate_limit_wait_seconds"],
+        )
+        with self._lock:
+            self.llm_requests.append({"stage": stage_name, **request})
+
+    def totals(self) -> dict[str, float]:
+        """Return the counters summed over every stage, except calls and seconds."""
+        with self._lock:
+            stages = list(self.stages.values())
+        return {
+            name: sum(getattr(stage_metrics, name) for stage_metrics in stages)
+            for name in COUNTERS[2:]
+        }
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the run as plain data, see to_json."""
+        with self._lock:
+            return {
+                "started": self.started,
+                "seconds": self.seconds,
+                "stages": {
+                    name: stage_metrics.as_dict()
+                    for name, stage_metrics in self.stages.items()
+                },
+                "llm_requests": list(self.llm_requests),
+            }
+
+    def to_json(self) -> str:
+        """Return the run as a JSON document."""
+        return json.dumps(self.as_dict(), indent=2)
+
+    def to_prometheus(
+        self, prefix: str = "reddit_summary", labels: dict[str, str] | None = None
+    ) -> str:
+        """
+        Return the run in the Prometheus text exposition format, one counter
+        per stage counter labelled by stage, e.g. to push to a Pushgateway.
+        labels are added to every sample.
+        """
+        data = self.as_dict()
+        base = "".join(
+            f'{key}="{escape_label(value)}",' for key, value in (labels or {}).items()
+        )
+        lines = [
+            f"# HELP {prefix}_run_seconds Wall time of the run.",
+            f"# TYPE {prefix}_run_seconds gauge",
+            f"{prefix}_run_seconds{{{base.rstrip(',')}}} {data['seconds']}",
+        ]
+        for counter in COUNTERS:
+            metric = f"{prefix}_stage_{counter}_total"
+            lines.append(f"# HELP {metric} {COUNTER_HELP[counter]}")
+            lines.append(f"# TYPE {metric} counter")
+            lines.extend(
+                f'{metric}{{{base}stage="{escape_label(name)}"}} {counts[counter]}'
+                for name, counts in data["stages"].items()
+            )
+        return "\n".join(lines) + "\n"
+
+
+def escape_label(value: str) -> str:
+    """Escape a Prometheus label value."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_current_run: contextvars.ContextVar[RunMetrics | None] = contextvars.ContextVar(
+    "current_run", default=None
+)
+_current_stage: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "current_stage", default=UNSTAGED
+)
+
+
+def current_run() -> RunMetrics | None:
+    """Return the run tracked in this context, if any."""
+    return _current_run.get()
+
+
+@contextmanager
+def track_run(metrics: RunMetrics) -> Iterator[RunMetrics]:
+    """Make metrics the current run of the block and time the block."""
+    token = _current_run.set(metrics)
+    start = time.perf_counter()
+    try:
+        yield metrics
+    finally:
+        metrics.seconds += time.perf_counter() - start
+        _current_run.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time the block as a stage of the current run, and record into it."""
+    metrics = _current_run.get()
+    if metrics is None:
+        yield
+        return
+
+    token = _current_stage.set(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _current_stage.reset(token)
+        metrics.add(name, calls=1, seconds=time.perf_counter() - start)
+
+
+def timed_stage(name: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """Decorator running every call of a function as a stage, see stage."""
+
+    def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> T:
+            with stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def iter_stage(name: str, items: Iterable[T]) -> Iterator[T]:
+    """Yield the items, timing only the work of producing each as a stage."""
+    iterator = iter(items)
+    while True:
+        with stage(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def record(**counts: float) -> None:
+    """Add counts to the current stage of the current run, if one is tracked."""
+    metrics = _current_run.get()
+    if metrics is not None:
+        metrics.add(_current_stage.get(), **counts)
+
+
+def record_llm_request(
+    model: str,
+    seconds: float,
+    prompt_tokens: int = 0,
+    completion_tokens: int = 0,
+    cached: bool | None = None,
+    rate_limit_wait_seconds: float = 0.0,
+) -> None:
+    """
+    Record an LLM request in the current stage of the current run. cached is
+    None when the response cache was not used, a cache hit sends no tokens.
+    """
+    metrics = _current_run.get()
+    if metrics is not None:
+        metrics.add_llm_request(
+            _current_stage.get(),
+            {
+                "model": model,
+                "seconds": seconds,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "cached": cached,
+                "rate_limit_wait_seconds": rate_limit_wait_seconds,
+            },
+        )
+
+
+def carry_context(func: Callable[..., T]) -> Callable[..., T]:
+    """
+    Wrap func to run in a copy of the calling context, so calls on worker
+    threads record into the current run and stage.
+    """
+    context = contextvars.copy_context()
+
+    @wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> T:
+        # a context can only be entered by one thread at a time
+        return context.copy().run(func, *args, **kwargs)
+
+    return wrapper
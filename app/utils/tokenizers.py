@@ -0,0 +1,159 @@
+"""Model-aware tokenizers, cached per process."""
+
+import codecs
+import math
+import threading
+from collections.abc import Iterable
+from typing import Protocol
+
+from config import ConfigVars, get_models
+from log_tools import Logger
+from utils.run_metrics import record
+
+config = ConfigVars()
+app_logger = Logger.get_app_logger()
+
+CHARS_PER_TOKEN = 4  # rough average for English text
+
+
+class Tokenizer(Protocol):
+    """Counts and truncates text in the tokens of a model."""
+
+    name: str
+
+    def count(self, text: str) -> int: ...
+
+    def count_many(self, texts: Iterable[str]) -> list[int]: ...
+
+    def truncate(self, text: str, max_tokens: int) -> str: ...
+
+    def split(self, text: str, max_tokens: int) -> list[str]: ...
+
+
+class TiktokenTokenizer:
+    """Tokenizer backed by a tiktoken encoding."""
+
+    def __init__(self, encoding_name: str) -> None:
+        import tiktoken
+
+        self.name = encoding_name
+        self._encoding = tiktoken.get_encoding(encoding_name)
+
+    def count(self, text: str) -> int:
+        """Return the number of tokens in text."""
+        record(tokenizer_calls=1)
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+    def count_many(self, texts: Iterable[str]) -> list[int]:
+        """Return the number of tokens in each text, encoded as one batch."""
+        record(tokenizer_calls=1)
+        return [
+            len(tokens)
+            for tokens in self._encoding.encode_batch(
+                list(texts), disallowed_special=()
+            )
+        ]
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut text at a token offset so it is at most max_tokens long."""
+        record(tokenizer_calls=1)
+        tokens = self._encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return self._encoding.decode(tokens[: max(max_tokens, 0)])
+
+    def split(self, text: str, max_tokens: int) -> list[str]:
+        """
+        Cut text at every max_tokens tokens, the pieces joining back into text.
+        A character whose bytes span a cut goes to the piece it ends in.
+        """
+        record(tokenizer_calls=1)
+        tokens = self._encoding.encode(text, disallowed_special=())
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        size = max(max_tokens, 1)
+        pieces = (
+            decoder.decode(self._encoding.decode_bytes(tokens[start : start + size]))
+            for start in range(0, len(tokens), size)
+        )
+        return [piece for piece in pieces if piece]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the tokens of text from the character count of each line, so
+    like tiktoken's the counts of texts split after a newline add up to the
+    count of the whole, which the chunkers rely on.
+    """
+    return sum(math.ceil(len(line) / CHARS_PER_TOKEN) for line in text.splitlines(True))
+
+
+class HeuristicTokenizer:
+    """Offline stand-in that estimates tokens from the character count."""
+
+    name = "heuristic"
+
+    def count(self, text: str) -> int:
+        """Return the estimated number of tokens in text, see estimate_tokens."""
+        record(tokenizer_calls=1)
+        return estimate_tokens(text)
+
+    def count_many(self, texts: Iterable[str]) -> list[int]:
+        """Return the estimated number of tokens in each text."""
+        record(tokenizer_calls=1)
+        return list(map(estimate_tokens, texts))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut text so it is at most max_tokens long."""
+        record(tokenizer_calls=1)
+        return text[: max(max_tokens, 0) * CHARS_PER_TOKEN]
+
+    def split(self, text: str, max_tokens: int) -> list[str]:
+        """Cut text every max_tokens tokens, the pieces joining back into text."""
+        record(tokenizer_calls=1)
+        size = max(max_tokens, 1) * CHARS_PER_TOKEN
+        return [text[start : start + size] for start in range(0, len(text), size)]
+
+
+class TokenizerRegistry:
+    """Resolves and caches a tokenizer for each model id in models.json."""
+
+    _model_encodings: dict[str, str | None] | None = None
+    _tokenizers: dict[str, Tokenizer] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def model_encodings(cls) -> dict[str, str | None]:
+        """Return the tokenizer of each model in models.json, read on first use."""
+        if cls._model_encodings is None:
+            cls._model_encodings = {model.id: model.tokenizer for model in get_models()}
+        return cls._model_encodings
+
+    @classmethod
+    def encoding_name(cls, model_id: str | None = None) -> str:
+        """Return the encoding used for a model, falling back to the default."""
+        return cls.model_encodings().get(model_id or "") or config.DEFAULT_TOKENIZER
+
+    @classmethod
+    def get(cls, model_id: str | None = None) -> Tokenizer:
+        """Return the cached tokenizer for a model id."""
+        encoding_name = cls.encoding_name(model_id)
+        tokenizer = cls._tokenizers.get(encoding_name)
+        if tokenizer is not None:
+            return tokenizer
+
+        with cls._lock:
+            if encoding_name not in cls._tokenizers:
+                cls._tokenizers[encoding_name] = cls._load(encoding_name)
+            return cls._tokenizers[encoding_name]
+
+    @staticmethod
+    def _load(encoding_name: str) -> Tokenizer:
+        try:
+            return TiktokenTokenizer(encoding_name)
+        except Exception as exc:  # pylint: disable=broad-except
+            app_logger.warning(
+                "Tokenizer %s unavailable (%s), estimating tokens instead",
+                encoding_name,
+                exc,
+            )
+            return HeuristicTokenizer()